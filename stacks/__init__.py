@@ -1,2 +1,19 @@
-__all__ = 'ec2', 'elb', 'route53', 'security', 'template', 'tools'
-from . import *  # noqa
+import importlib
+
+__all__ = 'ec2', 'elb', 'route53', 'security', 'template', 'tools', 'userdata'
+
+
+def __getattr__(name):
+    """Import the submodules on first use instead of at package import (PEP 562).
+
+    troposphere and awacs are slow to import, `from pyaws.stacks import template` should not pay for ec2, elb, ...
+    """
+    if name in __all__:
+        module = importlib.import_module('.' + name, __name__)
+        globals()[name] = module
+        return module
+    raise(AttributeError('module {!r} has no attribute {!r}'.format(__name__, name)))
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,35 @@
+"""Benchmarks for pyaws.stacks. Every benchmark stores its results as json so runs can be compared over time."""
+import datetime
+import json
+import platform
+
+import troposphere
+
+
+def write_results(file_name, results):
+    """Dump benchmark results together with the environment they were measured in"""
+    document = dict(date=datetime.datetime.now(datetime.timezone.utc).isoformat(),
+                    python=platform.python_version(),
+                    troposphere=troposphere.__version__,
+                    results=results)
+    print('* saving {}'.format(file_name))
+    with open(file_name, 'w') as f:
+        json.dump(document, f, indent=4, sort_keys=True)
+
+
+def read_results(file_name):
+    with open(file_name) as f:
+        return json.load(f)['results']
+
+
+def compare(old, new, key, threshold=0.2):
+    """Compare 2 sets of results (dict name -> dict of measurements) on one measurement.
+
+    :return: (list) of (name, old value, new value, relative change) for the results that grew more than threshold
+    """
+    regressions = []
+    for name in sorted(set(old) & set(new)):
+        before, after = old[name][key], new[name][key]
+        if before and (after - before) / float(before) > threshold:
+            regressions.append((name, before, after, (after - before) / float(before)))
+    return regressions
@@ -0,0 +1,158 @@
+"""Stack generation benchmark: stack() time, serialization time and peak memory of every template.
+
+Next to the templates as they are, scaled variants of the templates that take a size argument are measured
+(openshift-ha workers, lisa01 vdcm pool). The time per resource of a scaled series shows where generation cost grows
+faster than linear. The CloudFormation resource limit is lifted while measuring, big templates get split with
+limits.split() anyway.
+
+usage: python -m pyaws.stacks.benchmarks.generation [-o generation.json] [--compare previous.json] [--quick]
+"""
+import argparse
+import contextlib
+import gc
+import sys
+import time
+import tracemalloc
+
+import troposphere
+
+from . import compare, read_results, write_results
+from .. import build
+from .. import template as tpl
+
+
+# template name -> (keyword argument of stack(), sizes). The biggest sizes fill up the subnets of the templates.
+SCALED = {
+    'openshift-ha': ('nodes', (10, 100, 230)),
+    'lisa01': ('pool_of_vdcm', (10, 50, 155)),
+}
+
+# a time per resource at the biggest size this much higher than at the smallest size is reported as non linear
+NON_LINEAR_FACTOR = 2.0
+
+
+@contextlib.contextmanager
+def unlimited():
+    """Lift the troposphere template limits (when the installed version has them)"""
+    names = [n for n in ('MAX_RESOURCES', 'MAX_OUTPUTS', 'MAX_PARAMETERS', 'MAX_MAPPINGS') if hasattr(troposphere, n)]
+    saved = {n: getattr(troposphere, n) for n in names}
+    for n in names:
+        setattr(troposphere, n, sys.maxsize)
+    try:
+        yield
+    finally:
+        for n, value in saved.items():
+            setattr(troposphere, n, value)
+
+
+def measure(stack, runs=3):
+    """Measure one stack function.
+
+    :param stack: function that returns a template
+    :param runs: number of runs, the best times are kept
+    :return: (dict) stack_seconds, serialize_seconds, peak_bytes, resources, size
+    """
+    stack_times, serialize_times = [], []
+    for _ in range(runs):
+        gc.collect()
+        start = time.perf_counter()
+        t = stack()
+        stack_times.append(time.perf_counter() - start)
+
+        sink = tpl.SizeCounter()
+        start = time.perf_counter()
+        tpl.write_template(template=t, f=sink)
+        serialize_times.append(time.perf_counter() - start)
+
+    # memory is measured in a separate run, tracemalloc slows everything down
+    gc.collect()
+    tracemalloc.start()
+    try:
+        t = stack()
+        tpl.write_template(template=t, f=tpl.SizeCounter())
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return dict(stack_seconds=min(stack_times), serialize_seconds=min(serialize_times), peak_bytes=peak,
+                resources=len(t.resources), size=sink.size)
+
+
+def benchmark(runs=3, quick=False, templates=None):
+    """Measure all templates and their scaled variants.
+
+    :param runs: number of runs per measurement
+    :param quick: skip the biggest scaled variant of every template
+    :param templates: (optional) list of template names to measure. Defaults to all templates.
+    :return: (dict) name -> measure(), scaled variants are named <template>@<size>
+    """
+    results = {}
+    with unlimited():
+        for path in build.discover_templates():
+            name = build.template_name(path)
+            if templates and name not in templates:
+                continue
+            try:
+                stack = build.load_module(path)['stack']
+            except Exception as e:
+                print('* {} can not be loaded, skipped ({})'.format(name, e))
+                continue
+
+            results[name] = measure(stack, runs=runs)
+            if name in SCALED:
+                argument, sizes = SCALED[name]
+                for size in sizes[:-1] if quick else sizes:
+                    results['{}@{}'.format(name, size)] = measure(lambda: stack(**{argument: size}), runs=runs)
+    return results
+
+
+def non_linear(results, key='stack_seconds'):
+    """Scaled series of which the time per resource grows more than NON_LINEAR_FACTOR from smallest to biggest.
+
+    :return: (list) of (template name, time per resource at smallest size, at biggest size)
+    """
+    found = []
+    for name in sorted(SCALED):
+        series = sorted((int(n.split('@')[1]), r) for n, r in results.items() if n.startswith(name + '@'))
+        if len(series) < 2:
+            continue
+        first, last = series[0][1], series[-1][1]
+        before, after = first[key] / first['resources'], last[key] / last['resources']
+        if after > before * NON_LINEAR_FACTOR:
+            found.append((name, before, after))
+    return found
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='benchmark stack generation of all templates')
+    parser.add_argument('templates', nargs='*', help='template names to measure (default: all)')
+    parser.add_argument('-o', '--output', default='generation.json', help='json file to store the results')
+    parser.add_argument('-n', '--runs', type=int, default=3, help='runs per measurement, the best one is kept')
+    parser.add_argument('--quick', action='store_true', help='skip the biggest scaled variants')
+    parser.add_argument('--compare', help='previous results to check for regressions')
+    args = parser.parse_args(argv)
+
+    results = benchmark(runs=args.runs, quick=args.quick, templates=args.templates)
+    print('{:<24} {:>9} {:>10} {:>12} {:>10} {:>10}'.format('template', 'resources', 'stack ms', 'serialize ms',
+                                                             'peak KiB', 'size KiB'))
+    for name, r in sorted(results.items()):
+        print('{:<24} {:>9} {:>10.1f} {:>12.1f} {:>10.0f} {:>10.0f}'.format(
+            name, r['resources'], r['stack_seconds'] * 1000, r['serialize_seconds'] * 1000, r['peak_bytes'] / 1024.,
+            r['size'] / 1024.))
+    for name, before, after in non_linear(results):
+        print('NON LINEAR {}: {:.3f} ms -> {:.3f} ms per resource'.format(name, before * 1000, after * 1000))
+    write_results(args.output, results)
+
+    if args.compare:
+        old = read_results(args.compare)
+        regressions = []
+        for key in ('stack_seconds', 'serialize_seconds', 'peak_bytes'):
+            regressions += [(key,) + r for r in compare(old, results, key=key)]
+        for key, name, before, after, change in regressions:
+            print('REGRESSION {} {}: {:.4g} -> {:.4g} (+{:.0%})'.format(name, key, before, after, change))
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
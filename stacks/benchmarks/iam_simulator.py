@@ -0,0 +1,74 @@
+"""Iam simulator benchmark: time to build an Evaluator and to evaluate thousands of actions.
+
+The evaluator gets an s3 policy with a statement per bucket and the jenkins policies, the checks alternate between an
+s3 action on a bucket and an ec2 action that is denied without the source ip condition.
+
+usage: python -m pyaws.stacks.benchmarks.iam_simulator [-b buckets] [-n checks] [-o iam_simulator.json]
+                                                        [--compare old.json]
+"""
+import argparse
+import sys
+import time
+
+from . import compare, read_results, write_results
+from .. import iam, iam_simulator
+
+
+def bucket_evaluator(buckets):
+    """Evaluator of an s3 policy that allows GetObject on a number of buckets, and of the jenkins policies"""
+    statements = [iam.statement(iam.Action('s3', 'GetObject'), resource='arn:aws:s3:::bucket{}/*'.format(i))
+                  for i in range(buckets)]
+    return iam_simulator.Evaluator(iam.policy('s3', statements), iam.Policies.jenkins('jenkins'))
+
+
+def checks(evaluator, count):
+    """allowed() of s3:GetObject and ec2:DescribeImages on count buckets"""
+    return [evaluator.allowed(action, 'arn:aws:s3:::bucket{}/key'.format(i)) for i in range(count)
+            for action in ('s3:GetObject', 'ec2:DescribeImages')]
+
+
+def _best(function, runs):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def benchmark(buckets=100, count=1000, runs=3):
+    """Measure the evaluator of buckets statements.
+
+    :return: (dict) evaluator and checks -> dict with seconds
+    """
+    evaluator = bucket_evaluator(buckets)
+    return dict(
+        evaluator=dict(seconds=_best(lambda: bucket_evaluator(buckets), runs)),
+        checks=dict(seconds=_best(lambda: checks(evaluator, count), runs)),
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='benchmark the iam simulator')
+    parser.add_argument('-b', '--buckets', type=int, default=100, help='number of bucket statements')
+    parser.add_argument('-n', '--checks', type=int, default=1000, help='number of buckets to check 2 actions on')
+    parser.add_argument('-r', '--runs', type=int, default=3, help='runs per measurement, the best one is kept')
+    parser.add_argument('-o', '--output', default='iam_simulator.json', help='json file to store the results')
+    parser.add_argument('--compare', help='previous results to check for regressions')
+    args = parser.parse_args(argv)
+
+    results = benchmark(buckets=args.buckets, count=args.checks, runs=args.runs)
+    for name, r in sorted(results.items()):
+        print('{:<10} {:>10.1f} ms'.format(name, r['seconds'] * 1000))
+    write_results(args.output, results)
+
+    if args.compare:
+        regressions = compare(read_results(args.compare), results, key='seconds')
+        for name, before, after, change in regressions:
+            print('REGRESSION {}: {:.4g} -> {:.4g} (+{:.0%})'.format(name, before, after, change))
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
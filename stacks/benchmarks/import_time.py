@@ -0,0 +1,77 @@
+"""Import time of pyaws.stacks and each of its submodules.
+
+Every import is measured in a fresh interpreter, the cost of a submodule is the time on top of importing the
+bare package. The best of a number of runs is kept to filter out noise.
+
+usage: python -m pyaws.stacks.benchmarks.import_time [-o import_time.json] [--compare previous.json]
+"""
+import argparse
+import os
+import pkgutil
+import subprocess
+import sys
+
+from . import compare, read_results, write_results
+
+
+PACKAGE = __package__.rsplit('.', 1)[0]
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MEASURE = 'import time; start = time.perf_counter(); import {}; print(time.perf_counter() - start)'
+
+
+def submodules():
+    """Names of all (non test, non benchmark) submodules of the package"""
+    return sorted(m.name for m in pkgutil.iter_modules([PACKAGE_DIR]) if not m.ispkg)
+
+
+def import_time(module, runs=5):
+    """Best wall clock time in seconds to import a module in a fresh interpreter"""
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(p for p in sys.path if p))
+    times = []
+    for _ in range(runs):
+        out = subprocess.check_output([sys.executable, '-c', MEASURE.format(module)], env=env,
+                                      stderr=subprocess.DEVNULL)
+        times.append(float(out))
+    return min(times)
+
+
+def benchmark(runs=5):
+    """Measure the package and every submodule.
+
+    :return: (dict) module -> dict(seconds=total import time, own=time on top of the bare package)
+    """
+    base = import_time(PACKAGE, runs=runs)
+    results = {PACKAGE: dict(seconds=base, own=base)}
+    for name in submodules():
+        try:
+            seconds = import_time('{}.{}'.format(PACKAGE, name), runs=runs)
+        except subprocess.CalledProcessError:
+            print('* {} can not be imported, skipped'.format(name))
+            continue
+        results[name] = dict(seconds=seconds, own=max(seconds - base, 0.0))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='measure the import time of pyaws.stacks')
+    parser.add_argument('-o', '--output', default='import_time.json', help='json file to store the results')
+    parser.add_argument('-n', '--runs', type=int, default=5, help='runs per module, the best one is kept')
+    parser.add_argument('--compare', help='previous results to check for regressions')
+    args = parser.parse_args(argv)
+
+    results = benchmark(runs=args.runs)
+    for name, r in sorted(results.items(), key=lambda r: -r[1]['own']):
+        print('{:>8.1f} ms {}'.format(r['own'] * 1000, name))
+    write_results(args.output, results)
+
+    if args.compare:
+        regressions = compare(read_results(args.compare), results, key='own')
+        for name, before, after, change in regressions:
+            print('REGRESSION {}: {:.1f} ms -> {:.1f} ms (+{:.0%})'.format(name, before * 1000, after * 1000, change))
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,94 @@
+"""Reachability benchmark: time of Network.matrix() on fleets of instances.
+
+The fleets are json templates with instances spread over subnets that share a network acl with a deny entry for each
+port below 20, every instance is in one security group that allows the whole vpc.
+
+usage: python -m pyaws.stacks.benchmarks.reachability [-n 100 500] [-o reachability.json] [--compare old.json]
+"""
+import argparse
+import sys
+import time
+
+from . import compare, read_results, write_results
+from .. import reachability
+
+
+def fleet_stack(count, subnets=4):
+    """json template with count instances over a number of subnets, troposphere stops at 500 resources"""
+    resources = {
+        'acl': {'Type': 'AWS::EC2::NetworkAcl', 'Properties': {}},
+        'all': {'Type': 'AWS::EC2::NetworkAclEntry', 'Properties': dict(
+            NetworkAclId={'Ref': 'acl'}, RuleNumber=100, Protocol=-1, RuleAction='allow', Egress=False,
+            CidrBlock='0.0.0.0/0')},
+        'allout': {'Type': 'AWS::EC2::NetworkAclEntry', 'Properties': dict(
+            NetworkAclId={'Ref': 'acl'}, RuleNumber=100, Protocol=-1, RuleAction='allow', Egress=True,
+            CidrBlock='0.0.0.0/0')},
+        'sg': {'Type': 'AWS::EC2::SecurityGroup', 'Properties': dict(SecurityGroupIngress=[
+            dict(IpProtocol='-1', FromPort=-1, ToPort=-1, CidrIp='10.0.0.0/16')])},
+    }
+    for number in range(1, 20):
+        resources['deny{}'.format(number)] = {'Type': 'AWS::EC2::NetworkAclEntry', 'Properties': dict(
+            NetworkAclId={'Ref': 'acl'}, RuleNumber=number, Protocol=6, RuleAction='deny', Egress=False,
+            CidrBlock='0.0.0.0/0', PortRange=dict(From=number, To=number))}
+    for i in range(subnets):
+        resources['private{}'.format(i)] = {'Type': 'AWS::EC2::Subnet',
+                                            'Properties': dict(CidrBlock='10.0.{}.0/24'.format(i))}
+        resources['private{}acl'.format(i)] = {'Type': 'AWS::EC2::SubnetNetworkAclAssociation', 'Properties': dict(
+            SubnetId={'Ref': 'private{}'.format(i)}, NetworkAclId={'Ref': 'acl'})}
+    for n in range(count):
+        resources['node{}eth0'.format(n)] = {'Type': 'AWS::EC2::NetworkInterface', 'Properties': dict(
+            SubnetId={'Ref': 'private{}'.format(n % subnets)}, GroupSet=[{'Ref': 'sg'}],
+            PrivateIpAddress='10.0.{}.{}'.format(n % subnets, 10 + n // subnets))}
+        resources['node{}'.format(n)] = {'Type': 'AWS::EC2::Instance', 'Properties': dict(
+            NetworkInterfaces=[dict(DeviceIndex='0', NetworkInterfaceId={'Ref': 'node{}eth0'.format(n)})])}
+    return {'Resources': resources}
+
+
+def _best(function, runs):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def benchmark(sizes=(100, 500), runs=3, port=22):
+    """Measure the reachability matrix of fleets of instances.
+
+    :return: (dict) fleet@<size> -> dict with network and matrix seconds
+    """
+    results = {}
+    for size in sizes:
+        t = fleet_stack(size)
+        network = reachability.Network(t)
+        results['fleet@{}'.format(size)] = dict(
+            network_seconds=_best(lambda: reachability.Network(t), runs),
+            matrix_seconds=_best(lambda: network.matrix(port), runs))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='benchmark the reachability matrix')
+    parser.add_argument('-n', '--sizes', type=int, nargs='+', default=[100, 500], help='instances per fleet')
+    parser.add_argument('-r', '--runs', type=int, default=3, help='runs per measurement, the best one is kept')
+    parser.add_argument('-o', '--output', default='reachability.json', help='json file to store the results')
+    parser.add_argument('--compare', help='previous results to check for regressions')
+    args = parser.parse_args(argv)
+
+    results = benchmark(sizes=args.sizes, runs=args.runs)
+    for name, r in sorted(results.items()):
+        print('{:<10} network {:>10.1f} ms  matrix {:>10.1f} ms'.format(
+            name, r['network_seconds'] * 1000, r['matrix_seconds'] * 1000))
+    write_results(args.output, results)
+
+    if args.compare:
+        regressions = compare(read_results(args.compare), results, key='matrix_seconds')
+        for name, before, after, change in regressions:
+            print('REGRESSION {}: {:.4g} -> {:.4g} (+{:.0%})'.format(name, before, after, change))
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
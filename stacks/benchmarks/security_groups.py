@@ -0,0 +1,95 @@
+"""Security group generation benchmark: time to build the rules of many security groups.
+
+'legacy' builds the rules like security.py did before the rule catalog: a Rules() with 18 SecurityGroupRules per
+group and a deepcopy of every rule for every cidr. 'catalog' builds the same rules from the RuleSpec catalog,
+'groups' measures complete get_bastion_security_group() calls, 'rendered' the same groups and the
+serialization of their template, where the catalog rules are turned into SecurityGroupRules.
+
+usage: python -m pyaws.stacks.benchmarks.security_groups [-n groups] [-o security_groups.json] [--compare old.json]
+"""
+import argparse
+import sys
+import time
+from copy import deepcopy
+
+from troposphere.ec2 import SecurityGroupRule
+
+from . import compare, read_results, write_results
+from .. import ec2, security
+from .. import template as tpl
+
+
+def legacy_rules(cidrs):
+    """The bastion rules the way they were built before the rule catalog"""
+    rules = {name: SecurityGroupRule(IpProtocol=r.protocol, FromPort=r.from_port, ToPort=r.to_port, CidrIp=r.cidr)
+             for name, r in vars(security.Rules).items() if isinstance(r, security.RuleSpec)}
+    result = []
+    for r in (rules['ssh'], rules['https'], rules['all_icmp']):
+        for cidr in cidrs:
+            new_rule = deepcopy(r)
+            new_rule.CidrIp = cidr
+            result.append(new_rule)
+    return result
+
+
+def catalog_rules(cidrs):
+    """The bastion rules built from the rule catalog"""
+    rules = security.Rules
+    return security.compact([rules.override_cidr(r, cidr) for r in (rules.ssh, rules.https, rules.all_icmp)
+                             for cidr in cidrs])
+
+
+def bastion_groups(groups, cidrs):
+    t = tpl.create(description='benchmark')
+    vpc = ec2.vpc(template=t, name='vpc')
+    for n in range(groups):
+        security.get_bastion_security_group(template=t, vpc=vpc, sg_name='bastion{}'.format(n), cidr=cidrs)
+    return t
+
+
+def _best(function, runs):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def benchmark(groups=200, runs=3, cidrs=security.ALL_CISCO_CIDRS):
+    """Measure the rules of a number of bastion security groups.
+
+    :return: (dict) legacy, catalog, groups and rendered -> dict with seconds
+    """
+    return dict(
+        legacy=dict(seconds=_best(lambda: [legacy_rules(cidrs) for _ in range(groups)], runs)),
+        catalog=dict(seconds=_best(lambda: [catalog_rules(cidrs) for _ in range(groups)], runs)),
+        groups=dict(seconds=_best(lambda: bastion_groups(groups, cidrs), runs)),
+        rendered=dict(seconds=_best(lambda: bastion_groups(groups, cidrs).to_dict(), runs)),
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='benchmark security group rule generation')
+    parser.add_argument('-n', '--groups', type=int, default=200, help='number of security groups')
+    parser.add_argument('-r', '--runs', type=int, default=3, help='runs per measurement, the best one is kept')
+    parser.add_argument('-o', '--output', default='security_groups.json', help='json file to store the results')
+    parser.add_argument('--compare', help='previous results to check for regressions')
+    args = parser.parse_args(argv)
+
+    results = benchmark(groups=args.groups, runs=args.runs)
+    for name, r in sorted(results.items()):
+        print('{:<10} {:>10.1f} ms'.format(name, r['seconds'] * 1000))
+    print('catalog speedup: {:.1f}x'.format(results['legacy']['seconds'] / results['catalog']['seconds']))
+    write_results(args.output, results)
+
+    if args.compare:
+        regressions = compare(read_results(args.compare), results, key='seconds')
+        for name, before, after, change in regressions:
+            print('REGRESSION {}: {:.4g} -> {:.4g} (+{:.0%})'.format(name, before, after, change))
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,171 @@
+"""Batch render all templates in stacks/templates.
+
+Every template module that defines a stack() function is rendered to <output>/<name>.json in a process pool.
+A template is only rendered again when the sha256 of its own source or of the pyaws.stacks library changed since
+the previous build, so a rebuild only pays for the templates that actually changed.
+
+usage: python -m pyaws.stacks.build [-o OUTPUT] [-j JOBS] [--force] [template ...]
+"""
+import argparse
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from . import template as tpl
+
+
+LIBRARY_DIR = os.path.dirname(os.path.abspath(__file__))
+TEMPLATES_DIR = os.path.join(LIBRARY_DIR, 'templates')
+CACHE_FILE = '.build_cache.json'
+
+
+def discover_templates(path=TEMPLATES_DIR):
+    """Get all files that contain templates. Returns a sorted list of abs paths."""
+    files = [os.path.join(path, f) for f in os.listdir(path) if f != '__init__.py' and f.endswith('.py')]
+    return sorted(files)
+
+
+def load_module(module_path):
+    """Dynamically load a module from an abs path and return it"""
+    module = dict()
+    with open(module_path) as f:
+        exec(compile(f.read(), module_path, 'exec'), module)
+    return module
+
+
+def template_name(module_path):
+    """Name of a template, which is the file name without the .py extension."""
+    return os.path.basename(module_path)[:-3]
+
+
+def file_hash(path, h=None):
+    """Feed the content of a file into a hash object and return it"""
+    h = h or hashlib.sha256()
+    with open(path, 'rb') as f:
+        h.update(f.read())
+    return h
+
+
+def library_hash(path=LIBRARY_DIR):
+    """sha256 hex digest of all pyaws.stacks library files: modules, subpackages and data files (ex:
+    instance_types.csv). The templates themselves, tests and compiled files are not part of it."""
+    h = hashlib.sha256()
+    for root, dirs, files in os.walk(path):
+        dirs[:] = sorted(d for d in dirs if d not in ('__pycache__', 'tests') and
+                         os.path.join(root, d) != os.path.join(path, 'templates'))
+        for f in sorted(files):
+            if not f.endswith(('.pyc', '.pyo')):
+                name = os.path.relpath(os.path.join(root, f), path)
+                h.update(name.encode())
+                file_hash(os.path.join(root, f), h)
+    return h.hexdigest()
+
+
+def content_hash(module_path, library):
+    """Build key of a template: hash of the template source combined with the library hash."""
+    h = hashlib.sha256(library.encode())
+    return file_hash(module_path, h).hexdigest()
+
+
+def load_cache(output):
+    """Load the build cache of an output directory. Returns an empty cache when there is none (or it is corrupt)."""
+    try:
+        with open(os.path.join(output, CACHE_FILE)) as f:
+            return json.load(f)
+    except (IOError, ValueError):
+        return {}
+
+
+def save_cache(output, cache):
+    with open(os.path.join(output, CACHE_FILE), 'w') as f:
+        json.dump(cache, f, indent=4, sort_keys=True)
+
+
+def render(module_path, file_name):
+    """Render a single template to file. This runs inside a worker process.
+
+    :param module_path: abs path to the template module
+    :param file_name: path of the json file to write
+    :return: the template name
+    """
+    module = load_module(module_path=module_path)
+    if 'stack' not in module:
+        raise(LookupError('stack function not found in template {}'.format(module_path)))
+
+    tpl.save_template_to_file(template=module['stack'](), file_name=file_name, debug=False)
+    return template_name(module_path)
+
+
+def build(output='build', templates=None, jobs=None, force=False):
+    """Render all (or a selection of) templates into an output directory.
+
+    :param output: directory to write <name>.json files and the build cache to
+    :param templates: (optional) list of template names to build. Defaults to all discovered templates.
+    :param jobs: (optional) number of worker processes. Defaults to the number of cpus.
+    :param force: ignore the build cache and render everything
+    :return: (tuple) list of rendered names, list of skipped (up to date) names
+    """
+    if not os.path.isdir(output):
+        os.makedirs(output)
+
+    paths = discover_templates()
+    if templates:
+        unknown = set(templates) - set(template_name(p) for p in paths)
+        if unknown:
+            raise(LookupError('unknown templates: {}'.format(', '.join(sorted(unknown)))))
+        paths = [p for p in paths if template_name(p) in templates]
+
+    cache = {} if force else load_cache(output)
+    library = library_hash()
+
+    todo, skipped = {}, []
+    for path in paths:
+        name = template_name(path)
+        key = content_hash(path, library)
+        if cache.get(name) == key and os.path.exists(os.path.join(output, name + '.json')):
+            skipped.append(name)
+        else:
+            todo[name] = (path, key)
+
+    rendered = []
+    if todo:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = {name: pool.submit(render, path, os.path.join(output, name + '.json'))
+                       for name, (path, key) in todo.items()}
+            errors = {}
+            for name, future in futures.items():
+                try:
+                    future.result()
+                except Exception as e:
+                    errors[name] = e
+                    cache.pop(name, None)
+                else:
+                    cache[name] = todo[name][1]
+                    rendered.append(name)
+
+        # always persist what did succeed, a failing template should not invalidate the others
+        save_cache(output, cache)
+        if errors:
+            raise(RuntimeError('failed to render: {}'.format(
+                ', '.join('{} ({})'.format(name, e) for name, e in sorted(errors.items())))))
+
+    return sorted(rendered), sorted(skipped)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='render all pyaws stack templates')
+    parser.add_argument('templates', nargs='*', help='template names to build (default: all)')
+    parser.add_argument('-o', '--output', default='build', help='output directory (default: build)')
+    parser.add_argument('-j', '--jobs', type=int, default=None, help='number of worker processes')
+    parser.add_argument('--force', action='store_true', help='ignore the build cache')
+    args = parser.parse_args(argv)
+
+    rendered, skipped = build(output=args.output, templates=args.templates, jobs=args.jobs, force=args.force)
+    for name in rendered:
+        print('* rendered {}'.format(name))
+    print('* {} rendered, {} up to date'.format(len(rendered), len(skipped)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+"""VPC address planning and cidr validation.
+
+plan() carves a subnet per tier (public, private, video) per availability zone out of a vpc block, subnets() creates
+them in a template. validate() checks that every subnet of one or more templates fits in its vpc and that subnets
+(and vpcs of different templates) don't overlap.
+"""
+import ipaddress
+
+from . import ec2
+from .graph import resources_of
+
+
+TIERS = ('public', 'private', 'video')
+
+
+def plan(vpc_cidr, zones, tiers=TIERS, prefix=24):
+    """Carve subnets for every tier in every zone out of a vpc block.
+
+    Subnets are allocated in order, tier by tier, so all subnets of a tier are next to each other.
+
+    :param vpc_cidr: cidr of the vpc (ex: 10.0.0.0/16)
+    :param zones: number of availability zones or a list of zones
+    :param tiers: names of the tiers
+    :param prefix: prefix length of the subnets, an int or a dict of tier -> prefix length
+    :return: (list) of (tier, zone index, cidr) tuples
+    """
+    vpc = ipaddress.ip_network(vpc_cidr)
+    zones = zones if isinstance(zones, int) else len(zones)
+    cursor = int(vpc.network_address)
+    subnets = []
+    for tier in tiers:
+        length = prefix[tier] if isinstance(prefix, dict) else prefix
+        if length < vpc.prefixlen:
+            raise(ValueError('a /{} {} subnet does not fit in vpc {}'.format(length, tier, vpc_cidr)))
+        size = 2 ** (vpc.max_prefixlen - length)
+        for zone in range(zones):
+            cursor = -(-cursor // size) * size  # align on the subnet size
+            if cursor + size > int(vpc.broadcast_address) + 1:
+                raise(RuntimeError('vpc {} is full, no room for {} subnet {}'.format(vpc_cidr, tier, zone + 1)))
+            subnets.append((tier, zone, str(ipaddress.ip_network((cursor, length)))))
+            cursor += size
+    return subnets
+
+
+def subnets(template, vpc, zones, tiers=TIERS, prefix=24, **options):
+    """Create the planned subnets of a vpc in a template.
+
+    :param template: the template to add the subnets too.
+    :param vpc: vpc created by ec2.vpc()
+    :param zones: list of availability zones (parameters)
+    :param tiers: names of the tiers
+    :param prefix: prefix length of the subnets, an int or a dict of tier -> prefix length
+    :param options: per tier keyword arguments for ec2.subnet() (ex: public=dict(gateway=ig))
+    :return: (dict) tier -> list of subnets, one per zone
+    """
+    result = dict((tier, []) for tier in tiers)
+    for tier, zone, cidr in plan(vpc.CidrBlock, zones, tiers=tiers, prefix=prefix):
+        s = ec2.subnet(template=template, name='{}{}'.format(tier, zone + 1), vpc=vpc,
+                       availability_zone=zones[zone], cidr=cidr, **options.get(tier, {}))
+        result[tier].append(s)
+    return result
+
+
+def overlaps(cidrs):
+    """Find all overlapping pairs in a list of (name, cidr) with a sorted sweep.
+
+    Two cidr blocks are either disjoint or one contains the other, so after sorting on (start, -size) the blocks
+    that overlap a block are exactly the blocks on the stack of open blocks.
+
+    :return: (list) of (name, name) tuples, the first one contains the second one
+    """
+    blocks = []
+    for name, cidr in cidrs:
+        n = ipaddress.ip_network(cidr, strict=False)
+        blocks.append((int(n.network_address), -n.num_addresses, int(n.broadcast_address), name))
+    blocks.sort(key=lambda b: b[:2])
+
+    found, open_blocks = [], []
+    for start, _, end, name in blocks:
+        while open_blocks and open_blocks[-1][0] < start:
+            open_blocks.pop()
+        found.extend((other, name) for _, other in open_blocks)
+        open_blocks.append((end, name))
+    return found
+
+
+def validate(*templates):
+    """Validate the cidr blocks of one or more templates.
+
+    :param templates: troposphere templates, template dicts or paths to json templates
+    :return: (list) of problems, empty when everything is fine
+    """
+    problems = []
+    vpcs, subnets_per_vpc = [], {}
+    for i, template in enumerate(templates):
+        label = '' if len(templates) == 1 else '{}:'.format(i)
+        resources = resources_of(template)
+        for title, resource in sorted(resources.items()):
+            cidr = resource.get('Properties', {}).get('CidrBlock')
+            if not isinstance(cidr, str):
+                continue  # parameters and other functions can only be checked at deploy time
+            if resource['Type'] == 'AWS::EC2::VPC':
+                vpcs.append((label + title, cidr))
+            elif resource['Type'] == 'AWS::EC2::Subnet':
+                vpc = resource['Properties'].get('VpcId')
+                vpc = vpc.get('Ref') if isinstance(vpc, dict) else vpc
+                subnets_per_vpc.setdefault((label, vpc), []).append((label + title, cidr))
+
+    vpc_blocks = dict(vpcs)
+    for a, b in overlaps(vpcs):
+        problems.append('vpc {} ({}) overlaps vpc {} ({})'.format(a, vpc_blocks[a], b, vpc_blocks[b]))
+
+    for (label, vpc), subnet_blocks in sorted(subnets_per_vpc.items()):
+        blocks = dict(subnet_blocks)
+        vpc_cidr = vpc_blocks.get(label + str(vpc))
+        if vpc_cidr:
+            network = ipaddress.ip_network(vpc_cidr)
+            for name, cidr in subnet_blocks:
+                if not ipaddress.ip_network(cidr).subnet_of(network):
+                    problems.append('subnet {} ({}) is outside vpc {} ({})'.format(name, cidr, label + vpc, vpc_cidr))
+        for a, b in overlaps(subnet_blocks):
+            problems.append('subnet {} ({}) overlaps subnet {} ({})'.format(a, blocks[a], b, blocks[b]))
+    return problems
+
+
+def check(*templates):
+    """validate() that raises a ValueError on any problem"""
+    problems = validate(*templates)
+    if problems:
+        raise(ValueError('\n'.join(problems)))
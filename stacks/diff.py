@@ -0,0 +1,130 @@
+"""Structural diff of two templates, an offline preview of a CloudFormation change set.
+
+Resources are compared by the hash of their canonical json, only the resources whose hash differs are diffed on
+property level. Changes to properties that force CloudFormation to replace an instance or network interface are
+flagged. A replaced resource gets a new id, the resources that Ref or GetAtt it in a property that forces a
+replacement are replaced as well.
+
+usage: python -m pyaws.stacks.diff old.json new.json
+"""
+import hashlib
+import json
+import sys
+
+from .graph import references, resources_of
+
+
+# properties that can not be updated in place. Changing the Type of a resource always replaces it.
+REPLACEMENT_PROPERTIES = {
+    'AWS::EC2::Instance': {'AvailabilityZone', 'BlockDeviceMappings', 'CpuOptions', 'ElasticGpuSpecifications',
+                           'HibernationOptions', 'HostResourceGroupArn', 'ImageId', 'Ipv6AddressCount',
+                           'Ipv6Addresses', 'KeyName', 'LaunchTemplate', 'LicenseSpecifications',
+                           'NetworkInterfaces', 'PlacementGroupName', 'PrivateIpAddress', 'SecurityGroups',
+                           'SubnetId'},
+    'AWS::EC2::NetworkInterface': {'InterfaceType', 'PrivateIpAddress', 'SubnetId'},
+}
+
+# properties that can be updated in place but stop (or reboot) the resource
+INTERRUPTION_PROPERTIES = {
+    'AWS::EC2::Instance': {'EbsOptimized', 'InstanceType', 'KernelId', 'RamdiskId', 'UserData'},
+}
+
+
+def resource_hash(resource):
+    """sha1 of the canonical json of a resource"""
+    return hashlib.sha1(json.dumps(resource, sort_keys=True, separators=(',', ':')).encode()).hexdigest()
+
+
+def diff_resource(old, new):
+    """Property level diff of 2 versions of a resource.
+
+    :return: (dict) with
+        properties: dict of property -> (old, new), a missing property is None
+        attributes: dict of resource attribute (Type, DependsOn, ...) -> (old, new)
+        replacement: sorted list of the changes that force a replacement
+        interruption: sorted list of the changes that interrupt the resource
+        replaced_references: sorted list of the replaced resources that force a replacement, filled in by diff()
+    """
+    old_props, new_props = old.get('Properties', {}), new.get('Properties', {})
+    properties = {k: (old_props.get(k), new_props.get(k)) for k in set(old_props) | set(new_props)
+                  if old_props.get(k) != new_props.get(k)}
+    attributes = {k: (old.get(k), new.get(k)) for k in (set(old) | set(new)) - {'Properties'}
+                  if old.get(k) != new.get(k)}
+
+    resource_type = new.get('Type')
+    replacement = sorted(set(properties) & REPLACEMENT_PROPERTIES.get(resource_type, set()))
+    if 'Type' in attributes:
+        replacement.insert(0, 'Type')
+    interruption = sorted(set(properties) & INTERRUPTION_PROPERTIES.get(resource_type, set()))
+    return dict(properties=properties, attributes=attributes, replacement=replacement, interruption=interruption,
+                replaced_references=[])
+
+
+def diff(old, new):
+    """Diff the resources of 2 templates.
+
+    :param old: troposphere template, template dict or path to a json template
+    :param new: troposphere template, template dict or path to a json template
+    :return: (dict) with sorted lists 'added', 'removed' and a dict 'modified' of title -> diff_resource()
+    """
+    old, new = resources_of(old), resources_of(new)
+    modified = {}
+    for title in set(old) & set(new):
+        if resource_hash(old[title]) != resource_hash(new[title]):
+            modified[title] = diff_resource(old[title], new[title])
+    _propagate_replacements(old, new, modified)
+    return dict(added=sorted(set(new) - set(old)), removed=sorted(set(old) - set(new)), modified=modified)
+
+
+def _propagate_replacements(old, new, modified):
+    """Replace the resources that refer to a replaced resource in a property that forces a replacement"""
+    users = {}  # title -> [(title of a resource that refers to it, property)]
+    for title, r in new.items():
+        forcing = REPLACEMENT_PROPERTIES.get(r.get('Type'), set())
+        for name, value in r.get('Properties', {}).items():
+            if name in forcing:
+                for _, target in references(value):
+                    users.setdefault(target, []).append((title, name))
+
+    pending = [title for title, change in modified.items() if change['replacement']]
+    replaced = set(pending)
+    while pending:
+        target = pending.pop()
+        for title, name in users.get(target, []):
+            if title not in old:
+                continue
+            change = modified.setdefault(title, diff_resource(old[title], new[title]))
+            if name not in change['replacement']:
+                change['replacement'] = sorted(change['replacement'] + [name], key=lambda p: (p != 'Type', p))
+            change['replaced_references'] = sorted(set(change['replaced_references']) | {target})
+            if title not in replaced:
+                replaced.add(title)
+                pending.append(title)
+
+
+def replacements(d):
+    """Titles of the modified resources in a diff() that will be replaced"""
+    return sorted(title for title, change in d['modified'].items() if change['replacement'])
+
+
+def report(d):
+    """Human readable version of diff()"""
+    lines = ['+ {}'.format(title) for title in d['added']]
+    lines += ['- {}'.format(title) for title in d['removed']]
+    for title, change in sorted(d['modified'].items()):
+        flag = ' (REPLACEMENT: {})'.format(', '.join(change['replacement'])) if change['replacement'] else ''
+        if change['replaced_references']:
+            flag = '{}, replaced: {})'.format(flag[:-1], ', '.join(change['replaced_references']))
+        if not flag and change['interruption']:
+            flag = ' (interruption: {})'.format(', '.join(change['interruption']))
+        lines.append('~ {}{}'.format(title, flag))
+        for name, (old, new) in sorted(change['attributes'].items()) + sorted(change['properties'].items()):
+            lines.append('    {}: {} -> {}'.format(name, json.dumps(old, sort_keys=True),
+                                                   json.dumps(new, sort_keys=True)))
+    if not lines:
+        lines.append('no changes')
+    return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    print(report(diff(sys.argv[1], sys.argv[2])))
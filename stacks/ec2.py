@@ -1,15 +1,19 @@
 """ec2 functions"""
+import ipaddress
 
-from troposphere import Ref, Join, GetAtt, Base64, Tags
+from troposphere import Ref, Join, GetAtt, Base64, Tags, Parameter
+from troposphere import autoscaling
 from troposphere.ec2 import Instance, NetworkInterface, NetworkInterfaceProperty
 from troposphere.ec2 import EIP, EIPAssociation
 from troposphere.ec2 import SubnetNetworkAclAssociation
 from troposphere.ec2 import VPC, Subnet, InternetGateway, VPCGatewayAttachment, NatGateway
 from troposphere.ec2 import Route, RouteTable, SubnetRouteTableAssociation
-from troposphere.ec2 import PlacementGroup
+from troposphere.ec2 import PlacementGroup, CpuOptions
 from troposphere.ec2 import BlockDeviceMapping
 from troposphere.ec2 import EBSBlockDevice
+from troposphere.ec2 import LaunchTemplate, LaunchTemplateData, LaunchTemplateBlockDeviceMapping, IamInstanceProfile
 
+from . import instance_types
 from .tools import aws_name
 
 
@@ -50,6 +54,7 @@ class AMI(object):
 
 
 class Type(object):
+    """Frequently used instance types, see instance_types for all types and their capabilities"""
     T2_NANO = 't2.nano'
     T2_MICRO = 't2.micro'
     T2_SMALL = 't2.small'
@@ -60,28 +65,115 @@ class Type(object):
     C4_8XLARGE = 'c4.8xlarge'
 
 
+# ebs volume types -> provisioned iops range, max iops per GiB and throughput range (MiB/s)
+VOLUME_TYPES = {
+    'gp2': {},
+    'gp3': dict(iops=(3000, 16000), iops_per_gib=500, throughput=(125, 1000)),
+    'io1': dict(iops=(100, 64000), iops_per_gib=50),
+    'io2': dict(iops=(100, 64000), iops_per_gib=500),
+    'st1': {},
+    'sc1': {},
+    'standard': {},
+}
+
+
+class IpAllocator(object):
+    """Static private ip addresses of subnets, indexed by subnet.
+
+    Hands out free addresses and rejects addresses that are taken or not usable in the subnet. AWS reserves the first
+    4 addresses (network, router, dns, future use) and the last address of every subnet. Every check is a range
+    comparison or a set lookup, handing out the next free address is amortized constant time.
+    """
+    RESERVED_FIRST = 4
+    RESERVED_LAST = 1
+
+    def __init__(self):
+        # subnet title -> [first usable address, last usable address, set of used addresses, next candidate]
+        self.subnets = {}
+
+    def _subnet(self, subnet):
+        state = self.subnets.get(subnet.title)
+        if state is None:
+            if not isinstance(subnet.CidrBlock, str):
+                raise(ValueError('subnet {} has no literal cidr block to allocate from'.format(subnet.title)))
+            network = ipaddress.ip_network(subnet.CidrBlock)
+            first = int(network.network_address) + self.RESERVED_FIRST
+            last = int(network.broadcast_address) - self.RESERVED_LAST
+            state = self.subnets[subnet.title] = [first, last, set(), first]
+        return state
+
+    def allocate(self, subnet, ip_address=None):
+        """Reserve an address in a subnet.
+
+        :param subnet: subnet created by subnet()
+        :param ip_address: (optional) address to reserve. Defaults to the next free address of the subnet.
+        :return: (str) the reserved ip address
+        """
+        state = self._subnet(subnet)
+        first, last, used, candidate = state
+        if ip_address is None:
+            while candidate in used:
+                candidate += 1
+            if candidate > last:
+                raise(RuntimeError('subnet {} ({}) has no free addresses left'.format(subnet.title, subnet.CidrBlock)))
+            state[3] = candidate + 1
+            address = candidate
+        else:
+            address = int(ipaddress.ip_address(ip_address))
+            if not first <= address <= last:
+                raise(ValueError('{} is not a usable address of subnet {} ({})'.format(ip_address, subnet.title,
+                                                                                     subnet.CidrBlock)))
+            if address in used:
+                raise(ValueError('{} is already used in subnet {}'.format(ip_address, subnet.title)))
+        used.add(address)
+        return str(ipaddress.ip_address(address))
+
+    def free(self, subnet):
+        """Number of free addresses left in a subnet"""
+        first, last, used, _ = self._subnet(subnet)
+        return last - first + 1 - len(used)
+
+
 # aws functions
 def instance(template, name, ami, type, keypair, interfaces,
              availability_zone=None, user_data=None, placement_group=None, role='unknown', iam_role=None,
-             volume_size=None, tags=None):
+             volume_size=None, tags=None, ebs_optimized=None, monitoring=False, tenancy=None, cpu_cores=None,
+             threads_per_core=None, enhanced_networking=None, volumes=None):
     """Create an aws instance.
 
     :param template: the template to add this subnet too.
     :param name: name of the instance
     :param ami: ami for the instance
-    :param type: instance type (ex: c4.8xlarge)
+    :param type: instance type (ex: c4.8xlarge), checked against the instance_types catalog
     :param keypair: the keypair to use of this instance
     :param interfaces: interfaces list for this instance.
     Note: when providing a single interface in a public subnet a public ip is given.
           In all other cases one should use an elastic ip.
     :param availability_zone: (optional) name of the availability zone to place this instance in.
     :param user_data: (optional) #cloud_init style or #!/bin/bash style cloud init user data to pass to the instance.
+    Anything else than a string is used as is, ex: the base64 user data of userdata.shared().
     :param placement_group: the placement group to put this instance in
     :param role: (optional) the Role tag to apply to this instance
     :param volume_size: (optional) size of the rfs in GB
+    :param volumes: (optional) list of volume() and ephemeral() block devices, ex: a gp3 root volume with provisioned
+    iops instead of volume_size and data volumes
     :param iam_role: (optional) name or object that points to an IamInstanceRole
+    :param ebs_optimized: (optional) dedicated ebs bandwidth. Types that are ebs optimized by default don't need it.
+    :param monitoring: (optional) detailed (1 minute) cloudwatch monitoring
+    :param tenancy: (optional) default, dedicated or host
+    :param cpu_cores: (optional) number of cpu cores, defaults to all cores of the type
+    :param threads_per_core: (optional) 1 disables hyper threading
+    :param enhanced_networking: (optional) 'ena', 'sriov' or True. Enhanced networking is enabled by the ami, this
+    only checks that the type supports it.
     :return: instance
     """
+    instance_types.check(type, interfaces=len(interfaces or []))
+    if tenancy not in (None, 'default', 'dedicated', 'host'):
+        raise(ValueError('unknown tenancy {}'.format(tenancy)))
+    instance_types.check_options(type, ebs_optimized=ebs_optimized, cpu_cores=cpu_cores,
+                                 threads_per_core=threads_per_core, enhanced_networking=enhanced_networking,
+                                 placement_strategy=getattr(placement_group, 'Strategy', None))
+
     i = Instance(name, template=template)
     i.ImageId = ami
     i.InstanceType = type
@@ -107,10 +199,23 @@ def instance(template, name, ami, type, keypair, interfaces,
     if placement_group:
         i.PlacementGroupName = Ref(placement_group)
 
-    if volume_size:
-        i.BlockDeviceMappings = [
-            BlockDeviceMapping(DeviceName="/dev/sda1", Ebs=EBSBlockDevice(VolumeSize=volume_size))
-        ]
+    if volume_size or volumes:
+        i.BlockDeviceMappings = _block_devices(volume_size, volumes)
+
+    if ebs_optimized is not None:
+        i.EbsOptimized = ebs_optimized
+
+    if monitoring:
+        i.Monitoring = True
+
+    if tenancy:
+        i.Tenancy = tenancy
+
+    if cpu_cores or threads_per_core:
+        t = instance_types.get(type)
+        if t is None and not (cpu_cores and threads_per_core):
+            raise(ValueError('set both cpu_cores and threads_per_core for {} instances'.format(type)))
+        i.CpuOptions = CpuOptions(CoreCount=cpu_cores or t.cores, ThreadsPerCore=threads_per_core or t.vcpu // t.cores)
 
     if interfaces:
         i.NetworkInterfaces = [NetworkInterfaceProperty(DeviceIndex=index,
@@ -118,23 +223,114 @@ def instance(template, name, ami, type, keypair, interfaces,
                                for (index, interface) in enumerate(interfaces)]
 
     if user_data:
-        i.UserData = Base64(Join('', [line + '\n' for line in user_data.splitlines()]))
+        i.UserData = _user_data(user_data)
 
     return i
 
 
-def placement_group(template, name):
+def _user_data(user_data):
+    if isinstance(user_data, str):
+        return Base64(Join('', [line + '\n' for line in user_data.splitlines()]))
+    # already encoded, ex: userdata.shared()
+    return user_data
+
+
+PLACEMENT_STRATEGIES = ('cluster', 'spread', 'partition')
+
+
+def volume(device, size, type='gp3', iops=None, throughput=None, delete_on_termination=True, encrypted=None,
+           snapshot=None):
+    """Block device mapping of an ebs volume.
+
+    :param device: device name (ex: /dev/sda1 for the root volume, /dev/sdf for a data volume)
+    :param size: size in GB
+    :param type: volume type, see VOLUME_TYPES
+    :param iops: (optional) provisioned iops, gp3 (3000 included) and io1/io2 (required) only
+    :param throughput: (optional) provisioned throughput in MiB/s, gp3 only (125 included)
+    :param delete_on_termination: delete the volume with the instance
+    :param encrypted: (optional) encrypt the volume
+    :param snapshot: (optional) id of the snapshot to create the volume from
+    :return: block device mapping for instance(volumes=...)
+    """
+    if type not in VOLUME_TYPES:
+        raise(ValueError('unknown volume type {}, use one of {}'.format(type, ', '.join(sorted(VOLUME_TYPES)))))
+    limits = VOLUME_TYPES[type]
+    if type in ('io1', 'io2') and not iops:
+        raise(ValueError('{} volumes need provisioned iops'.format(type)))
+    if iops:
+        if 'iops' not in limits:
+            raise(ValueError('{} volumes have no provisioned iops'.format(type)))
+        low, high = limits['iops']
+        if not low <= iops <= min(high, size * limits['iops_per_gib']):
+            raise(ValueError('{} iops of a {} GB {} volume are {} to {}'.format(
+                iops, size, type, low, min(high, size * limits['iops_per_gib']))))
+    if throughput:
+        if 'throughput' not in limits:
+            raise(ValueError('{} volumes have no provisioned throughput'.format(type)))
+        low, high = limits['throughput']
+        # gp3 allows 0.25 MiB/s per provisioned iops
+        high = min(high, (iops or limits['iops'][0]) // 4)
+        if not low <= throughput <= high:
+            raise(ValueError('throughput of this {} volume is {} to {} MiB/s, {} given'.format(type, low, high,
+                                                                                           throughput)))
+
+    ebs = EBSBlockDevice(VolumeSize=size, VolumeType=type, DeleteOnTermination=delete_on_termination)
+    if iops:
+        ebs.Iops = iops
+    if throughput:
+        ebs.Throughput = throughput
+    if encrypted is not None:
+        ebs.Encrypted = encrypted
+    if snapshot:
+        ebs.SnapshotId = snapshot
+    return BlockDeviceMapping(DeviceName=device, Ebs=ebs)
+
+
+def ephemeral(device, index=0):
+    """Block device mapping that passes instance store volume ephemeral<index> of the instance type through.
+
+    :param device: device name (ex: /dev/sdb)
+    :param index: number of the instance store volume
+    :return: block device mapping for instance(volumes=...)
+    """
+    return BlockDeviceMapping(DeviceName=device, VirtualName='ephemeral{}'.format(index))
+
+
+def _block_devices(volume_size, volumes, mapping=BlockDeviceMapping):
+    devices = []
+    if volume_size:
+        devices.append(mapping(DeviceName="/dev/sda1", Ebs=EBSBlockDevice(VolumeSize=volume_size)))
+    for v in volumes or []:
+        devices.append(v if mapping is BlockDeviceMapping else mapping(**v.properties))
+    names = [d.DeviceName for d in devices]
+    if len(set(names)) != len(names):
+        raise(ValueError('device names are used more than once: {}'.format(', '.join(names))))
+    return devices
+
+
+def placement_group(template, name, strategy='cluster', partition_count=None):
     """Create an aws placement group
     :param template: the template to add this placement group too.
     :param name: name of the placement group
+    :param strategy: cluster (low latency, high throughput between the instances), spread (every instance on
+    different hardware) or partition (groups of instances on different hardware)
+    :param partition_count: (optional) number of partitions (1-7) of a partition placement group
     :return: placement group
     """
+    if strategy not in PLACEMENT_STRATEGIES:
+        raise(ValueError('unknown placement strategy {}, use one of {}'.format(strategy, PLACEMENT_STRATEGIES)))
+    if partition_count is not None and (strategy != 'partition' or not 1 <= partition_count <= 7):
+        raise(ValueError('partition_count is 1-7 and only for partition placement groups'))
+
     p = PlacementGroup(name, template=template)
-    p.Strategy = 'cluster'
+    p.Strategy = strategy
+    if partition_count:
+        p.PartitionCount = partition_count
     return p
 
 
-def interface(template, name, subnet, ip_address=None, security_groups=None, gateway_attachment=None, description=''):
+def interface(template, name, subnet, ip_address=None, security_groups=None, gateway_attachment=None, description='',
+              allocator=None):
     """Create an aws interface
     :param template: the template to add this subnet too.
     :param name: the name of the interface
@@ -143,8 +339,12 @@ def interface(template, name, subnet, ip_address=None, security_groups=None, gat
     :param (list|security_group) security_groups: list of security groups for this interface
     :param gateway_attachment: dependency for an elastic ip. When provided the interface gets an elastic ip
     :param description: description for the interface
+    :param (optional) allocator: IpAllocator that validates ip_address, or hands out the next free address when empty.
     :return: interface
     """
+    if allocator:
+        ip_address = allocator.allocate(subnet, ip_address)
+
     n = NetworkInterface(name, template=template)
     n.Tags = Tags(Name=aws_name(n.title))
     n.Description = description
@@ -203,8 +403,37 @@ def internet_gateway(template, vpc, name='InternetGateway'):
     return ig, iga
 
 
+def route_table(template, name, vpc, gateway=None, nat=None):
+    """Create an aws route table with a default route to an internet gateway or a nat gateway.
+
+    :param template: the template to add this route table too.
+    :param name: base name of the route table and its route
+    :param vpc: the vpc of the route table
+    :param (optional) gateway: internet gateway for the default route (public)
+    :param (optional) nat: nat gateway for the default route (private)
+    :return: route table
+    """
+    if gateway and nat:
+        raise(RuntimeError("Don't provide an internet gateway (public) and nat gateway (private) at the same time."))
+
+    rt = RouteTable('{}RouteTable'.format(name), template=template)
+    rt.Tags = Tags(Name=aws_name(rt.title))
+    rt.VpcId = Ref(vpc)
+
+    if gateway or nat:
+        r = Route('{}Route'.format(name), template=template)
+        r.DestinationCidrBlock = '0.0.0.0/0'
+        if gateway:
+            r.GatewayId = Ref(gateway)
+        else:
+            r.NatGatewayId = Ref(nat)
+        # r.DependsOn = InternetGatewayAttachment.title
+        r.RouteTableId = Ref(rt)
+    return rt
+
+
 def subnet(template, name, vpc, availability_zone='eu-west-1a', cidr='10.0.36.0/24', gateway=None, nat=None,
-           map_public_ip=False, acl_table=None):
+           map_public_ip=False, acl_table=None, share_route_table=False):
     """Create an aws subnet in a vpc.
     :param template: the template to add this subnet too.
     :param name: subnet name
@@ -212,8 +441,11 @@ def subnet(template, name, vpc, availability_zone='eu-west-1a', cidr='10.0.36.0/
     :param cidr: cidr of the subnet (example: 10.0.0.0/24)
     :param (optional) availability_zone: availability_zone to use.
     :param (optional) gateway: gateway of the subnet. This makes this a public subnet by adding an internet route.
+    :param (optional) nat: nat gateway of the subnet. This makes this a private subnet by adding a nat route.
     :param (optional) map_public_ip: This only seems to work when an instance only has a single interface.
     :param (optional) acl_table: ACL table to use for this subnet. Defaults to the default acl table (ALL/ALL)
+    :param (optional) share_route_table: use one route table per gateway (named <gateway>RouteTable) for all subnets
+    that share the gateway instead of a route table per subnet.
     :return: subnet
     """
     s = Subnet(name, template=template)
@@ -228,37 +460,15 @@ def subnet(template, name, vpc, availability_zone='eu-west-1a', cidr='10.0.36.0/
     if gateway and nat:
         raise(RuntimeError("Don't provide an internet gateway (public) and nat gateway (private) at the same time."))
 
-    # add public route if an internet gateway is given
-    if gateway:
-        # route table
-        rt = RouteTable('{}RouteTable'.format(name), template=template)
-        rt.Tags = Tags(Name=aws_name(rt.title))
-        rt.VpcId = Ref(vpc)
-
-        # route
-        r = Route('{}Route'.format(name), template=template)
-        r.DestinationCidrBlock = '0.0.0.0/0'
-        r.GatewayId = Ref(gateway)
-        # r.DependsOn = InternetGatewayAttachment.title
-        r.RouteTableId = Ref(rt)
-
-        # associate
-        SubnetRouteTableAssociation('{}SubnetRouteTableAssociation'.format(name), template=template,
-                                    RouteTableId=Ref(rt), SubnetId=Ref(s))
-
-    # add nat route if an nat gateway is given
-    if nat:
-        # route table
-        rt = RouteTable('{}RouteTable'.format(name), template=template)
-        rt.Tags = Tags(Name=aws_name(rt.title))
-        rt.VpcId = Ref(vpc)
-
-        # route
-        r = Route('{}Route'.format(name), template=template)
-        r.DestinationCidrBlock = '0.0.0.0/0'
-        r.NatGatewayId = Ref(nat)
-        # r.DependsOn = InternetGatewayAttachment.title
-        r.RouteTableId = Ref(rt)
+    # add a public route if an internet gateway is given, a nat route if a nat gateway is given
+    if gateway or nat:
+        if share_route_table:
+            table_name = (gateway or nat).title
+            rt = template.resources.get('{}RouteTable'.format(table_name))
+            if rt is None:
+                rt = route_table(template=template, name=table_name, vpc=vpc, gateway=gateway, nat=nat)
+        else:
+            rt = route_table(template=template, name=name, vpc=vpc, gateway=gateway, nat=nat)
 
         # associate
         SubnetRouteTableAssociation('{}SubnetRouteTableAssociation'.format(name), template=template,
@@ -296,17 +506,185 @@ def elastic_ip(template, name, network_interface, gateway_attachment):
 
 
 def instance_with_interfaces(template, name, ami, type, keypair, role, interfaces, user_data=None, placement_group=None,
-                             iam_role=None, volume_size=None, tags=None):
-    """Create an instance with interfaces in one shot."""
+                             iam_role=None, volume_size=None, tags=None, allocator=None, **options):
+    """Create an instance with interfaces in one shot.
+
+    interfaces is a list with a (subnet, ip_address, security_groups, gateway_attachment) tuple per interface, the
+    addresses go through the (optional) IpAllocator, see interface(). options are passed to instance() (ex:
+    ebs_optimized, cpu_cores, enhanced_networking).
+    """
+    instance_types.check(type, interfaces=len(interfaces))
+
     eths = []
     for i, (sn, ip, sg, iga) in enumerate(interfaces):
         eth = interface(template=template, name='{}eth{}'.format(name, i), subnet=sn,
-                        ip_address=ip, security_groups=sg, gateway_attachment=iga)
+                        ip_address=ip, security_groups=sg, gateway_attachment=iga, allocator=allocator)
         eths.append(eth)
 
     return instance(template=template, name=name, ami=Ref(ami), type=type, keypair=keypair,
                     interfaces=eths, role=role, user_data=user_data, placement_group=placement_group, iam_role=iam_role,
-                    volume_size=volume_size, tags=tags)
+                    volume_size=volume_size, tags=tags, **options)
+
+
+def instance_fleet(template, name, count, ami, type, keypair, role, interfaces, first_host=None, start=1,
+                   naming='{name}{index}', user_data=None, placement_group=None, iam_role=None, volume_size=None,
+                   tags=None, allocator=None, per_subnet=False, **options):
+    """Create a number of identical instances with their interfaces in one pass.
+
+    Instance n is placed in subnets[n % len(subnets)] of every interface, so a list of subnets in different
+    availability zones spreads the fleet over these zones.
+
+    :param template: the template to add the instances too.
+    :param name: base name of the instances
+    :param count: number of instances
+    :param ami: ami for the instances
+    :param type: instance type (ex: c4.8xlarge)
+    :param keypair: the keypair to use for the instances
+    :param role: the Role tag of the instances
+    :param interfaces: list with a (subnets, security_groups, gateway_attachment) tuple per interface.
+    subnets is a single subnet or a list of subnets.
+    :param first_host: (optional) host number of the first instance (ex: 20 -> 10.0.100.20, 10.0.100.21, ...), at least
+    4: aws reserves the first 4 addresses of a subnet. Requires subnets created by subnet(). Interfaces use dhcp when
+    not provided.
+    :param per_subnet: number the hosts per subnet (instance n gets host first_host + n // len(subnets)) instead of
+    over the whole fleet (first_host + n)
+    :param allocator: (optional) IpAllocator shared with the other instances in the subnets. Rejects addresses that
+    are already taken, interfaces get the next free address when first_host is not provided.
+    :param start: index of the first instance in its name
+    :param naming: format of the instance names, gets name and index (ex: '{name}{index}' -> node1)
+    :param options: extra instance() options (ex: ebs_optimized, cpu_cores, enhanced_networking)
+    :return: list of instances
+    """
+    if first_host is not None and first_host < 4:
+        raise(ValueError('first_host {} is reserved by aws, the first host of a subnet is 4'.format(first_host)))
+    specs = []
+    for subnets, security_groups, gateway_attachment in interfaces:
+        if not isinstance(subnets, list):
+            subnets = [subnets]
+        networks = [ipaddress.ip_network(sn.CidrBlock) for sn in subnets] if first_host is not None else None
+        specs.append((subnets, networks, security_groups, gateway_attachment))
+
+    instances = []
+    for n in range(count):
+        eths = []
+        for subnets, networks, security_groups, gateway_attachment in specs:
+            zone = n % len(subnets)
+            ip = None
+            if networks:
+                host = first_host + (n // len(subnets) if per_subnet else n)
+                # aws reserves the last address of a subnet
+                if host >= networks[zone].num_addresses - 1:
+                    raise(RuntimeError('subnet {} has no room for {} instances starting at host {}'.format(
+                        subnets[zone].title, count, first_host)))
+                ip = str(networks[zone][host])
+            eths.append((subnets[zone], ip, security_groups, gateway_attachment))
+
+        instances.append(instance_with_interfaces(template=template, name=naming.format(name=name, index=start + n),
+                                                  ami=ami, type=type, keypair=keypair, role=role, interfaces=eths,
+                                                  user_data=user_data, placement_group=placement_group,
+                                                  iam_role=iam_role, volume_size=volume_size, tags=tags,
+                                                  allocator=allocator, **options))
+    return instances
+
+
+def launch_template(template, name, ami, type, keypair, security_groups=None, user_data=None, iam_role=None,
+                    volume_size=None, volumes=None):
+    """Create an aws launch template, the instance definition of an auto scaling group.
+
+    :param template: the template to add this launch template too.
+    :param name: name of the launch template
+    :param ami: ami id or ami parameter for the instances
+    :param type: instance type (ex: c4.8xlarge)
+    :param keypair: the keypair to use for the instances
+    :param (list|security_group) security_groups: (optional) security groups of the instances
+    :param user_data: (optional) user data, see instance()
+    :param iam_role: (optional) name or object that points to an IamInstanceRole
+    :param volume_size: (optional) size of the rfs in GB
+    :param volumes: (optional) list of volume() and ephemeral() block devices
+    :return: launch template
+    """
+    instance_types.check(type)
+
+    if isinstance(ami, Parameter):
+        ami = Ref(ami)
+    data = LaunchTemplateData(ImageId=ami, InstanceType=type, KeyName=Ref(keypair))
+
+    if security_groups:
+        if not isinstance(security_groups, list):
+            security_groups = [security_groups]
+        data.SecurityGroupIds = [Ref(sg) for sg in security_groups]
+
+    if iam_role:
+        data.IamInstanceProfile = IamInstanceProfile(Name=iam_role if isinstance(iam_role, str) else Ref(iam_role))
+
+    if volume_size or volumes:
+        data.BlockDeviceMappings = _block_devices(volume_size, volumes, mapping=LaunchTemplateBlockDeviceMapping)
+
+    if user_data:
+        data.UserData = _user_data(user_data)
+
+    return LaunchTemplate(name, template=template, LaunchTemplateData=data)
+
+
+def auto_scaling_group(template, name, size, ami, type, keypair, role, subnets, security_groups=None,
+                       load_balancers=None, user_data=None, placement_group=None, iam_role=None, volume_size=None,
+                       tags=None, volumes=None):
+    """Create a pool of identical instances: a launch template and an auto scaling group of a parameterized size.
+
+    The size is a template parameter (<name>Size) so a pool can be scaled by updating the stack parameter instead of
+    generating a bigger template. The instances get their address by dhcp.
+
+    :param template: the template to add the pool too.
+    :param name: name of the pool
+    :param size: default number of instances
+    :param ami: ami id or ami parameter for the instances
+    :param type: instance type (ex: c4.8xlarge)
+    :param keypair: the keypair to use for the instances
+    :param role: the Role tag of the instances
+    :param subnets: subnets to spread the instances over
+    :param security_groups: (optional) security groups of the instances
+    :param load_balancers: (optional) list of classic load balancers (elb.elastic_lb), application load balancers
+    (elb.app_elb) or target groups to register the instances with
+    :param user_data: (optional) user data, see instance()
+    :param placement_group: (optional) the placement group to put the instances in
+    :param iam_role: (optional) name or object that points to an IamInstanceRole
+    :param volume_size: (optional) size of the rfs in GB
+    :param volumes: (optional) list of volume() and ephemeral() block devices
+    :param tags: (optional) dict of extra tags
+    :return: (tuple) auto scaling group, size parameter
+    """
+    lt = launch_template(template=template, name='{}LaunchTemplate'.format(name), ami=ami, type=type, keypair=keypair,
+                         security_groups=security_groups, user_data=user_data, iam_role=iam_role,
+                         volume_size=volume_size, volumes=volumes)
+    p = template.add_parameter(Parameter('{}Size'.format(name), Type='Number', Default=size, MinValue=0,
+                                         Description='number of {} instances'.format(name)))
+
+    group = autoscaling.AutoScalingGroup(name, template=template)
+    group.LaunchTemplate = autoscaling.LaunchTemplateSpecification(LaunchTemplateId=Ref(lt),
+                                                                   Version=GetAtt(lt, 'LatestVersionNumber'))
+    group.MinSize = Ref(p)
+    group.MaxSize = Ref(p)
+    group.DesiredCapacity = Ref(p)
+    group.VPCZoneIdentifier = [Ref(sn) for sn in subnets]
+    group.Tags = autoscaling.Tags(Name=aws_name(group.title), Role=role, **(tags or {}))
+
+    if placement_group:
+        group.PlacementGroup = Ref(placement_group)
+
+    load_balancer_names, target_groups = [], []
+    for lb in load_balancers or []:
+        if lb.resource_type == 'AWS::ElasticLoadBalancing::LoadBalancer':
+            load_balancer_names.append(Ref(lb))
+        elif lb.resource_type == 'AWS::ElasticLoadBalancingV2::LoadBalancer':
+            # elb.app_elb() forwards to <name>targetgroup
+            target_groups.append(Ref(template.resources['{}targetgroup'.format(lb.title)]))
+        else:
+            target_groups.append(Ref(lb))
+    if load_balancer_names:
+        group.LoadBalancerNames = load_balancer_names
+    if target_groups:
+        group.TargetGroupARNs = target_groups
+    return group, p
 
 
 def nat_gateway(template, public_subnet, gateway_attachement, name='natgateway'):
@@ -1,23 +1,26 @@
-from troposphere import Ref
+from troposphere import GetAtt, Ref
 
 from troposphere import elasticloadbalancing as elb
 from troposphere.elasticloadbalancing import HealthCheck
 
 from troposphere import elasticloadbalancingv2 as elbv2
 
+from . import ec2
+
 
 PROD_OPS_CERTIFICATE = 'arn:aws:acm:eu-west-1:510447007788:certificate/4bffc4c8-90a6-491c-9e4e-cc06a736dd40'
 
 
 def elastic_lb(template, name, instances, subnets, instance_port=443, load_balancer_port=443, instance_proto="HTTPS",
-               load_balancer_proto='HTTPS', securitygroups=None, health_check=None, scheme=None):
+               load_balancer_proto='HTTPS', securitygroups=None, health_check=None, scheme=None, draining_timeout=300):
     """Create an elastic load balancer """
 
     elasticlb = elb.LoadBalancer(name,
                                  template=template,
                                  Subnets=[Ref(r) for r in subnets],
                                  SecurityGroups=[Ref(r) for r in securitygroups],
-                                 ConnectionDrainingPolicy=elb.ConnectionDrainingPolicy(Enabled=True, Timeout=300),
+                                 ConnectionDrainingPolicy=elb.ConnectionDrainingPolicy(Enabled=True,
+                                                                                       Timeout=draining_timeout),
                                  CrossZone=True,
                                  Instances=[Ref(r.title) for r in instances]
                                  )
@@ -78,6 +81,89 @@ def app_elb(template, name, subnets, instances, vpc, instance_port=443, load_bal
     return applb
 
 
+def network_lb(template, name, instances, subnets, instance_port=443, load_balancer_port=443, instance_proto='TCP',
+               load_balancer_proto='TCP', securitygroups=None, health_check=None, scheme=None, cross_zone=True,
+               deregistration_delay=300, preserve_client_ip=None, elastic_ips=False, gateway_attachment=None):
+    """Create a network load balancer, the layer 4 pass through counterpart of elastic_lb().
+
+    The instances are registered in a target group <name>targetgroup (like app_elb()) in the vpc of the subnets.
+
+    :param instance_proto: TCP, UDP, TCP_UDP or TLS
+    :param load_balancer_proto: TCP, UDP, TCP_UDP or TLS. TLS listeners use the PROD_OPS_CERTIFICATE.
+    :param securitygroups: (optional) security groups of the load balancer, these can't be added later on
+    :param health_check: (optional) classic health check (health_check()), translated to the target group
+    :param scheme: (optional) internal or internet-facing (default)
+    :param cross_zone: balance over the instances of all zones instead of the zone of the load balancer node
+    :param deregistration_delay: seconds to drain the connections of a deregistered instance
+    :param preserve_client_ip: (optional) instances see the address of the client instead of the load balancer, the
+    security groups of the instances then need to allow the clients. Defaults to the aws default (enabled).
+    :param elastic_ips: a static elastic ip per subnet (<name><subnet>EIP), internet facing only
+    :param gateway_attachment: internet gateway attachment the elastic ips wait for, required with elastic_ips
+    :return: load balancer
+    """
+    if elastic_ips and scheme == 'internal':
+        raise(ValueError('an internal network load balancer can not have elastic ips'))
+    if elastic_ips and gateway_attachment is None:
+        raise(ValueError('the elastic ips of a network load balancer need the internet gateway attachment'))
+
+    nlb = elbv2.LoadBalancer(name, template=template, Type='network')
+    if elastic_ips:
+        nlb.SubnetMappings = [elbv2.SubnetMapping(SubnetId=Ref(r), AllocationId=GetAtt(ec2.elastic_ip(
+            template=template, name='{}{}EIP'.format(name, r.title), network_interface=None,
+            gateway_attachment=gateway_attachment), 'AllocationId')) for r in subnets]
+    else:
+        nlb.Subnets = [Ref(r) for r in subnets]
+    if securitygroups:
+        nlb.SecurityGroups = [Ref(r) for r in securitygroups]
+    if scheme:
+        nlb.Scheme = scheme
+    nlb.LoadBalancerAttributes = [elbv2.LoadBalancerAttributes(Key='load_balancing.cross_zone.enabled',
+                                                               Value=str(cross_zone).lower())]
+
+    attributes = [elbv2.TargetGroupAttribute(Key='deregistration_delay.timeout_seconds',
+                                             Value=str(deregistration_delay))]
+    if preserve_client_ip is not None:
+        attributes.append(elbv2.TargetGroupAttribute(Key='preserve_client_ip.enabled',
+                                                     Value=str(preserve_client_ip).lower()))
+    targetgroup = elbv2.TargetGroup(title=name + 'targetgroup',
+                                    template=template,
+                                    Port=instance_port,
+                                    Protocol=instance_proto,
+                                    VpcId=subnets[0].VpcId,
+                                    TargetType='instance',
+                                    Targets=[elbv2.TargetDescription(Id=Ref(r)) for r in instances],
+                                    TargetGroupAttributes=attributes,
+                                    **_target_group_health_check(health_check))
+
+    listener = elbv2.Listener(title=(name + 'listener'),
+                              template=template,
+                              DefaultActions=[elbv2.Action(TargetGroupArn=Ref(targetgroup), Type='forward')],
+                              LoadBalancerArn=Ref(nlb),
+                              Port=load_balancer_port,
+                              Protocol=load_balancer_proto,
+                              )
+    if load_balancer_proto == 'TLS':
+        listener.Certificates = [elbv2.Certificate(CertificateArn=PROD_OPS_CERTIFICATE)]
+
+    return nlb
+
+
+def _target_group_health_check(health_check):
+    """Target group properties of a classic health check (ex: TCP:22, HTTPS:443/healthz)"""
+    if health_check is None:
+        return {}
+    protocol, port = health_check.Target.split(':', 1)
+    port, _, path = port.partition('/')
+    properties = dict(HealthCheckProtocol=protocol, HealthCheckPort=port,
+                      HealthCheckIntervalSeconds=health_check.Interval,
+                      HealthCheckTimeoutSeconds=health_check.Timeout,
+                      HealthyThresholdCount=health_check.HealthyThreshold,
+                      UnhealthyThresholdCount=health_check.UnhealthyThreshold)
+    if protocol in ('HTTP', 'HTTPS'):
+        properties['HealthCheckPath'] = '/' + path
+    return properties
+
+
 def health_check(name, target='TCP:22', healthy_threashold=2, unhealthy_threashold=3, interval=30, timeout=3):
     """Classic elb health check"""
     hc = HealthCheck(title=name + 'healthcheck')
@@ -0,0 +1,85 @@
+"""Offline deploy time estimation of a template.
+
+Every resource type gets a typical creation time (CREATION_TIMES). CloudFormation creates independent resources in
+parallel, so the expected wall clock time of a stack create is the weighted critical path of its dependency graph.
+
+usage: python -m pyaws.stacks.estimate stack.json [other.json ...]
+"""
+import sys
+
+from .graph import critical_path, graph, resources_of
+
+
+# typical creation time in seconds per resource type
+CREATION_TIMES = {
+    'AWS::AutoScaling::AutoScalingGroup': 120,
+    'AWS::CloudFormation::Stack': 60,
+    'AWS::CloudFront::Distribution': 1200,
+    'AWS::EC2::EIP': 15,
+    'AWS::EC2::EIPAssociation': 15,
+    'AWS::EC2::Instance': 60,
+    'AWS::EC2::InternetGateway': 15,
+    'AWS::EC2::LaunchTemplate': 5,
+    'AWS::EC2::NatGateway': 150,
+    'AWS::EC2::NetworkAcl': 5,
+    'AWS::EC2::NetworkAclEntry': 5,
+    'AWS::EC2::NetworkInterface': 5,
+    'AWS::EC2::PlacementGroup': 5,
+    'AWS::EC2::Route': 5,
+    'AWS::EC2::RouteTable': 5,
+    'AWS::EC2::SecurityGroup': 5,
+    'AWS::EC2::Subnet': 5,
+    'AWS::EC2::SubnetNetworkAclAssociation': 5,
+    'AWS::EC2::SubnetRouteTableAssociation': 5,
+    'AWS::EC2::VPC': 15,
+    'AWS::EC2::VPCGatewayAttachment': 15,
+    'AWS::ElasticLoadBalancing::LoadBalancer': 90,
+    'AWS::ElasticLoadBalancingV2::Listener': 5,
+    'AWS::ElasticLoadBalancingV2::LoadBalancer': 180,
+    'AWS::ElasticLoadBalancingV2::TargetGroup': 5,
+    'AWS::IAM::AccessKey': 5,
+    'AWS::IAM::InstanceProfile': 120,
+    'AWS::IAM::Role': 15,
+    'AWS::IAM::User': 10,
+    'AWS::Route53::RecordSet': 45,
+}
+
+DEFAULT_CREATION_TIME = 10
+
+
+def estimate(template, times=None, default=DEFAULT_CREATION_TIME):
+    """Estimate the time it takes to create a stack from a template.
+
+    :param template: troposphere template, template dict or path to a json template
+    :param times: (optional) dict of resource type -> seconds that overrides/extends CREATION_TIMES
+    :param default: creation time of resource types that are not in the table
+    :return: (tuple) total seconds, critical path as a list of (title, resource type, seconds)
+    """
+    resources = resources_of(template)
+    table = dict(CREATION_TIMES, **(times or {}))
+
+    def weight(title):
+        return table.get(resources[title].get('Type'), default)
+
+    total, path = critical_path(graph({'Resources': resources}), weight=weight)
+    return total, [(title, resources[title].get('Type'), weight(title)) for title in path]
+
+
+def dominant(path, top=3):
+    """The resources that take the largest share of a critical path (as returned by estimate())"""
+    return sorted(path, key=lambda p: -p[2])[:top]
+
+
+def report(template, times=None):
+    """Human readable version of estimate()"""
+    total, path = estimate(template, times=times)
+    lines = ['estimated create time: {}m{:02d}s'.format(int(total) // 60, int(total) % 60)]
+    lines += ['  {:>6}s {:<45} {}'.format(seconds, title, resource_type) for title, resource_type, seconds in path]
+    lines.append('dominated by: {}'.format(', '.join(title for title, _, _ in dominant(path))))
+    return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    for f in sys.argv[1:] or ['stack.json']:
+        print('* {}'.format(f))
+        print(report(f))
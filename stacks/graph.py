@@ -0,0 +1,196 @@
+"""Resource dependency graph of a template.
+
+Nodes are the resources of a template, an edge a -> b means a can only be created after b. Edges come from Ref,
+GetAtt (implicit dependencies) and DependsOn (explicit dependencies). All functions run in linear time in the number
+of resources and references.
+
+usage: python -m pyaws.stacks.graph stack.json
+"""
+import json
+import re
+import sys
+from collections import deque
+
+
+def resources_of(template):
+    """Resources (json) of a troposphere template, a template dict or a path to a json template"""
+    if isinstance(template, str):
+        with open(template) as f:
+            template = json.load(f)
+    if not isinstance(template, dict):
+        template = template.to_dict()
+    return template.get('Resources', {})
+
+
+# ${Name} or ${Name.Attribute} in a Fn::Sub string, ${!Literal} is not a variable
+SUB_VARIABLE = re.compile(r'\$\{([^!}][^}]*)\}')
+
+
+def _sub(value):
+    """(string, variables) of a Fn::Sub"""
+    if isinstance(value, list):
+        return value[0], value[1] if len(value) > 1 else {}
+    return value, {}
+
+
+def sub_references(value):
+    """Yield the (kind, name) references in the strings of the Fn::Sub functions in json.
+
+    ${Name} is a Ref and ${Name.Attribute} a GetAtt, unless Name is one of the variables of the Fn::Sub.
+    """
+    stack = [value]
+    while stack:
+        v = stack.pop()
+        if isinstance(v, dict):
+            if 'Fn::Sub' in v and len(v) == 1:
+                text, variables = _sub(v['Fn::Sub'])
+                for name in SUB_VARIABLE.findall(text if isinstance(text, str) else ''):
+                    if name.split('.')[0] not in variables:
+                        yield ('GetAtt', name.split('.')[0]) if '.' in name else ('Ref', name)
+            stack.extend(v.values())
+        elif isinstance(v, list):
+            stack.extend(v)
+
+
+def references(value):
+    """Yield all (kind, name) references in the json (dict) representation of a resource.
+
+    kind is one of 'Ref' or 'GetAtt', variables in Fn::Sub strings count as well (see sub_references()). DependsOn
+    is not part of the properties, see depends_on().
+    """
+    stack = [value]
+    while stack:
+        v = stack.pop()
+        if isinstance(v, dict):
+            if 'Ref' in v and len(v) == 1:
+                yield 'Ref', v['Ref']
+            elif 'Fn::GetAtt' in v and len(v) == 1:
+                name = v['Fn::GetAtt']
+                yield 'GetAtt', name[0] if isinstance(name, list) else name.split('.')[0]
+            elif 'Fn::Sub' in v and len(v) == 1:
+                for reference in sub_references(v):
+                    yield reference
+                stack.append(_sub(v['Fn::Sub'])[1])
+            else:
+                stack.extend(v.values())
+        elif isinstance(v, list):
+            stack.extend(v)
+
+
+def depends_on(resource):
+    """DependsOn of a resource json (dict) as a list"""
+    d = resource.get('DependsOn', [])
+    return [d] if not isinstance(d, list) else d
+
+
+def graph(template):
+    """Build the dependency graph of a template.
+
+    :param template: troposphere template, template dict or path to a json template
+    :return: (dict) title -> dict of dependency title -> set of edge kinds ('Ref', 'GetAtt', 'DependsOn')
+    """
+    resources = resources_of(template)
+    g = {}
+    for title, resource in resources.items():
+        deps = g[title] = {}
+        for kind, name in references(resource):
+            if name in resources:  # skip parameters and pseudo parameters
+                deps.setdefault(name, set()).add(kind)
+        for name in depends_on(resource):
+            deps.setdefault(name, set()).add('DependsOn')
+    return g
+
+
+def _dependents(g):
+    dependents = {title: [] for title in g}
+    for title, deps in g.items():
+        for dep in deps:
+            if dep not in g:
+                raise(LookupError('{} depends on unknown resource {}'.format(title, dep)))
+            dependents[dep].append(title)
+    return dependents
+
+
+def topological_order(g):
+    """Resources in creation order (kahn). Raises a RuntimeError on a dependency cycle."""
+    dependents = _dependents(g)
+    pending = {title: len(deps) for title, deps in g.items()}
+    queue = deque(sorted(title for title, n in pending.items() if n == 0))
+    order = []
+    while queue:
+        title = queue.popleft()
+        order.append(title)
+        for d in dependents[title]:
+            pending[d] -= 1
+            if pending[d] == 0:
+                queue.append(d)
+    if len(order) != len(g):
+        raise(RuntimeError('dependency cycle between {}'.format(
+            ', '.join(sorted(title for title, n in pending.items() if n)))))
+    return order
+
+
+def layers(g):
+    """Group resources in layers. All resources in a layer can be created in parallel once the previous layers exist.
+
+    :param g: graph()
+    :return: (list) of sorted lists of titles
+    """
+    depth = {}
+    for title in topological_order(g):
+        depth[title] = 1 + max([depth[dep] for dep in g[title]] or [-1])
+    result = [[] for _ in range(max(depth.values()) + 1)] if depth else []
+    for title in sorted(depth):
+        result[depth[title]].append(title)
+    return result
+
+
+def critical_path(g, weight=None):
+    """Longest (weighted) chain of dependencies in the graph.
+
+    :param g: graph()
+    :param weight: (optional) function title -> cost of a resource. Defaults to 1 per resource.
+    :return: (tuple) total cost, list of titles from the first to the last resource to be created
+    """
+    weight = weight or (lambda title: 1)
+    cost, previous = {}, {}
+    for title in topological_order(g):
+        best = max(g[title], key=lambda dep: cost[dep]) if g[title] else None
+        cost[title] = weight(title) + (cost[best] if best else 0)
+        previous[title] = best
+    if not cost:
+        return 0, []
+
+    title = max(sorted(cost), key=lambda t: cost[t])
+    total, path = cost[title], []
+    while title:
+        path.append(title)
+        title = previous[title]
+    return total, path[::-1]
+
+
+def redundant_depends_on(g):
+    """DependsOn edges that are already implied by a Ref or GetAtt on the same resource.
+
+    :param g: graph()
+    :return: (list) of (title, dependency) tuples
+    """
+    return sorted((title, dep) for title, deps in g.items() for dep, kinds in deps.items()
+                  if 'DependsOn' in kinds and len(kinds) > 1)
+
+
+def describe(template):
+    """Human readable overview of the layers, critical path and redundant DependsOn of a template"""
+    g = graph(template)
+    ls = layers(g)
+    lines = ['{} resources in {} layers'.format(len(g), len(ls))]
+    lines += ['  layer {:>3}: {}'.format(i, ', '.join(layer)) for i, layer in enumerate(ls)]
+    length, path = critical_path(g)
+    lines.append('critical path ({}): {}'.format(length, ' -> '.join(path)))
+    for title, dep in redundant_depends_on(g):
+        lines.append('redundant DependsOn: {} -> {}'.format(title, dep))
+    return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    print(describe(sys.argv[1] if len(sys.argv) > 1 else 'stack.json'))
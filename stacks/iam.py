@@ -1,15 +1,20 @@
-from troposphere import Ref, GetAtt
+from troposphere import Ref, GetAtt, encode_to_dict
 from troposphere.iam import Role, Policy, InstanceProfile, User, AccessKey
 
+import fnmatch
+import importlib
+import ipaddress
+import json
+import weakref
+
 import awacs.aws
 from awacs.aws import Allow, Deny, Principal, Action  # noqa
 from awacs.aws import Condition, IpAddress  # noqa
-import awacs.ec2 as ec2  # noqa
-import awacs.s3 as s3  # noqa
 
 from .tools import aws_name
 from .template import add_output
 from .security import ALL_CISCO_CIDRS
+from .graph import resources_of
 
 
 ASSUME_POLICY_DOCUMENT = awacs.aws.Policy(Version='2012-10-17',
@@ -19,27 +24,248 @@ ASSUME_POLICY_DOCUMENT = awacs.aws.Policy(Version='2012-10-17',
                                                                          Action=[Action('sts', 'AssumeRole')])])
 
 
-def policy(name, statements):
+# aws quotas of the policy characters, whitespace is not counted: all inline policies of a role, user or group
+# together and a managed policy
+POLICY_QUOTAS = dict(role=10240, user=2048, group=5120, managed=6144)
+
+# read only actions that compact_policy(read_wildcards=True) collapses to <service>:<prefix>*
+READ_PREFIXES = ('Describe', 'Get', 'List')
+
+# condition operators with cidr values
+IP_OPERATORS = ('IpAddress', 'NotIpAddress')
+
+# awacs.ec2 and awacs.s3 define thousands of actions, they are only imported when iam.ec2 / iam.s3 is used
+LAZY_MODULES = {'ec2': 'awacs.ec2', 's3': 'awacs.s3'}
+
+
+def __getattr__(name):
+    if name in LAZY_MODULES:
+        module = importlib.import_module(LAZY_MODULES[name])
+        globals()[name] = module
+        return module
+    raise(AttributeError('module {!r} has no attribute {!r}'.format(__name__, name)))
+
+
+def policy(name, statements, compact=False):
+    """Inline policy with a list of statements, compacted by compact_policy() to a dict document when compact is True"""
     if not isinstance(statements, list):
         statements = [statements]
     policy = Policy()
     policy.PolicyName = aws_name(name)
     policy.PolicyDocument = awacs.aws.Policy(Statement=statements)
+    if compact:
+        policy.PolicyDocument = compact_policy(policy.PolicyDocument)
     return policy
 
 
-def role(template, name, policies):
+def _list(value):
+    return value if isinstance(value, list) else [value]
+
+
+def _collapse_cidrs(values):
+    """Collapse a list of cidrs, a collapsed network takes the place of the first cidr in it. Without anything to
+    collapse the cidrs are returned as they are."""
+    networks = [ipaddress.ip_network(v, strict=False) for v in values]
+    collapsed = []
+    for version in (4, 6):
+        for network in ipaddress.collapse_addresses(n for n in networks if n.version == version):
+            members = [i for i, n in enumerate(networks) if n.version == version and n.subnet_of(network)]
+            collapsed.append((members[0], values[members[0]] if networks[members[0]] == network else str(network)))
+    return [v for i, v in sorted(collapsed)]
+
+
+def _compact_condition(condition):
+    """Condition with duplicate values removed and the cidrs of ip conditions collapsed"""
+    compacted = {}
+    for operator, keys in condition.items():
+        compacted[operator] = {}
+        for key, values in keys.items():
+            if not isinstance(values, list):
+                compacted[operator][key] = values
+                continue
+            if operator.split(':')[-1] in IP_OPERATORS and all(isinstance(v, str) for v in values):
+                values = _collapse_cidrs(values)
+            else:
+                values = [v for i, v in enumerate(values) if v not in values[:i]]
+            compacted[operator][key] = values
+    return compacted
+
+
+def _compact_actions(actions, read_wildcards=False, service_wildcards=()):
+    names = []
+    for a in actions:
+        if a.lower() not in [n.lower() for n in names]:
+            names.append(a)
+
+    def service(a):
+        return a.split(':')[0].lower() if ':' in a else None
+
+    wildcards = [a for a in names if '*' in a or '?' in a]
+    for s in service_wildcards:
+        if any(service(a) == s.lower() for a in names):
+            wildcards.append('{}:*'.format(s))
+    if read_wildcards:
+        for prefix in READ_PREFIXES:
+            counts = {}
+            for a in names:
+                if ':' in a and a.split(':')[1].startswith(prefix):
+                    counts[service(a)] = counts.get(service(a), 0) + 1
+            wildcards += ['{}:{}*'.format(s, prefix) for s, count in sorted(counts.items()) if count > 1]
+
+    # an action is replaced by the broadest wildcard that matches it, in the place of the first action it replaces
+    compacted = []
+    for a in names:
+        a = min([w for w in wildcards if fnmatch.fnmatchcase(a.lower(), w.lower())] + [a], key=len)
+        if a.lower() not in [c.lower() for c in compacted]:
+            compacted.append(a)
+    return compacted
+
+
+def compact_policy(document, read_wildcards=False, service_wildcards=()):
+    """Compact a policy document.
+
+    Statements with the same effect, resources and condition are merged, duplicate actions and actions matched by a
+    wildcard of the same statement are dropped and the cidrs of IpAddress conditions are collapsed (ex:
+    ALL_CISCO_CIDRS). Statements with a Sid, Principal, NotAction or NotResource are kept as is.
+
+    :param document: awacs or dict policy document
+    :param read_wildcards: collapse 2 or more Describe, Get or List actions of a service to <service>:Describe*, ...
+    :param service_wildcards: services of which all actions are collapsed to <service>:* (ex: ['ec2'])
+    :return: (dict) the compacted document
+    """
+    document = encode_to_dict(document)
+    statements, merged = [], {}
+    for s in _list(document.get('Statement', [])):
+        s = dict(s)
+        if 'Condition' in s:
+            s['Condition'] = _compact_condition(s['Condition'])
+        if set(s) - {'Effect', 'Action', 'Resource', 'Condition'} or 'Action' not in s or 'Resource' not in s:
+            statements.append(s)
+            continue
+        resources = [r for i, r in enumerate(_list(s['Resource'])) if r not in _list(s['Resource'])[:i]]
+        # conditions with the same values in another order are the same condition
+        condition = {operator: {k: sorted(_list(v), key=str) for k, v in keys.items()}
+                     for operator, keys in s.get('Condition', {}).items()}
+        key = json.dumps([s['Effect'], sorted(json.dumps(r, sort_keys=True) for r in resources), condition],
+                         sort_keys=True)
+        if key in merged:
+            merged[key]['Action'] += _list(s['Action'])
+            continue
+        s['Action'], s['Resource'] = list(_list(s['Action'])), resources
+        merged[key] = s
+        statements.append(s)
+    for s in merged.values():
+        s['Action'] = _compact_actions(s['Action'], read_wildcards, service_wildcards)
+    return dict(document, Statement=statements)
+
+
+def policy_size(*documents):
+    """Characters of policy documents (awacs, dict or Policy) the way aws counts them: without whitespace"""
+    size = 0
+    for d in documents:
+        if isinstance(d, Policy):
+            d = d.PolicyDocument
+        size += len(json.dumps(encode_to_dict(d), separators=(',', ':')))
+    return size
+
+
+def check_policy_size(kind, name, policies):
+    """Raise a ValueError when the policies of a role, user, group or managed policy exceed the quota"""
+    size = policy_size(*_list(policies))
+    if size > POLICY_QUOTAS[kind]:
+        raise(ValueError('policies of {} {} have {} characters, the quota is {}'.format(
+            kind, name, size, POLICY_QUOTAS[kind])))
+    return size
+
+
+def policy_sizes(template):
+    """Size of the policies of the iam resources of a template against their quota.
+
+    Intrinsic functions are counted as they are in the template, the arn a Ref turns into can be longer.
+
+    :param template: troposphere template, template dict or path to a json template
+    :return: (list) of (title, kind, size, quota)
+    """
+    kinds = {'AWS::IAM::Role': 'role', 'AWS::IAM::User': 'user', 'AWS::IAM::Group': 'group',
+             'AWS::IAM::ManagedPolicy': 'managed'}
+    resources = resources_of(template)
+    documents = {}
+    for title, r in resources.items():
+        p = r.get('Properties', {})
+        if r['Type'] == 'AWS::IAM::ManagedPolicy':
+            documents[title] = [p['PolicyDocument']]
+        elif r['Type'] in kinds:
+            documents[title] = [inline['PolicyDocument'] for inline in p.get('Policies', [])]
+    # AWS::IAM::Policy resources count for the inline policies of their roles, users and groups
+    for r in resources.values():
+        if r['Type'] == 'AWS::IAM::Policy':
+            for key in ('Roles', 'Users', 'Groups'):
+                for principal in r['Properties'].get(key, []):
+                    if isinstance(principal, dict) and principal.get('Ref') in documents:
+                        documents[principal['Ref']].append(r['Properties']['PolicyDocument'])
+    return [(title, kinds[resources[title]['Type']], policy_size(*d), POLICY_QUOTAS[kinds[resources[title]['Type']]])
+            for title, d in sorted(documents.items())]
+
+
+# id(template) -> {key: title of a role or instance profile}, see _registered(). Not a WeakKeyDictionary: troposphere
+# hashes a template by its json, which changes with every resource that is added. Titles and not the resources
+# themselves, a resource refers to its template and would keep it alive.
+_registry = {}
+
+
+def _registered(template, keys, title, create):
+    """The resource that was created for the first key in a template before, otherwise create() it for all keys"""
+    if id(template) not in _registry:
+        _registry[id(template)] = {}
+        weakref.finalize(template, _registry.pop, id(template), None)
+    titles = _registry[id(template)]
+    if titles.get(keys[0]) in template.resources:
+        return template.resources[titles[keys[0]]]
+    if title in template.resources:
+        raise(ValueError('{} {} is already in the template with other permissions'.format(keys[0][0], title)))
+    r = create()
+    for key in keys:
+        if titles.get(key) not in template.resources:
+            titles[key] = r.title
+    return r
+
+
+def _permissions(policies):
+    """Key of what a list of policies allows: policy names and the order of statements and actions don't matter"""
+    statements = set()
+    for p in policies:
+        for s in compact_policy(p.PolicyDocument)['Statement']:
+            if 'Action' in s:
+                s = dict(s, Action=sorted(a.lower() for a in _list(s['Action'])))
+            statements.add(json.dumps(s, sort_keys=True))
+    return tuple(sorted(statements))
+
+
+def role(template, name, policies, share=False):
+    """Role that ec2 instances can assume.
+
+    Asking a template twice for a role with the same name and permissions (see _permissions()) returns the same role,
+    the same name with other permissions raises a ValueError.
+
+    :param share: return the role of the template with the same permissions, whatever its name
+    """
     if policies:
         if not isinstance(policies, list):
             policies = [policies]
+        check_policy_size('role', name, policies)
+
+    def create():
+        role = Role(name, template=template)
+        role.RoleName = aws_name(name)
+        role.AssumeRolePolicyDocument = ASSUME_POLICY_DOCUMENT
+        role.Path = '/'
+        if policies:
+            role.Policies = policies
+        return role
 
-    role = Role(name, template=template)
-    role.RoleName = aws_name(name)
-    role.AssumeRolePolicyDocument = ASSUME_POLICY_DOCUMENT
-    role.Path = '/'
-    if policies:
-        role.Policies = policies
-    return role
+    permissions = _permissions(policies or [])
+    keys = [('role', permissions), ('role', permissions, name)]
+    return _registered(template, keys if share else keys[::-1], name, create)
 
 
 def statement(actions, resource='*', effect=awacs.aws.Allow, condition=None):
@@ -52,26 +278,36 @@ def statement(actions, resource='*', effect=awacs.aws.Allow, condition=None):
     return s
 
 
-def role_with_statements(template, name, statemenets):
+def role_with_statements(template, name, statemenets, share=False):
     p = policy(name='{}policy'.format(name), statements=statemenets)
-    r = role(template=template, name=name, policies=p)
+    r = role(template=template, name=name, policies=p, share=share)
     return r
 
 
-def instance_profile(template, name, role):
-    profile = InstanceProfile(name, template=template)
-    profile.InstanceProfileName = aws_name(name)
-    # per awacs documentation a max of 1 role can be defined
-    profile.Roles = [Ref(role)]
-    return profile
+def instance_profile(template, name, role, share=False):
+    """Instance profile of a role, the same name and role return the same profile.
+
+    :param share: return the profile of the template with the same role, whatever its name
+    """
+    def create():
+        profile = InstanceProfile(name, template=template)
+        profile.InstanceProfileName = aws_name(name)
+        # per awacs documentation a max of 1 role can be defined
+        profile.Roles = [Ref(role)]
+        return profile
+
+    keys = [('profile', role.title), ('profile', role.title, name)]
+    return _registered(template, keys if share else keys[::-1], name, create)
 
 
 def user(template, user_name, policies=None, generate_key_serial=False):
-    user = User(template=template, title=user_name.replace('_', ''))
-    user.UserName = user_name
     if policies:
         if not isinstance(policies, list):
             policies = [policies]
+        check_policy_size('user', user_name, policies)
+    user = User(template=template, title=user_name.replace('_', ''))
+    user.UserName = user_name
+    if policies:
         user.Policies = policies
     if generate_key_serial is not False:
         key(template=template, user=user, serial=generate_key_serial)
@@ -108,44 +344,49 @@ class Policies(object):
         return jenkins
 
 
+def _full_access(service):
+    """Statements that allow all actions of a service, new for every role"""
+    return [statement(Action(service, '*'))]
+
+
 class Roles(object):
     @staticmethod
-    def ec2_full(template, name):
-        role = role_with_statements(template=template, name=name, statemenets=[statement(Action('ec2', '*'))])
+    def ec2_full(template, name, share=False):
+        role = role_with_statements(template=template, name=name, statemenets=_full_access('ec2'), share=share)
         return role
 
     @staticmethod
-    def s3_full(template, name):
-        role = role_with_statements(template=template, name=name, statemenets=[statement(Action('s3', '*'))])
+    def s3_full(template, name, share=False):
+        role = role_with_statements(template=template, name=name, statemenets=_full_access('s3'), share=share)
         return role
 
     @staticmethod
-    def ecr_full(template, name):
-        role = role_with_statements(template=template, name=name, statemenets=[statement(Action('ecr', '*'))])
+    def ecr_full(template, name, share=False):
+        role = role_with_statements(template=template, name=name, statemenets=_full_access('ecr'), share=share)
         return role
 
 
 class InstanceProfiles(object):
     @staticmethod
-    def packer(template, name='packerinstanceprofile'):
-        role = Roles.ec2_full(template=template, name='{}role'.format(name))
-        profile = instance_profile(template=template, name=name, role=role)
+    def packer(template, name='packerinstanceprofile', share=False):
+        role = Roles.ec2_full(template=template, name='{}role'.format(name), share=share)
+        profile = instance_profile(template=template, name=name, role=role, share=share)
         return profile
 
     @staticmethod
-    def ec2_full(template, name='ec2fullinstanceprofile'):
-        role = Roles.ec2_full(template=template, name='{}role'.format(name))
-        profile = instance_profile(template=template, name=name, role=role)
+    def ec2_full(template, name='ec2fullinstanceprofile', share=False):
+        role = Roles.ec2_full(template=template, name='{}role'.format(name), share=share)
+        profile = instance_profile(template=template, name=name, role=role, share=share)
         return profile
 
     @staticmethod
-    def s3_full(template, name='s3fullinstanceprofile'):
-        role = Roles.s3_full(template=template, name='{}role'.format(name))
-        profile = instance_profile(template=template, name=name, role=role)
+    def s3_full(template, name='s3fullinstanceprofile', share=False):
+        role = Roles.s3_full(template=template, name='{}role'.format(name), share=share)
+        profile = instance_profile(template=template, name=name, role=role, share=share)
         return profile
 
     @staticmethod
-    def ecr_full(template, name='ecrfullinstanceprofile'):
-        role = Roles.ecr_full(template=template, name='{}role'.format(name))
-        profile = instance_profile(template=template, name=name, role=role)
+    def ecr_full(template, name='ecrfullinstanceprofile', share=False):
+        role = Roles.ecr_full(template=template, name='{}role'.format(name), share=share)
+        profile = instance_profile(template=template, name=name, role=role, share=share)
         return profile
@@ -0,0 +1,187 @@
+"""Offline evaluation of iam identity policies, an in process simulate-principal-policy.
+
+An Evaluator indexes the statements of policy documents (awacs, dict or troposphere Policy) by the service of their
+actions and compiles their wildcards to regular expressions once. evaluate() returns the decision aws would make
+based on these policies: an explicit deny wins over an allow, no matching allow is an implicit deny.
+
+Supported conditions: IpAddress, NotIpAddress, String(Not)Equals(IgnoreCase), String(Not)Like and Bool, also with
+IfExists. Context keys that are not given make a condition false, unless it is an IfExists or a negated (Not)
+condition. Resources that are intrinsic functions (Ref, Join, ...) can't be resolved offline, they match no resource.
+
+ex:
+    evaluator = iam_simulator.evaluators(t)['jenkins']
+    assert evaluator.allowed('ec2:DescribeImages', context={'aws:SourceIp': '173.38.1.1'})
+"""
+import functools
+import ipaddress
+import re
+
+from troposphere import encode_to_dict
+from troposphere.iam import Policy
+
+from .graph import resources_of
+
+
+ALLOWED = 'allowed'
+EXPLICIT_DENY = 'explicitDeny'
+IMPLICIT_DENY = 'implicitDeny'
+
+
+@functools.lru_cache(maxsize=4096)
+def _compile(patterns, ignore_case):
+    """One regular expression for a tuple of iam wildcard patterns (* and ?)"""
+    expressions = ['.*'.join('.'.join(re.escape(part) for part in piece.split('?')) for piece in p.split('*'))
+                   for p in patterns]
+    return re.compile('(?:{})\\Z'.format('|'.join(expressions)), re.IGNORECASE if ignore_case else 0)
+
+
+def _list(value):
+    return value if isinstance(value, list) else [value]
+
+
+def _networks(values):
+    return tuple(ipaddress.ip_network(v, strict=False) for v in values)
+
+
+def _ip_in(value, networks):
+    address = ipaddress.ip_address(value)
+    return any(address in n for n in networks)
+
+
+# operator -> (prepare the policy values, test a context value against them)
+OPERATORS = {
+    'IpAddress': (_networks, _ip_in),
+    'StringEquals': (frozenset, lambda value, values: value in values),
+    'StringEqualsIgnoreCase': (lambda values: frozenset(v.lower() for v in values),
+                               lambda value, values: value.lower() in values),
+    'StringLike': (lambda values: _compile(tuple(values), False), lambda value, pattern: bool(pattern.match(value))),
+    'Bool': (lambda values: frozenset(str(v).lower() for v in values),
+             lambda value, values: str(value).lower() in values),
+}
+NEGATIONS = {'NotIpAddress': 'IpAddress', 'StringNotEquals': 'StringEquals',
+             'StringNotEqualsIgnoreCase': 'StringEqualsIgnoreCase', 'StringNotLike': 'StringLike'}
+
+
+def _condition(condition):
+    """Compile a condition block to a list of (context key, test, values, negate, if exists)"""
+    tests = []
+    for operator, keys in condition.items():
+        name = operator[:-len('IfExists')] if operator.endswith('IfExists') else operator
+        negate = name in NEGATIONS
+        if NEGATIONS.get(name, name) not in OPERATORS:
+            raise(ValueError('unsupported condition operator {}'.format(operator)))
+        prepare, test = OPERATORS[NEGATIONS.get(name, name)]
+        for key, values in keys.items():
+            tests.append((key.lower(), test, prepare(_list(values)), negate, name != operator))
+    return tests
+
+
+class _Statement(object):
+    def __init__(self, s):
+        self.allow = s['Effect'] == 'Allow'
+        self.not_action = 'NotAction' in s
+        self.actions = _compile(tuple(_list(s.get('NotAction', s.get('Action', [])))), True)
+        self.not_resource = 'NotResource' in s
+        resources = _list(s.get('NotResource', s.get('Resource', [])))
+        self.resources = _compile(tuple(r for r in resources if isinstance(r, str)), False)
+        self.conditions = _condition(s.get('Condition', {}))
+
+    def matches(self, action, resource, context):
+        if bool(self.actions.match(action)) == self.not_action:
+            return False
+        if bool(self.resources.match(resource)) == self.not_resource:
+            return False
+        for key, test, values, negate, if_exists in self.conditions:
+            if key not in context:
+                # a missing key makes the base operator false, so a negated operator true
+                if not (if_exists or negate):
+                    return False
+                continue
+            if any(test(v, values) for v in _list(context[key])) == negate:
+                return False
+        return True
+
+
+def _statements(document):
+    if isinstance(document, Policy):
+        document = document.PolicyDocument
+    document = encode_to_dict(document)
+    if 'Effect' in document:
+        return [document]
+    return _list(document.get('Statement', []))
+
+
+class Evaluator(object):
+    """Decisions of the identity policies of a principal.
+
+    :param documents: policy documents (awacs, dict or troposphere Policy) or single statements
+    """
+
+    def __init__(self, *documents):
+        # service -> statements with actions of the service, statements with wildcard services or NotAction in None
+        self.index = {None: []}
+        for document in documents:
+            for s in _statements(document):
+                statement = _Statement(s)
+                services = {a.split(':')[0].lower() if ':' in a else '*' for a in _list(s.get('Action', []))}
+                if 'NotAction' in s or any('*' in service or '?' in service for service in services):
+                    self.index[None].append(statement)
+                    continue
+                for service in services:
+                    self.index.setdefault(service, []).append(statement)
+
+    def evaluate(self, action, resource='*', context=None):
+        """Decision for an action on a resource.
+
+        :param action: ex: ec2:DescribeInstances
+        :param resource: arn of the resource, * for actions that don't support resources
+        :param context: dict of condition keys, ex: {'aws:SourceIp': '10.0.0.1'}
+        :return: 'allowed', 'explicitDeny' or 'implicitDeny'
+        """
+        context = {k.lower(): v for k, v in (context or {}).items()}
+        decision = IMPLICIT_DENY
+        for statements in (self.index.get(action.split(':')[0].lower(), []), self.index[None]):
+            for s in statements:
+                if s.matches(action, resource, context):
+                    if not s.allow:
+                        return EXPLICIT_DENY
+                    decision = ALLOWED
+        return decision
+
+    def allowed(self, action, resource='*', context=None):
+        return self.evaluate(action, resource, context) == ALLOWED
+
+
+def evaluators(template):
+    """Evaluator per role, user and instance profile of a template.
+
+    Roles and users get their inline policies, the AWS::IAM::Policy resources that refer to them and the managed
+    policies of the template in their ManagedPolicyArns. An instance profile gets the policies of its roles.
+
+    :param template: troposphere template, template dict or path to a json template
+    :return: (dict) title -> Evaluator
+    """
+    resources = resources_of(template)
+
+    def ref(value):
+        return value.get('Ref') if isinstance(value, dict) else None
+
+    documents = {}
+    for title, r in resources.items():
+        if r['Type'] in ('AWS::IAM::Role', 'AWS::IAM::User'):
+            p = r.get('Properties', {})
+            documents[title] = [inline['PolicyDocument'] for inline in p.get('Policies', [])]
+            documents[title] += [resources[ref(arn)]['Properties']['PolicyDocument']
+                                 for arn in p.get('ManagedPolicyArns', []) if ref(arn) in resources]
+    for r in resources.values():
+        if r['Type'] == 'AWS::IAM::Policy':
+            for principal in r['Properties'].get('Roles', []) + r['Properties'].get('Users', []):
+                if ref(principal) in documents:
+                    documents[ref(principal)].append(r['Properties']['PolicyDocument'])
+
+    result = {title: Evaluator(*d) for title, d in documents.items()}
+    for title, r in resources.items():
+        if r['Type'] == 'AWS::IAM::InstanceProfile':
+            result[title] = Evaluator(*[d for role in r['Properties'].get('Roles', [])
+                                        for d in documents.get(ref(role), [])])
+    return result
@@ -0,0 +1,116 @@
+"""Offline catalog of ec2 instance types (instance_types.csv).
+
+Per type: vcpu, physical cores, memory (GiB), max network interfaces (enis), private ips per interface, network
+bandwidth (Gbps, burst means 'up to'), ena and intel 82599 sr-iov enhanced networking, ebs optimization (default,
+supported or no), cluster placement group support and whether the type is current generation. aws only publishes
+Low/Moderate/High for older types, these are listed as 0.3/0.5/1 Gbps.
+
+The catalog is read on first use.
+"""
+import csv
+import os
+import warnings
+from collections import namedtuple
+
+
+CATALOG = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance_types.csv')
+
+InstanceType = namedtuple('InstanceType', 'name vcpu cores memory enis ips_per_eni network burst ena sriov '
+                                          'ebs_optimized cluster current')
+
+
+class PreviousGenerationWarning(UserWarning):
+    """Warning for instance types that aws lists as previous generation"""
+
+
+_catalog = None
+_warned = set()
+
+
+def _row(row):
+    def flag(name):
+        return row[name] == 'yes'
+    return InstanceType(name=row['type'], vcpu=int(row['vcpu']), cores=int(row['cores']),
+                        memory=float(row['memory']), enis=int(row['enis']), ips_per_eni=int(row['ips_per_eni']),
+                        network=float(row['network']), burst=flag('burst'), ena=flag('ena'), sriov=flag('sriov'),
+                        ebs_optimized=row['ebs_optimized'], cluster=flag('cluster'), current=flag('current'))
+
+
+def catalog():
+    """(dict) instance type name -> InstanceType"""
+    global _catalog
+    if _catalog is None:
+        with open(CATALOG) as f:
+            _catalog = {t.name: t for t in map(_row, csv.DictReader(f))}
+    return _catalog
+
+
+def get(name):
+    """InstanceType of a type name, None for types that are not in the catalog (or parameters)"""
+    return catalog().get(name) if isinstance(name, str) else None
+
+
+def suggest(name, count=3):
+    """Current generation types with at least the vcpu and memory of a type and more network bandwidth.
+
+    :return: (list) of type names, the smallest and then the fastest first
+    """
+    t = get(name)
+    if t is None:
+        return []
+    candidates = [c for c in catalog().values() if c.current and c.vcpu >= t.vcpu and c.memory >= t.memory and
+                  c.network > t.network]
+    return [c.name for c in sorted(candidates, key=lambda c: (c.vcpu, -c.network, c.memory, c.name))[:count]]
+
+
+def check(name, interfaces=0):
+    """Validate an instance type.
+
+    Raises a ValueError when the type can't have that many network interfaces and warns (once per type) for
+    previous generation types. Types that are not in the catalog are not checked.
+
+    :param name: instance type name (ex: c4.2xlarge)
+    :param interfaces: number of network interfaces of the instance
+    :return: InstanceType or None
+    """
+    t = get(name)
+    if t is None:
+        return None
+    if interfaces > t.enis:
+        raise(ValueError('{} supports {} network interfaces, {} given'.format(name, t.enis, interfaces)))
+    if not t.current and name not in _warned:
+        _warned.add(name)
+        warnings.warn('{} is a previous generation instance type, consider {}'.format(name, ', '.join(suggest(name))),
+                      PreviousGenerationWarning, stacklevel=3)
+    return t
+
+
+def check_options(name, ebs_optimized=False, placement_strategy=None, cpu_cores=None, threads_per_core=None,
+                  enhanced_networking=None):
+    """Validate instance options against the capabilities of its type. Raises a ValueError on the first problem.
+
+    :param name: instance type name (ex: c4.2xlarge). Types that are not in the catalog are not checked.
+    :param ebs_optimized: the instance is ebs optimized
+    :param placement_strategy: strategy of the placement group of the instance (cluster, spread or partition)
+    :param cpu_cores: number of cpu cores
+    :param threads_per_core: threads per cpu core, 1 disables hyper threading
+    :param enhanced_networking: 'ena', 'sriov' or True (either one)
+    """
+    t = get(name)
+    if t is None:
+        return
+    if ebs_optimized and t.ebs_optimized == 'no':
+        raise(ValueError('{} can not be ebs optimized'.format(name)))
+    if placement_strategy == 'cluster' and not t.cluster:
+        raise(ValueError('{} can not be placed in a cluster placement group'.format(name)))
+    if cpu_cores is not None and not 1 <= cpu_cores <= t.cores:
+        raise(ValueError('{} has 1 to {} cores, {} given'.format(name, t.cores, cpu_cores)))
+    if threads_per_core is not None and not 1 <= threads_per_core <= t.vcpu // t.cores:
+        raise(ValueError('{} has 1 to {} threads per core, {} given'.format(name, t.vcpu // t.cores,
+                                                                           threads_per_core)))
+    supported = {'ena': t.ena, 'sriov': t.sriov, True: t.ena or t.sriov}
+    if enhanced_networking and enhanced_networking not in supported:
+        raise(ValueError('unknown enhanced networking {}, use ena or sriov'.format(enhanced_networking)))
+    if enhanced_networking and not supported[enhanced_networking]:
+        raise(ValueError('{} does not support {} enhanced networking'.format(
+            name, enhanced_networking if enhanced_networking is not True else 'any')))
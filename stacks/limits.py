@@ -0,0 +1,390 @@
+"""CloudFormation limit analysis and nested stack splitting.
+
+analyze() reports how close a template is to the CloudFormation quotas. When a template outgrows them split()
+partitions its resources into child templates that are deployed as nested stacks of a parent template.
+Resources that are bound by a GetAtt always stay in the same child, Refs between children (and GetAtts of outputs) are
+exported under a name that starts with the parent stack name and imported with template.import_value. A DependsOn on
+a resource in another child becomes a DependsOn between the nested stacks.
+"""
+import copy
+import json
+from collections import defaultdict, deque
+
+from troposphere import AWSHelperFn, BaseAWSObject, Export, GetAtt, Join, Output, Ref, Sub, Tags, encode_to_dict
+from troposphere.cloudformation import Stack
+
+from . import template as tpl
+from .graph import depends_on, references, sub_references
+
+
+# https://docs.aws.amazon.com/AWSCloudFormation/latest/UserGuide/cloudformation-limits.html
+LIMITS = {
+    'Resources': 500,
+    'Parameters': 200,
+    'Outputs': 200,
+    'Mappings': 200,
+    'TemplateBody': 51200,  # direct upload
+    'TemplateBodyS3': 1000000,  # uploaded through s3 / TemplateURL
+}
+
+
+def template_size(template):
+    """Size in bytes of the minified json body of a template."""
+    counter = tpl.SizeCounter()
+    tpl.write_template(template=template, f=counter, minify=True)
+    return counter.size
+
+
+def analyze(template):
+    """Measure a template against the CloudFormation limits.
+
+    :param template: the template to analyze
+    :return: (dict) limit name -> (value, limit)
+    """
+    size = template_size(template)
+    return {
+        'Resources': (len(template.resources), LIMITS['Resources']),
+        'Parameters': (len(template.parameters), LIMITS['Parameters']),
+        'Outputs': (len(template.outputs), LIMITS['Outputs']),
+        'Mappings': (len(template.mappings), LIMITS['Mappings']),
+        'TemplateBody': (size, LIMITS['TemplateBody']),
+        'TemplateBodyS3': (size, LIMITS['TemplateBodyS3']),
+    }
+
+
+def exceeded(report):
+    """Names of the limits that are exceeded in an analyze() report"""
+    return sorted(name for name, (value, limit) in report.items() if value > limit)
+
+
+def report(template):
+    """Human readable version of analyze()"""
+    lines = []
+    for name, (value, limit) in sorted(analyze(template).items()):
+        lines.append('{:<16} {:>9} / {:<9} {:>4.0%}{}'.format(name, value, limit, float(value) / limit,
+                                                             '  EXCEEDED' if value > limit else ''))
+    return '\n'.join(lines)
+
+
+def _find(parent, x):
+    while parent[x] != x:
+        parent[x] = parent[parent[x]]
+        x = parent[x]
+    return x
+
+
+def _union(parent, a, b):
+    a, b = _find(parent, a), _find(parent, b)
+    if a != b:
+        parent[b] = a
+
+
+def _strongly_connected(nodes, edges):
+    """Iterative tarjan. Returns a list of components (lists of nodes)."""
+    index, low, on_stack, stack, components = {}, {}, set(), [], []
+    counter = 0
+    for root in nodes:
+        if root in index:
+            continue
+        work = [(root, iter(edges[root]))]
+        index[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack.add(root)
+        while work:
+            node, it = work[-1]
+            for nxt in it:
+                if nxt not in index:
+                    index[nxt] = low[nxt] = counter
+                    counter += 1
+                    stack.append(nxt)
+                    on_stack.add(nxt)
+                    work.append((nxt, iter(edges[nxt])))
+                    break
+                elif nxt in on_stack:
+                    low[node] = min(low[node], index[nxt])
+            else:
+                work.pop()
+                if work:
+                    low[work[-1][0]] = min(low[work[-1][0]], low[node])
+                if low[node] == index[node]:
+                    component = []
+                    while True:
+                        n = stack.pop()
+                        on_stack.discard(n)
+                        component.append(n)
+                        if n == node:
+                            break
+                    components.append(component)
+    return components
+
+
+def partition(template, max_resources=LIMITS['Resources'], max_size=LIMITS['TemplateBodyS3']):
+    """Partition the resources of a template in groups that can be deployed as separate stacks.
+
+    GetAtt bound resources, and resources that refer to each other in a Fn::Sub, end up in the same group and all dependencies (Ref, DependsOn) of a group are in the
+    same or an earlier group.
+
+    :param template: the template to partition
+    :param max_resources: max number of resources per group
+    :param max_size: max (approximate) size in bytes of the resources of a group
+    :return: (list) of lists of resource titles
+    """
+    resources = template.to_dict()['Resources']
+    parent = {title: title for title in resources}
+    refs = {}
+    for title, resource in resources.items():
+        refs[title] = set()
+        for kind, name in references(resource):
+            if name not in resources:
+                continue  # parameter or pseudo parameter
+            if kind == 'GetAtt':
+                _union(parent, title, name)
+            else:
+                refs[title].add(name)
+        # split() can't import a value into a Fn::Sub string
+        for kind, name in sub_references(resource):
+            if name in resources:
+                _union(parent, title, name)
+        refs[title].update(name for name in depends_on(resource) if name in resources)
+
+    # units that reference each other in both directions can not be separated either
+    unit_edges = defaultdict(set)
+    for title, names in refs.items():
+        for name in names:
+            a, b = _find(parent, title), _find(parent, name)
+            if a != b:
+                unit_edges[a].add(b)
+    units = sorted(set(_find(parent, title) for title in resources))
+    for component in _strongly_connected(units, unit_edges):
+        for node in component[1:]:
+            _union(parent, component[0], node)
+
+    members = defaultdict(list)
+    for title in sorted(resources):
+        members[_find(parent, title)].append(title)
+    deps = {unit: set() for unit in members}
+    for title, names in refs.items():
+        for name in names:
+            a, b = _find(parent, title), _find(parent, name)
+            if a != b:
+                deps[a].add(b)
+
+    # topological order of the units (kahn), dependencies first
+    dependents = defaultdict(list)
+    for unit, ds in deps.items():
+        for d in ds:
+            dependents[d].append(unit)
+    pending = {unit: len(ds) for unit, ds in deps.items()}
+    queue = deque(sorted(unit for unit, n in pending.items() if n == 0))
+    order = []
+    while queue:
+        unit = queue.popleft()
+        order.append(unit)
+        for d in sorted(dependents[unit]):
+            pending[d] -= 1
+            if pending[d] == 0:
+                queue.append(d)
+
+    # greedy packing in topological order
+    groups, count, size = [[]], 0, 0
+    for unit in order:
+        titles = members[unit]
+        unit_size = sum(len(json.dumps(resources[t], separators=(',', ':'))) for t in titles)
+        if len(titles) > max_resources or unit_size > max_size:
+            raise(RuntimeError('resources {} can not be split over multiple stacks and do not fit in one'.format(
+                ', '.join(titles))))
+        if groups[-1] and (count + len(titles) > max_resources or size + unit_size > max_size):
+            groups.append([])
+            count, size = 0, 0
+        groups[-1].extend(titles)
+        count += len(titles)
+        size += unit_size
+
+    return [sorted(g) for g in groups if g]
+
+
+def _copy_object(obj, properties):
+    """Shallow copy of a troposphere object with new properties, detached from its template"""
+    new = copy.copy(obj)
+    dictname = getattr(obj, 'dictname', None)
+    new.__dict__['properties'] = properties
+    new.__dict__['resource'] = dict(obj.resource, **{dictname: properties}) if dictname else properties
+    new.__dict__['template'] = None
+    return new
+
+
+def _rewrite(value, fn):
+    """Return value with every nested value for which fn returns a replacement replaced.
+
+    Containers and troposphere objects that hold a replacement are shallow copied, the original is never modified.
+    """
+    new = fn(value)
+    if new is not None:
+        return new
+    if isinstance(value, list):
+        items = [_rewrite(v, fn) for v in value]
+        return items if any(a is not b for a, b in zip(items, value)) else value
+    if isinstance(value, dict):
+        items = {k: _rewrite(v, fn) for k, v in value.items()}
+        return items if any(items[k] is not value[k] for k in value) else value
+    if isinstance(value, Tags):
+        tags = _rewrite(value.tags, fn)
+        if tags is not value.tags:
+            value = copy.copy(value)
+            value.tags = tags
+    elif isinstance(value, AWSHelperFn):
+        data = _rewrite(value.data, fn)
+        if data is not value.data:
+            value = copy.copy(value)
+            value.data = data
+    elif isinstance(value, BaseAWSObject):
+        properties = _rewrite(value.properties, fn)
+        if properties is not value.properties:
+            value = _copy_object(value, properties)
+    return value
+
+
+def _condition_names(value):
+    """Yield the names of the conditions used in json: Condition attributes, Fn::If and Condition functions"""
+    stack = [value]
+    while stack:
+        v = stack.pop()
+        if isinstance(v, dict):
+            if isinstance(v.get('Condition'), str):
+                yield v['Condition']
+            if 'Fn::If' in v and isinstance(v['Fn::If'], list) and v['Fn::If']:
+                yield v['Fn::If'][0]
+            stack.extend(v.values())
+        elif isinstance(v, list):
+            stack.extend(v)
+
+
+def _getatt(value):
+    """(title, attribute) of a GetAtt, None for anything else"""
+    if isinstance(value, GetAtt):
+        name = value.data['Fn::GetAtt']
+        return tuple(name) if isinstance(name, list) else tuple(name.split('.', 1))
+    return None
+
+
+def split(template, name='nested', max_resources=LIMITS['Resources'], max_size=LIMITS['TemplateBodyS3']):
+    """Split a template in child templates and a parent template that deploys them as nested stacks.
+
+    Refs and GetAtts of a resource in another child are exported by the producing child under the name
+    <parent stack name>-<title>(-<attribute>) and imported by the consumer with template.import_value. The parent
+    passes its stack name to the children as the ParentStackName parameter, the export names are unique per stack.
+    Conditions, and the parameters they use, are copied to every child that uses them.
+    The child templates need to be uploaded as <TemplateBaseUrl>/<child title>.json.
+
+    :param template: the template to split
+    :param name: prefix for the child stack titles
+    :param max_resources: max number of resources per child
+    :param max_size: max (approximate) size in bytes of the resources of a child
+    :return: (tuple) parent template, dict of child title -> child template
+    """
+    groups = partition(template, max_resources=max_resources, max_size=max_size)
+    resources = template.to_dict()['Resources']
+    conditions = {title: encode_to_dict(c) for title, c in template.conditions.items()}
+    owner = {title: i for i, group in enumerate(groups) for title in group}
+
+    parent = tpl.create(description=template.description)
+    base_url = tpl.add_parameter(parent, name='TemplateBaseUrl', description='base url of the uploaded nested templates')
+    children = []
+    for i, group in enumerate(groups):
+        child = tpl.create(description='{} ({}/{})'.format(template.description or name, i + 1, len(groups)))
+        for mapping, value in template.mappings.items():
+            child.add_mapping(mapping, value)
+        children.append(child)
+
+    exported = set()
+    imports = [set() for _ in groups]
+    params = [set() for _ in groups]
+    used_conditions = [set() for _ in groups]
+    linked = set()  # children that export or import and need ParentStackName
+
+    def export_name(*names):
+        return Sub('${{ParentStackName}}-{}'.format('-'.join(names)))
+
+    def export(i, names, value):
+        if names not in exported:
+            output = Output('Export{}'.format(''.join(n for n in ''.join(names) if n.isalnum())),
+                            Value=value, Export=Export(export_name(*names)))
+            children[i].add_output(output)
+            exported.add(names)
+            linked.add(i)
+
+    def link(i, value, obj):
+        """Register the parameters, conditions and imports child i needs for value (json) and rewrite obj to use
+        them."""
+        for kind, ref in references(value):
+            if ref in template.parameters:
+                params[i].add(ref)
+            elif ref in owner and owner[ref] != i:
+                imports[i].add(owner[ref])
+        pending = [c for c in _condition_names(value) if c in conditions]
+        while pending:
+            c = pending.pop()
+            if c not in used_conditions[i]:
+                used_conditions[i].add(c)
+                params[i].update(ref for _, ref in references(conditions[c]) if ref in template.parameters)
+                pending.extend(n for n in _condition_names(conditions[c]) if n in conditions)
+
+        def replace(v):
+            if isinstance(v, Ref) and owner.get(v.data['Ref'], i) != i:
+                ref = v.data['Ref']
+                export(owner[ref], (ref,), Ref(ref))
+                linked.add(i)
+                return tpl.import_value(export_name(ref))
+            getatt = _getatt(v)
+            if getatt and owner.get(getatt[0], i) != i:
+                export(owner[getatt[0]], getatt, GetAtt(*getatt))
+                linked.add(i)
+                return tpl.import_value(export_name(*getatt))
+            return None
+
+        return _rewrite(obj, replace)
+
+    for i, group in enumerate(groups):
+        for title in group:
+            r = link(i, resources[title], template.resources[title])
+            d = [name for name in depends_on(resources[title]) if name in owner]
+            local = [name for name in d if owner[name] == i]
+            if len(local) != len(d):
+                # the nested stack takes care of the ordering
+                imports[i].update(owner[name] for name in d if owner[name] != i)
+                r = _copy_object(r, r.properties)
+                if local:
+                    r.resource['DependsOn'] = local
+                else:
+                    del r.resource['DependsOn']
+            children[i].add_resource(r)
+
+    # original outputs go with the child that owns the (last) resource they reference, exports flow from earlier to
+    # later children
+    for output in template.outputs.values():
+        value = output.to_dict()
+        i = max([owner[ref] for kind, ref in references(value) if ref in owner] or [0])
+        children[i].add_output(link(i, value, output))
+
+    for i, child in enumerate(children):
+        for c in sorted(used_conditions[i]):
+            child.add_condition(c, template.conditions[c])
+        for p in sorted(params[i]):
+            child.add_parameter(template.parameters[p])
+        parameters = {p: Ref(p) for p in sorted(params[i])}
+        if i in linked:
+            tpl.add_parameter(child, name='ParentStackName', description='stack name of the parent stack')
+            parameters['ParentStackName'] = Ref('AWS::StackName')
+        title = '{}{}'.format(name, i + 1)
+        stack = Stack(title, template=parent)
+        stack.TemplateURL = Join('', [Ref(base_url), '/{}.json'.format(title)])
+        if parameters:
+            stack.Parameters = parameters
+        if imports[i]:
+            stack.DependsOn = ['{}{}'.format(name, j + 1) for j in sorted(imports[i])]
+
+    for p in sorted(set().union(*params)):
+        parent.add_parameter(template.parameters[p])
+
+    return parent, {'{}{}'.format(name, i + 1): child for i, child in enumerate(children)}
@@ -0,0 +1,316 @@
+"""Offline reachability analysis of the instances of a template.
+
+Answers which instances can open a connection to an instance on a port, combining the security groups of the
+interfaces (SecurityGroupIngress, SourceSecurityGroupId) and the network acls of the subnets. A source instance uses
+its interface in the subnet of the target interface, or its first interface. Network acls are stateless, for tcp the
+return traffic to the ephemeral ports of the source has to pass them too. Traffic within a subnet does not pass
+network acls, subnets without an acl association use the default acl (all traffic allowed). Outbound security group
+rules are not modelled, the builders keep the default allow all.
+
+Cidrs become integer intervals. Per (protocol, ports) the allowed sources of every interface are merged in a sorted
+interval list and the first match order of every network acl is flattened in sorted disjoint segments, a check is a
+few binary searches.
+
+usage: python -m pyaws.stacks.reachability stack.json port [protocol]
+"""
+import bisect
+import ipaddress
+import sys
+
+from .graph import resources_of
+
+
+# linux ephemeral port range, the ports the return traffic of a tcp connection goes to
+EPHEMERAL_PORTS = (32768, 60999)
+
+PROTOCOLS = {'-1': '-1', 'all': '-1', '1': 'icmp', 'icmp': 'icmp', '6': 'tcp', 'tcp': 'tcp', '17': 'udp',
+             'udp': 'udp'}
+
+ALL_ADDRESSES = (0, 2 ** 32 - 1)
+
+
+def protocol_name(value):
+    """tcp, udp, icmp or -1 (all) for a protocol name or number"""
+    value = str(value).lower()
+    return PROTOCOLS.get(value, value)
+
+
+def _name(value):
+    """Title of the resource a Ref or GetAtt points to, None for anything else"""
+    if isinstance(value, dict):
+        if 'Ref' in value:
+            return value['Ref']
+        if 'Fn::GetAtt' in value:
+            name = value['Fn::GetAtt']
+            return name[0] if isinstance(name, list) else name.split('.')[0]
+    return None
+
+
+def interval(cidr):
+    """(first, last) address of a literal ipv4 cidr, None for anything else"""
+    if not isinstance(cidr, str):
+        return None
+    try:
+        n = ipaddress.IPv4Network(cidr, strict=False)
+    except ValueError:
+        return None
+    return int(n.network_address), int(n.broadcast_address)
+
+
+def _ports_match(protocol, low, high, query):
+    """(low, high) ports of a rule cover the ports of a query (protocol, low, high)"""
+    if protocol == '-1':
+        return True
+    if protocol != query[0]:
+        return False
+    if protocol not in ('tcp', 'udp'):
+        return True
+    return low <= query[1] and query[2] <= high
+
+
+def _merge(intervals):
+    """Sorted, merged intervals as 2 lists: starts and ends"""
+    starts, ends = [], []
+    for low, high in sorted(intervals):
+        if ends and low <= ends[-1] + 1:
+            ends[-1] = max(ends[-1], high)
+        else:
+            starts.append(low)
+            ends.append(high)
+    return starts, ends
+
+
+def _covered(merged, addresses):
+    starts, ends = merged
+    i = bisect.bisect_right(starts, addresses[0]) - 1
+    return i >= 0 and ends[i] >= addresses[1]
+
+
+def first_match(entries, query):
+    """Flatten the first match evaluation of network acl entries for a query.
+
+    An entry that only allows part of the ports of the query does not allow the query.
+
+    :param entries: (protocol, low port, high port, address interval, allow, rule number) tuples in rule number order
+    :param query: (protocol, low port, high port)
+    :return: (starts, segments), sorted disjoint (start, end, allow, rule number) address segments. Addresses outside
+    the segments match no entry and are denied.
+    """
+    free, segments = [ALL_ADDRESSES], []
+    for protocol, low, high, (first, last), allow, number in entries:
+        if protocol == '-1':
+            full = True
+        elif protocol != query[0]:
+            continue
+        elif protocol in ('tcp', 'udp'):
+            if high < query[1] or query[2] < low:
+                continue
+            full = low <= query[1] and query[2] <= high
+        else:
+            full = True
+        remaining = []
+        for start, end in free:
+            if end < first or last < start:
+                remaining.append((start, end))
+                continue
+            segments.append((max(start, first), min(end, last), allow and full, number))
+            if start < first:
+                remaining.append((start, first - 1))
+            if last < end:
+                remaining.append((last + 1, end))
+        free = remaining
+    segments.sort()
+    return [s[0] for s in segments], segments
+
+
+def blocked_by(index, addresses):
+    """Rule that blocks an address interval in a first_match() index.
+
+    :return: None when all the addresses are allowed, otherwise the rule number of the first blocked address, '*' for
+    the default deny
+    """
+    starts, segments = index
+    i = bisect.bisect_right(starts, addresses[0]) - 1
+    position = addresses[0]
+    while i < len(segments) and position <= addresses[1]:
+        if i < 0 or segments[i][1] < position:
+            return '*'
+        start, end, allow, number = segments[i]
+        if start > position:
+            return '*'
+        if not allow:
+            return number
+        position = end + 1
+        i += 1
+    return '*' if position <= addresses[1] else None
+
+
+class Network(object):
+    """Index of the interfaces, security groups and network acls of a template.
+
+    :param template: troposphere template, template dict or path to a json template
+    """
+
+    def __init__(self, template):
+        resources = resources_of(template)
+        by_type = {}
+        for title, resource in resources.items():
+            by_type.setdefault(resource.get('Type'), {})[title] = resource.get('Properties', {})
+
+        self.subnets = {title: interval(p.get('CidrBlock')) or ALL_ADDRESSES
+                        for title, p in by_type.get('AWS::EC2::Subnet', {}).items()}
+
+        # security group -> list of (protocol, low port, high port, cidr interval or source group)
+        self.rules = {title: [] for title in by_type.get('AWS::EC2::SecurityGroup', {})}
+        for title, p in by_type.get('AWS::EC2::SecurityGroup', {}).items():
+            for r in p.get('SecurityGroupIngress', []):
+                self._add_rule(title, r)
+        for p in by_type.get('AWS::EC2::SecurityGroupIngress', {}).values():
+            if _name(p.get('GroupId')) in self.rules:
+                self._add_rule(_name(p.get('GroupId')), p)
+
+        # network acl -> (ingress entries, egress entries) in rule number order
+        self.acls = {title: ([], []) for title in by_type.get('AWS::EC2::NetworkAcl', {})}
+        for p in sorted(by_type.get('AWS::EC2::NetworkAclEntry', {}).values(), key=lambda e: int(e['RuleNumber'])):
+            acl = _name(p.get('NetworkAclId'))
+            addresses = interval(p.get('CidrBlock'))
+            if acl not in self.acls or addresses is None:
+                continue
+            ports = p.get('PortRange', {})
+            entry = (protocol_name(p.get('Protocol', -1)), int(ports.get('From', 0)), int(ports.get('To', 65535)),
+                     addresses, str(p.get('RuleAction')).lower() == 'allow', int(p['RuleNumber']))
+            self.acls[acl][1 if str(p.get('Egress')).lower() == 'true' else 0].append(entry)
+        self.subnet_acls = {_name(p.get('SubnetId')): _name(p.get('NetworkAclId'))
+                            for p in by_type.get('AWS::EC2::SubnetNetworkAclAssociation', {}).values()}
+
+        # interface -> (subnet, address interval, security groups)
+        self.interfaces = {}
+        for title, p in by_type.get('AWS::EC2::NetworkInterface', {}).items():
+            self._add_interface(title, p, p.get('GroupSet', []))
+
+        # instance -> list of interfaces in device order
+        self.instances = {}
+        for title, p in sorted(by_type.get('AWS::EC2::Instance', {}).items()):
+            if p.get('NetworkInterfaces'):
+                devices = sorted(p['NetworkInterfaces'], key=lambda n: int(n.get('DeviceIndex', 0)))
+                self.instances[title] = [_name(n.get('NetworkInterfaceId')) for n in devices
+                                         if _name(n.get('NetworkInterfaceId')) in self.interfaces]
+            elif p.get('SubnetId'):
+                self._add_interface(title, p, p.get('SecurityGroupIds', []))
+                self.instances[title] = [title]
+
+        self._allowed_cache, self._acl_cache = {}, {}
+
+    def _add_rule(self, group, r):
+        protocol = protocol_name(r.get('IpProtocol', '-1'))
+        low, high = int(r.get('FromPort', -1)), int(r.get('ToPort', -1))
+        source = interval(r.get('CidrIp')) or _name(r.get('SourceSecurityGroupId'))
+        if source:
+            self.rules[group].append((protocol, low, high, source))
+
+    def _add_interface(self, title, p, groups):
+        subnet = _name(p.get('SubnetId'))
+        address = interval(p.get('PrivateIpAddress'))
+        # a dhcp address can be any address of the subnet
+        self.interfaces[title] = (subnet, address or self.subnets.get(subnet, ALL_ADDRESSES),
+                                  frozenset(_name(g) for g in groups))
+
+    def _allowed(self, interface, query):
+        """(merged source intervals, source security groups) allowed into an interface"""
+        key = (interface, query)
+        if key not in self._allowed_cache:
+            intervals, groups = [], set()
+            for group in self.interfaces[interface][2]:
+                for protocol, low, high, source in self.rules.get(group, []):
+                    if _ports_match(protocol, low, high, query):
+                        if isinstance(source, tuple):
+                            intervals.append(source)
+                        else:
+                            groups.add(source)
+            self._allowed_cache[key] = _merge(intervals), groups
+        return self._allowed_cache[key]
+
+    def _blocked_by(self, subnet, egress, query, addresses):
+        acl = self.subnet_acls.get(subnet)
+        if acl not in self.acls:
+            return None  # default acl
+        key = (acl, egress, query)
+        if key not in self._acl_cache:
+            self._acl_cache[key] = first_match(self.acls[acl][egress], query)
+        return blocked_by(self._acl_cache[key], addresses)
+
+    def _interface_pair(self, source, target_interface):
+        interfaces = self.instances[source]
+        subnet = self.interfaces[target_interface][0]
+        for i in interfaces:
+            if self.interfaces[i][0] == subnet:
+                return i
+        return interfaces[0] if interfaces else None
+
+    def check(self, source, target, port, protocol='tcp'):
+        """Why a source instance can't connect to a target instance.
+
+        :param source: title of the source instance
+        :param target: title of the target instance
+        :param port: destination port
+        :param protocol: tcp, udp, icmp or a protocol number
+        :return: None when the connection is possible, otherwise the reason (str)
+        """
+        protocol = protocol_name(protocol)
+        query = (protocol, port, port)
+        reasons = []
+        for t in self.instances[target]:
+            s = self._interface_pair(source, t)
+            if s is None:
+                return '{} has no network interfaces'.format(source)
+            reason = self._check_interfaces(s, t, query)
+            if reason is None:
+                return None
+            reasons.append(reason)
+        return '; '.join(reasons) or '{} has no network interfaces'.format(target)
+
+    def _check_interfaces(self, s, t, query):
+        source_subnet, source_address, source_groups = self.interfaces[s]
+        target_subnet, target_address, _ = self.interfaces[t]
+
+        merged, groups = self._allowed(t, query)
+        if not (groups & source_groups or _covered(merged, source_address)):
+            return 'security groups of {} do not allow {} {} from {}'.format(t, query[0], query[1], s)
+
+        if source_subnet != target_subnet:
+            checks = [(source_subnet, True, query, target_address, 'outbound'),
+                      (target_subnet, False, query, source_address, 'inbound')]
+            if query[0] == 'tcp':
+                ephemeral = ('tcp',) + EPHEMERAL_PORTS
+                checks += [(target_subnet, True, ephemeral, source_address, 'return outbound'),
+                           (source_subnet, False, ephemeral, target_address, 'return inbound')]
+            for subnet, egress, q, address, direction in checks:
+                rule = self._blocked_by(subnet, egress, q, address)
+                if rule is not None:
+                    return 'network acl {} of {} blocks {} {} {}-{} (rule {})'.format(
+                        self.subnet_acls[subnet], subnet, direction, q[0], q[1], q[2], rule)
+        return None
+
+    def can_reach(self, source, target, port, protocol='tcp'):
+        return self.check(source, target, port, protocol) is None
+
+    def sources(self, target, port, protocol='tcp'):
+        """Sorted titles of the instances that can connect to a target on a port"""
+        return [s for s in self.instances if s != target and self.can_reach(s, target, port, protocol)]
+
+    def matrix(self, port, protocol='tcp'):
+        """All pairs: dict target instance -> sorted list of source instances"""
+        return {target: self.sources(target, port, protocol) for target in self.instances}
+
+
+def report(template, port, protocol='tcp'):
+    """Human readable version of Network.matrix()"""
+    network = Network(template)
+    lines = []
+    for target, sources in sorted(network.matrix(port, protocol).items()):
+        lines.append('{} {}/{} <- {}'.format(target, protocol, port, ', '.join(sources) or 'nothing'))
+    return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    print(report(sys.argv[1], int(sys.argv[2]), sys.argv[3] if len(sys.argv) > 3 else 'tcp'))
@@ -1,7 +1,11 @@
+import functools
+import ipaddress
+from collections import namedtuple
 from copy import deepcopy
-from troposphere import Ref, Tags
-from troposphere.ec2 import SecurityGroup, SecurityGroupRule, NetworkAcl, NetworkAclEntry, PortRange
+from troposphere import AWSHelperFn, Ref, Tags
+from troposphere.ec2 import ICMP, SecurityGroup, SecurityGroupRule, NetworkAcl, NetworkAclEntry, PortRange
 
+from . import reachability
 from .tools import aws_name
 
 # This cidr is the one we break out from in Kortrijk as well as Amsterdam VPN
@@ -32,9 +36,27 @@ ALL_CISCO_CIDRS = [
     '171.70.0.0/16'
     ]
 
+# default aws quota of inbound rules per security group
+RULES_PER_GROUP = 60
+
+# protocol numbers of the protocols with names
+PROTOCOL_NAMES = {'1': 'icmp', '6': 'tcp', '17': 'udp'}
+
 
 def get_bastion_security_group(template, vpc, sg_name='bastionsecuritygroup', cidr=ALL_CISCO_CIDRS):
     """Get a securty group that fits for a bastion host"""
+    return check_quota(_bastion_security_group(template, vpc, sg_name, cidr))
+
+
+def get_bastion_security_groups(template, vpc, sg_name='bastionsecuritygroup', cidr=ALL_CISCO_CIDRS):
+    """The bastion security group for more cidrs than fit in one group, see split()
+
+    :return: list of security groups
+    """
+    return split(template, _bastion_security_group(template, vpc, sg_name, cidr))
+
+
+def _bastion_security_group(template, vpc, sg_name, cidr):
     sg = SecurityGroup(title=sg_name, template=template)
     sg.Tags = Tags(Name=aws_name(sg.title))
     sg.GroupDescription = 'security group for bastion ssh https icmp'
@@ -46,13 +68,25 @@ def get_bastion_security_group(template, vpc, sg_name='bastionsecuritygroup', ci
             cidr = [cidr]
         rs = [rules.override_cidr(rule=r, cidr=cidr_item) for r in rs for cidr_item in cidr]
 
-    sg.SecurityGroupIngress = rs
+    sg.SecurityGroupIngress = compact(rs)
 
     return sg
 
 
 def get_http_security_group(template, vpc, sg_name='httpsecuritygroup', cidr=ALL_CISCO_CIDRS):
     """Get a securty group that fits for plain http"""
+    return check_quota(_http_security_group(template, vpc, sg_name, cidr))
+
+
+def get_http_security_groups(template, vpc, sg_name='httpsecuritygroup', cidr=ALL_CISCO_CIDRS):
+    """The http security group for more cidrs than fit in one group, see split()
+
+    :return: list of security groups
+    """
+    return split(template, _http_security_group(template, vpc, sg_name, cidr))
+
+
+def _http_security_group(template, vpc, sg_name, cidr):
     sg = SecurityGroup(title=sg_name, template=template)
     sg.Tags = Tags(Name=aws_name(sg.title))
     sg.GroupDescription = 'security group for http'
@@ -64,7 +98,7 @@ def get_http_security_group(template, vpc, sg_name='httpsecuritygroup', cidr=ALL
             cidr = [cidr]
         rs = [rules.override_cidr(rule=r, cidr=cidr_item) for r in rs for cidr_item in cidr]
 
-    sg.SecurityGroupIngress = rs
+    sg.SecurityGroupIngress = compact(rs)
 
     return sg
 
@@ -91,7 +125,7 @@ def get_vdcm_management_security_group(template, vpc, sg_name='vdcmmanagementsec
 
     rs.append(rules.all_sn)
 
-    sg.SecurityGroupIngress = rs
+    sg.SecurityGroupIngress = compact(rs)
 
     return sg
 
@@ -113,7 +147,7 @@ def get_elb_security_group(template, vpc, sg_name='elbsecuritygroup', cidr="10.0
     rs = [rules.rest, rules.https]
     if cidr:
         rs = [rules.override_cidr(rule=r, cidr=cidr) for r in rs]
-    sg.SecurityGroupIngress = rs
+    sg.SecurityGroupIngress = compact(rs)
     return sg
 
 
@@ -136,7 +170,7 @@ def get_vsm_security_group(template, vpc, sg_name='vsmsecuritygroup', cidr=CISCO
     if cidr:
         rs = [rules.override_cidr(rule=r, cidr=cidr) for r in rs]
 
-    sg.SecurityGroupIngress = rs
+    sg.SecurityGroupIngress = compact(rs)
 
     return sg
 
@@ -158,7 +192,7 @@ def get_vdcm_video_security_group(template, vpc, cidr=None):
     if cidr:
         rs = [rules.override_cidr(rule=r, cidr=cidr) for r in rs]
 
-    sg.SecurityGroupIngress = rs
+    sg.SecurityGroupIngress = compact(rs)
     return sg
 
 
@@ -178,7 +212,7 @@ def get_private_security_group(template, vpc, cidr, desc):
     rs = [rules.all]
     if cidr:
         rs = [rules.override_cidr(rule=r, cidr=cidr) for r in rs]
-    sg.SecurityGroupIngress = rs
+    sg.SecurityGroupIngress = compact(rs)
     return sg
 
 
@@ -186,37 +220,238 @@ def rule(protocol, from_port, to_port, cidr):
     return SecurityGroupRule(IpProtocol=protocol, FromPort=from_port, ToPort=to_port, CidrIp=cidr)
 
 
+# immutable description of an ingress rule, serialized through a LazyRule
+RuleSpec = namedtuple('RuleSpec', 'protocol from_port to_port cidr')
+
+
 class Rules(object):
-    """Collection of frequently used security group rules"""
-
-    def __init__(self):
-        self.all_udp = SecurityGroupRule(IpProtocol='udp', FromPort='1', ToPort='65535', CidrIp='0.0.0.0/0')
-        self.all_icmp = SecurityGroupRule(IpProtocol='icmp', FromPort='-1', ToPort='-1', CidrIp='0.0.0.0/0')
-        self.all = SecurityGroupRule(IpProtocol='-1', FromPort='-1', ToPort='-1', CidrIp='0.0.0.0/0')
-        self.ssh = SecurityGroupRule(IpProtocol='tcp', FromPort='22', ToPort='22', CidrIp='0.0.0.0/0')
-        self.http = SecurityGroupRule(IpProtocol='tcp', FromPort='80', ToPort='80', CidrIp='0.0.0.0/0')
-        self.https = SecurityGroupRule(IpProtocol='tcp', FromPort='443', ToPort='443', CidrIp='0.0.0.0/0')
-        self.graphana = SecurityGroupRule(IpProtocol='tcp', FromPort='3000', ToPort='3000', CidrIp='0.0.0.0/0')
-        self.iiop = SecurityGroupRule(IpProtocol='tcp', FromPort='5003', ToPort='5003', CidrIp='0.0.0.0/0')
-        self.vnc = SecurityGroupRule(IpProtocol='tcp', FromPort='5901', ToPort='5901', CidrIp='0.0.0.0/0')
-        self.influxdb = SecurityGroupRule(IpProtocol='tcp', FromPort='8086', ToPort='8086', CidrIp='0.0.0.0/0')
-        self.rest = SecurityGroupRule(IpProtocol='tcp', FromPort='8443', ToPort='8443', CidrIp='0.0.0.0/0')
-        self.all_sn = SecurityGroupRule(IpProtocol='tcp', FromPort='0', ToPort='65535', CidrIp='10.0.0.0/16')
-        self.mc = SecurityGroupRule(IpProtocol='47', FromPort='0', ToPort='65535', CidrIp='10.0.0.0/16')
-        self.lisa = SecurityGroupRule(IpProtocol='tcp', FromPort='8080', ToPort='8080', CidrIp='0.0.0.0/0')
-        self.vsm1 = SecurityGroupRule(IpProtocol='tcp', FromPort='8902', ToPort='8902', CidrIp='0.0.0.0/0')
-        self.vsm2 = SecurityGroupRule(IpProtocol='tcp', FromPort='8699', ToPort='8701', CidrIp='0.0.0.0/0')
-        self.abr2ts = SecurityGroupRule(IpProtocol='tcp', FromPort='8050', ToPort='8051', CidrIp='0.0.0.0/0')
-        self.ocgui = SecurityGroupRule(IpProtocol='tcp', FromPort='8443', ToPort='8443', CidrIp='0.0.0.0/0')
+    """Catalog of frequently used security group rules.
+
+    The rules are immutable RuleSpecs shared by all groups, creating a Rules() costs nothing.
+    """
+    all_udp = RuleSpec('udp', '1', '65535', '0.0.0.0/0')
+    all_icmp = RuleSpec('icmp', '-1', '-1', '0.0.0.0/0')
+    all = RuleSpec('-1', '-1', '-1', '0.0.0.0/0')
+    ssh = RuleSpec('tcp', '22', '22', '0.0.0.0/0')
+    http = RuleSpec('tcp', '80', '80', '0.0.0.0/0')
+    https = RuleSpec('tcp', '443', '443', '0.0.0.0/0')
+    graphana = RuleSpec('tcp', '3000', '3000', '0.0.0.0/0')
+    iiop = RuleSpec('tcp', '5003', '5003', '0.0.0.0/0')
+    vnc = RuleSpec('tcp', '5901', '5901', '0.0.0.0/0')
+    influxdb = RuleSpec('tcp', '8086', '8086', '0.0.0.0/0')
+    rest = RuleSpec('tcp', '8443', '8443', '0.0.0.0/0')
+    all_sn = RuleSpec('tcp', '0', '65535', '10.0.0.0/16')
+    mc = RuleSpec('47', '0', '65535', '10.0.0.0/16')
+    lisa = RuleSpec('tcp', '8080', '8080', '0.0.0.0/0')
+    vsm1 = RuleSpec('tcp', '8902', '8902', '0.0.0.0/0')
+    vsm2 = RuleSpec('tcp', '8699', '8701', '0.0.0.0/0')
+    abr2ts = RuleSpec('tcp', '8050', '8051', '0.0.0.0/0')
+    ocgui = RuleSpec('tcp', '8443', '8443', '0.0.0.0/0')
 
     @staticmethod
     def override_cidr(rule, cidr):
-        """Override the cidr of a SecurityGroupRule and return the modified version"""
+        """The same rule for another cidr. A SecurityGroupRule is copied, a RuleSpec is replaced."""
+        if isinstance(rule, RuleSpec):
+            return rule._replace(cidr=cidr)
         new_rule = deepcopy(rule)
         new_rule.CidrIp = cidr
         return new_rule
 
 
+def materialize(spec):
+    """A new SecurityGroupRule of a RuleSpec"""
+    return SecurityGroupRule(IpProtocol=spec.protocol, FromPort=spec.from_port, ToPort=spec.to_port, CidrIp=spec.cidr)
+
+
+@functools.lru_cache(maxsize=None)
+def _rule_dict(spec):
+    return materialize(spec).to_dict()
+
+
+class LazyRule(AWSHelperFn):
+    """Ingress rule of a RuleSpec in the SecurityGroupIngress of a group.
+
+    A LazyRule is immutable and shared by all groups with the same rule, the SecurityGroupRule is only built when the
+    template is serialized, once per RuleSpec. Use rule() for a rule that needs to be changed.
+    """
+    PROPERTIES = dict(IpProtocol='protocol', FromPort='from_port', ToPort='to_port', CidrIp='cidr')
+
+    def __init__(self, spec):
+        object.__setattr__(self, 'data', spec)
+
+    def __setattr__(self, name, value):
+        raise(AttributeError('rules of the rule catalog can not be changed, use rule() instead'))
+
+    def __getattr__(self, name):
+        if name in LazyRule.PROPERTIES:
+            return getattr(self.data, LazyRule.PROPERTIES[name])
+        raise(AttributeError(name))
+
+    def to_dict(self):
+        return dict(_rule_dict(self.data))
+
+
+# RuleSpec -> LazyRule, the rules are built once per process
+lazy_rule = functools.lru_cache(maxsize=None)(LazyRule)
+
+
+def _parse(order, r):
+    """(order, protocol, from port, to port, network) of a plain cidr rule, None for any other rule"""
+    if isinstance(r, LazyRule):
+        r = r.data
+    if isinstance(r, RuleSpec):
+        props = dict(IpProtocol=r.protocol, FromPort=r.from_port, ToPort=r.to_port, CidrIp=r.cidr)
+    else:
+        props = r.properties
+    if set(props) - {'IpProtocol', 'FromPort', 'ToPort', 'CidrIp'} or not isinstance(props.get('CidrIp'), str):
+        return None
+    protocol = str(props['IpProtocol']).lower()
+    protocol = PROTOCOL_NAMES.get(protocol, protocol)
+    if protocol == '-1':
+        low, high = -1, -1
+    else:
+        low, high = int(props.get('FromPort', -1)), int(props.get('ToPort', -1))
+    return order, protocol, low, high, ipaddress.ip_network(props['CidrIp'], strict=False)
+
+
+def _collapse_cidrs(specs):
+    groups = {}
+    for order, protocol, low, high, network in specs:
+        groups.setdefault((protocol, low, high, network.version), []).append((order, network))
+    result = []
+    for (protocol, low, high, _), members in groups.items():
+        for network in ipaddress.collapse_addresses(n for _, n in members):
+            order = min(o for o, n in members if n.subnet_of(network))
+            result.append((order, protocol, low, high, network))
+    return result
+
+
+def _merge_ports(specs):
+    groups, result = {}, []
+    for spec in specs:
+        if spec[1] in ('tcp', 'udp'):
+            groups.setdefault((spec[1], spec[4]), []).append(spec)
+        else:
+            result.append(spec)  # icmp type/code and other protocols are not ranges
+    for (protocol, network), members in groups.items():
+        members.sort(key=lambda m: m[2])
+        order, _, low, high, _ = members[0]
+        for o, _, lo, hi, _ in members[1:]:
+            if lo <= high + 1:
+                order, high = min(order, o), max(high, hi)
+            else:
+                result.append((order, protocol, low, high, network))
+                order, low, high = o, lo, hi
+        result.append((order, protocol, low, high, network))
+    return result
+
+
+def _covers(a, b):
+    """rule spec a allows everything rule spec b allows"""
+    if b[4].version != a[4].version or not b[4].subnet_of(a[4]):
+        return False
+    if a[1] == '-1':
+        return True
+    if a[1] != b[1]:
+        return False
+    if a[1] in ('tcp', 'udp'):
+        return a[2] <= b[2] and b[3] <= a[3]
+    return (a[2], a[3]) in ((-1, -1), (b[2], b[3])) or (a[2] == b[2] and a[3] == -1)
+
+
+def _narrowness(spec):
+    """Smaller for a broader port range, icmp with a wildcard type or code comes before the exact type and code"""
+    if spec[1] in ('tcp', 'udp'):
+        return spec[2] - spec[3]
+    return (spec[2] != -1) + (spec[3] != -1)
+
+
+def _drop_covered(specs):
+    # sorted on network size, broad rules first: only a rule that comes earlier can cover a rule
+    specs = sorted(specs, key=lambda s: (s[4].prefixlen, s[1] != '-1', _narrowness(s)))
+    kept = []
+    for spec in specs:
+        if not any(_covers(k, spec) for k in kept):
+            kept.append(spec)
+    return kept
+
+
+def compact(rules):
+    """Compact a list of ingress rules.
+
+    Overlapping and adjacent cidrs of the same protocol and ports are collapsed, contiguous tcp/udp port ranges of the
+    same cidr are merged and rules that are allowed by a broader rule are dropped. Rules with anything else than a
+    CidrIp (security group sources, descriptions, ...) are kept as is. The rules keep the order of the rules they
+    come from. The compacted RuleSpecs of a list of RuleSpecs are cached, groups with the same rules are compacted
+    once.
+
+    :param rules: list of RuleSpec, LazyRule and/or SecurityGroupRule
+    :return: new list of LazyRule (the compacted plain cidr rules) and SecurityGroupRule
+    """
+    if all(isinstance(r, RuleSpec) for r in rules):
+        compacted = _compact_specs(tuple(rules))
+    else:
+        compacted = _compact(rules)
+    return [lazy_rule(r) if isinstance(r, RuleSpec) else r for r in compacted]
+
+
+@functools.lru_cache(maxsize=1024)
+def _compact_specs(specs):
+    return tuple(_compact(specs))
+
+
+def _compact(rules):
+    specs, others = [], []
+    for order, r in enumerate(rules):
+        spec = _parse(order, r)
+        if spec:
+            specs.append(spec)
+        else:
+            others.append((order, r))
+
+    size = None
+    while size != len(specs):
+        size = len(specs)
+        specs = _drop_covered(_merge_ports(_collapse_cidrs(specs)))
+
+    # rules that come from the same rule are sorted on cidr
+    specs.sort(key=lambda spec: (spec[0], spec[4].version, spec[4]))
+    compacted = [(order, RuleSpec(protocol, str(low), str(high), str(network)))
+                 for order, protocol, low, high, network in specs]
+    return [r for _, r in sorted(compacted + others, key=lambda c: c[0])]
+
+
+def split(template, sg, quota=RULES_PER_GROUP):
+    """Split a security group with more ingress rules than the quota in several groups.
+
+    The extra groups are named <title>2, <title>3, ... and need to be attached to the same interfaces.
+
+    :return: list of security groups, [sg] when the rules fit
+    """
+    rules = sg.properties.get('SecurityGroupIngress', [])
+    if len(rules) <= quota:
+        return [sg]
+
+    sg.SecurityGroupIngress = rules[:quota]
+    groups = [sg]
+    for n, start in enumerate(range(quota, len(rules), quota), 2):
+        extra = SecurityGroup('{}{}'.format(sg.title, n), template=template)
+        extra.Tags = Tags(Name=aws_name(extra.title))
+        extra.GroupDescription = '{} ({})'.format(sg.GroupDescription, n)
+        extra.VpcId = sg.VpcId
+        extra.SecurityGroupIngress = rules[start:start + quota]
+        groups.append(extra)
+    return groups
+
+
+def check_quota(sg, quota=RULES_PER_GROUP):
+    """Raise when a security group has more ingress rules than the quota, split() spreads them over several groups"""
+    rules = sg.properties.get('SecurityGroupIngress', [])
+    if len(rules) > quota:
+        raise(ValueError('{} has {} ingress rules, the quota is {}, use split()'.format(sg.title, len(rules), quota)))
+    return sg
+
+
 def acl_table(template, name, vpc):
     """Create an acl table in a vpc. Individual entries need to be added using acl_entry()."""
     acl = NetworkAcl(name, template=template)
@@ -238,3 +473,167 @@ def acl_entry(template, acl_table, name, number, protocol=-1, from_port=None, to
     acl_entry.RuleAction = action
     acl_entry.RuleNumber = number
     return acl_entry
+
+
+# default aws quota of rules per direction of a network acl
+ACL_RULES_PER_DIRECTION = 20
+
+MAX_ACL_RULE_NUMBER = 32766
+
+# aws advises to open 1024-65535 for replies through network acls, it covers the ephemeral ports of linux, windows,
+# elastic load balancers and nat gateways
+ACL_EPHEMERAL_PORTS = (1024, 65535)
+
+ACL_PROTOCOLS = {'-1': -1, 'all': -1, 'icmp': 1, 'tcp': 6, 'udp': 17}
+
+# one rule of a network acl, see acl()
+AclRule = namedtuple('AclRule', 'protocol from_port to_port cidr action egress',
+                     defaults=(None, None, '0.0.0.0/0', 'ALLOW', False))
+
+
+def _acl_protocol(protocol):
+    protocol = str(protocol).lower()
+    return ACL_PROTOCOLS[protocol] if protocol in ACL_PROTOCOLS else int(protocol)
+
+
+def _acl_ports(r):
+    if r.from_port is None and r.to_port is None:
+        return 0, 65535
+    return int(r.from_port), int(r.to_port if r.to_port is not None else r.from_port)
+
+
+def _return_rule(r):
+    """Rule for the replies to the traffic a rule allows, None when the protocol has no ports"""
+    protocol = reachability.protocol_name(r.protocol)
+    if r.action.upper() != 'ALLOW' or protocol not in ('-1', 'tcp', 'udp'):
+        return None
+    if protocol == '-1':
+        return AclRule(-1, cidr=r.cidr, egress=not r.egress)
+    return AclRule(r.protocol, ACL_EPHEMERAL_PORTS[0], ACL_EPHEMERAL_PORTS[1], r.cidr, egress=not r.egress)
+
+
+def _acl_entry(number, r):
+    """first_match() entry of a numbered rule"""
+    low, high = _acl_ports(r)
+    return (reachability.protocol_name(r.protocol), low, high, reachability.interval(r.cidr),
+            r.action.upper() == 'ALLOW', number)
+
+
+def _shadowing(entries, entry):
+    """Earlier entries that together match all the traffic of an entry, the entry never matches"""
+    protocol, low, high, addresses = entry[:4]
+    covering = [e for e in entries if e[3][0] <= addresses[1] and addresses[0] <= e[3][1] and (
+                e[0] == '-1' or e[0] == protocol and (protocol not in ('tcp', 'udp') or e[1] <= low and high <= e[2]))]
+    networks = ipaddress.collapse_addresses(
+        n for e in covering for n in ipaddress.summarize_address_range(ipaddress.IPv4Address(e[3][0]),
+                                                                       ipaddress.IPv4Address(e[3][1])))
+    network = next(ipaddress.summarize_address_range(ipaddress.IPv4Address(addresses[0]),
+                                                     ipaddress.IPv4Address(addresses[1])))
+    if any(network.subnet_of(n) for n in networks):
+        return [e[5] for e in covering]
+    return None
+
+
+def acl_rules(rules, start=100, step=10, return_traffic=True):
+    """Number the rules of a network acl and check them.
+
+    Inbound and outbound rules are numbered separately in the order they are given: start, start + step, ... the
+    gaps leave room for rules added by hand. Network acls are stateless, with return_traffic every allowing tcp, udp
+    or all traffic rule gets a rule for its replies in the other direction (ACL_EPHEMERAL_PORTS), after the given
+    rules of that direction. Replies that are allowed already don't get a rule.
+
+    Raises a ValueError for rules that never match because earlier rules match all their traffic, and for more rules
+    than the acl quota.
+
+    :param rules: list of AclRule, in evaluation order
+    :param start: number of the first rule of a direction
+    :param step: gap between the rule numbers
+    :param return_traffic: add rules for the replies
+    :return: list of (rule number, AclRule)
+    """
+    numbered = []
+    for egress in (False, True):
+        direction = [r for r in rules if bool(r.egress) == egress]
+        if return_traffic:
+            for r in rules:
+                reply = _return_rule(r)
+                if reply and bool(reply.egress) == egress and acl_drops(
+                        list(enumerate(direction)), reply.protocol, _acl_ports(reply), reply.cidr, egress) is not None:
+                    direction.append(reply)
+        if len(direction) > ACL_RULES_PER_DIRECTION:
+            raise(ValueError('{} {} rules exceed the quota of {} per direction'.format(
+                len(direction), 'outbound' if egress else 'inbound', ACL_RULES_PER_DIRECTION)))
+        if direction and start + step * (len(direction) - 1) > MAX_ACL_RULE_NUMBER:
+            raise(ValueError('rule numbers exceed {}, use a smaller start or step'.format(MAX_ACL_RULE_NUMBER)))
+
+        entries = []
+        for n, r in enumerate(direction):
+            number = start + step * n
+            entry = _acl_entry(number, r)
+            shadowed = _shadowing(entries, entry)
+            if shadowed:
+                raise(ValueError('{} rule {} ({}) never matches, rules {} match all its traffic'.format(
+                    'outbound' if egress else 'inbound', number, r, ', '.join(map(str, shadowed)))))
+            entries.append(entry)
+            numbered.append((number, r))
+    return numbered
+
+
+def acl_drops(rules, protocol, ports, cidr, egress=False):
+    """Simulate the first match evaluation of a network acl.
+
+    :param rules: list of (rule number, AclRule), see acl_rules()
+    :param protocol: tcp, udp, icmp, -1 or a protocol number
+    :param ports: port or (from port, to port)
+    :param cidr: source (inbound) or destination (outbound) addresses
+    :param egress: evaluate the outbound rules
+    :return: None when all the traffic is allowed, otherwise the number of the rule that drops (part of) it, '*' for
+    the default deny
+    """
+    ports = ports if isinstance(ports, tuple) else (ports, ports)
+    entries = sorted((_acl_entry(number, r) for number, r in rules if bool(r.egress) == egress), key=lambda e: e[5])
+    index = reachability.first_match(entries, (reachability.protocol_name(protocol),) + tuple(ports))
+    return reachability.blocked_by(index, reachability.interval(cidr))
+
+
+def acl(template, name, vpc, rules, start=100, step=10, return_traffic=True, expect=()):
+    """Create a network acl with its entries from a list of rules.
+
+    The rules are numbered and checked by acl_rules(). expect lists the traffic the acl has to let in (ex: the udp
+    video streams), a ValueError is raised when the acl drops it. tcp traffic also needs its replies to go out.
+
+    ex:
+        security.acl(t, 'videoacl', vpc, [AclRule('udp', 5000, 5100, '10.0.0.0/16'), AclRule('tcp', 22, 22)],
+                     expect=[('udp', (5000, 5100), '10.0.1.0/24')])
+
+    :param template: the template to add the acl too.
+    :param name: name of the acl, its entries are named <name>in<number> and <name>out<number>
+    :param vpc: the vpc of the acl
+    :param rules: list of AclRule, in evaluation order
+    :param expect: list of (protocol, port or (from port, to port), source cidr) that has to be allowed
+    :return: (acl table, list of entries)
+    """
+    numbered = acl_rules(rules, start=start, step=step, return_traffic=return_traffic)
+    for protocol, ports, cidr in expect:
+        rule = acl_drops(numbered, protocol, ports, cidr)
+        if rule is not None:
+            raise(ValueError('{} drops {} {} from {} (rule {})'.format(name, protocol, ports, cidr, rule)))
+        if reachability.protocol_name(protocol) == 'tcp':
+            rule = acl_drops(numbered, protocol, reachability.EPHEMERAL_PORTS, cidr, egress=True)
+            if rule is not None:
+                raise(ValueError('{} drops the replies of {} {} to {} (rule {})'.format(name, protocol, ports, cidr,
+                                                                                       rule)))
+
+    table = acl_table(template=template, name=name, vpc=vpc)
+    entries = []
+    for number, r in numbered:
+        # tcp and udp entries need a port range, all ports when the rule has none
+        low, high = _acl_ports(r) if reachability.protocol_name(r.protocol) in ('tcp', 'udp') else (None, None)
+        title = '{}{}{}'.format(name, 'out' if r.egress else 'in', number)
+        entry = acl_entry(template=template, acl_table=table, name=title,
+                          number=number, protocol=_acl_protocol(r.protocol), from_port=low, to_port=high, cidr=r.cidr,
+                          action=r.action.upper(), egress=r.egress)
+        if entry.Protocol == 1:
+            entry.Icmp = ICMP(Code=-1, Type=-1)
+        entries.append(entry)
+    return table, entries
@@ -1,6 +1,26 @@
+import json
+import shutil
+import sys
+from collections import Counter
+
 import troposphere
 
 
+# template sections in the order of troposphere.Template.to_dict(), (json key, Template attribute)
+SECTIONS = [
+    ('Description', 'description'),
+    ('Metadata', 'metadata'),
+    ('Conditions', 'conditions'),
+    ('Mappings', 'mappings'),
+    ('Outputs', 'outputs'),
+    ('Parameters', 'parameters'),
+    ('AWSTemplateFormatVersion', 'version'),
+    ('Transform', 'transform'),
+    ('Rules', 'rules'),
+    ('Globals', 'globals'),
+]
+
+
 def create(description):
     template = troposphere.Template(Description=description)
     return template
@@ -67,8 +87,103 @@ def save_file(content, file_name='stack.json'):
         f.write(content)
 
 
-def save_template_to_file(template, file_name='stack.json', debug=True):
-    json = template.to_json()
+def _encode(obj):
+    """json default hook for troposphere objects"""
+    if hasattr(obj, 'to_dict'):
+        return obj.to_dict()
+    return obj.JSONrepr()
+
+
+def _dumps(value, indent, depth):
+    """Dump a value as a json string indented as if it was nested `depth` levels deep."""
+    if indent is None:
+        return json.dumps(value, default=_encode, sort_keys=True, separators=(',', ':'))
+    s = json.dumps(value, default=_encode, sort_keys=True, indent=indent)
+    return s.replace('\n', '\n' + ' ' * (indent * depth))
+
+
+def write_template(template, f, indent=4, minify=False):
+    """Stream a template as json to a file handle, one resource at a time.
+
+    The output is identical to template.to_json(indent=indent) but the full body is never built in memory.
+
+    :param template: the template to write
+    :param f: file like object to write to
+    :param indent: indentation of the json document
+    :param minify: write compact json without any whitespace (overrides indent)
+    :return: number of characters written, the json escapes non ascii characters so this is also the size in bytes
+    """
+    if minify:
+        indent = None
+    nl, sep = ('', ':') if indent is None else ('\n', ': ')
+    pad = '' if indent is None else ' ' * indent
+
+    sections = [(key, getattr(template, attr, None)) for key, attr in SECTIONS]
+    sections = [(key, value) for key, value in sections if value]
+    sections.append(('Resources', None))
+
+    size = 0
+    chunk = '{'
+    for n, (key, value) in enumerate(sorted(sections, key=lambda s: s[0])):
+        chunk += '{}{}{}{}'.format(',' if n else '', nl, pad, json.dumps(key) + sep)
+        if key != 'Resources':
+            chunk += _dumps(value, indent, 1)
+            continue
+
+        resources = template.resources
+        if not resources:
+            chunk += '{}'
+            continue
+
+        chunk += '{'
+        for m, title in enumerate(sorted(resources)):
+            chunk += '{}{}{}{}{}'.format(',' if m else '', nl, pad * 2, json.dumps(title) + sep,
+                                         _dumps(resources[title], indent, 2))
+            f.write(chunk)
+            size += len(chunk)
+            chunk = ''
+        chunk += '{}{}}}'.format(nl, pad)
+    chunk += nl + '}'
+    f.write(chunk)
+    return size + len(chunk)
+
+
+class SizeCounter(object):
+    """File like object that only counts what gets written, ex: write_template(template=t, f=SizeCounter()).size"""
+    def __init__(self):
+        self.size = 0
+
+    def write(self, s):
+        self.size += len(s)
+
+
+def summary(template, size=None):
+    """Short description of a template: resource counts per type and (optionally) the serialized size."""
+    counts = Counter(r.resource_type for r in template.resources.values())
+    lines = ['{} resources, {} parameters, {} outputs{}'.format(
+        len(template.resources), len(template.parameters), len(template.outputs),
+        '' if size is None else ', {} bytes'.format(size))]
+    lines += ['  {:>5} {}'.format(count, resource_type) for resource_type, count in sorted(counts.items())]
+    return '\n'.join(lines)
+
+
+def save_template_to_file(template, file_name='stack.json', debug=True, minify=False):
+    """ Stream a template to a json file
+
+    :param template: the template to save
+    :param file_name: path to dump to.
+    :param debug: print a summary (resource counts and size) of the template. Use 'full' to also print the whole body.
+    :param minify: write compact json
+    :return: number of bytes written
+    """
+    print('* saving {}'.format(file_name))
+    with open(file_name, 'w') as f:
+        size = write_template(template=template, f=f, minify=minify)
+
+    if debug == 'full':
+        with open(file_name) as f:
+            shutil.copyfileobj(f, sys.stdout)
+        print('')
     if debug:
-        print(json)
-    save_file(content=json, file_name=file_name)
+        print(summary(template=template, size=size))
+    return size
@@ -20,14 +20,14 @@ def stack():
 
     # zone a
     public1 = ec2.subnet(template=t, name='public1', availability_zone=zone1, cidr='10.0.1.0/24', vpc=network,
-                         gateway=ig)
+                         gateway=ig, share_route_table=True)
     nat1 = ec2.nat_gateway(template=t, public_subnet=public1, gateway_attachement=iga, name='nat1')
     private1 = ec2.subnet(template=t, name='private1', availability_zone=zone1, cidr='10.0.100.0/24', vpc=network,
                           nat=nat1)
 
     # zone b
     public2 = ec2.subnet(template=t, name='public2', availability_zone=zone2, cidr='10.0.2.0/24', vpc=network,
-                         gateway=ig)
+                         gateway=ig, share_route_table=True)
     nat2 = ec2.nat_gateway(template=t, public_subnet=public2, gateway_attachement=iga, name='nat2')
     private2 = ec2.subnet(template=t, name='private2', availability_zone=zone2, cidr='10.0.200.0/24', vpc=network,
                           nat=nat2)
@@ -46,25 +46,10 @@ def stack():
                                  keypair=keypair, role='bastion', placement_group=group, iam_role=iam_role,
                                  interfaces=[(public1, '10.0.1.4', bastion_sg, iga)], volume_size=64)
 
-    # webservers
-    instances = []
-    count = 2
-
-    for i in range(0, count):
-        if i % 2 == 0:
-            # zone a
-            webserver_network = private1
-            webserver_ip = '10.0.100.2{}'
-        else:
-            # zone b
-            webserver_network = private2
-            webserver_ip = '10.0.200.2{}'
-
-        webserver = ec2.instance_with_interfaces(template=t, name='webserver{}'.format(i+1), ami=webserverami,
-                                              type='c4.large', keypair=keypair, role='webserver',
-                                              volume_size=32,
-                                              interfaces=[(webserver_network, webserver_ip.format(i), private_sg, None)])
-        instances.append(webserver)
+    # webservers, alternating between zone a and b
+    instances = ec2.instance_fleet(template=t, name='webserver', count=2, ami=webserverami, type='c4.large',
+                                   keypair=keypair, role='webserver', volume_size=32, first_host=20,
+                                   interfaces=[([private1, private2], private_sg, None)])
 
     websrvelb = elb.elastic_lb(template=t, name="websrvelb", instances=instances, subnets=[public1,public2], instance_port=80,
                            load_balancer_port=80, instance_proto="TCP", load_balancer_proto="TCP",
@@ -2,7 +2,7 @@
 from pyaws.stacks import ec2, security, template, iam, route53, elb
 
 
-def stack():
+def stack(pool_of_vdcm=0):
     t = template.create(description='Lisa test setup')
     keypair = template.add_keypair_parameter(t)
     group = ec2.placement_group(template=t, name='lisagroup')
@@ -45,7 +45,7 @@ def stack():
     ec2.instance_with_interfaces(template=t, name='streamer', ami=ec2.AMI.centos_sriov, type='c4.2xlarge',
                                  keypair=keypair,
                                  role='ips', user_data=ec2.ETH1_USER_DATA, placement_group=group, iam_role=iam_s3_full,
-                                 volume_size=64,
+                                 volume_size=64, enhanced_networking='sriov',
                                  interfaces=[(private_subnet, '10.0.10.9', mgmt_sg, None),
                                              (video_subnet, '10.0.100.9', video_sg, None)])
     # vdcm used to stream
@@ -55,12 +55,9 @@ def stack():
                                  interfaces=[(private_subnet, '10.0.10.10', mgmt_sg, None),
                                              (video_subnet, '10.0.100.10', video_sg, None)])
 
-    pool_of_vdcm = 0
-    for i in range(0, pool_of_vdcm):
-        ec2.instance_with_interfaces(template=t, name='vdcm{}'.format(i), ami=ec2.AMI.vdcm_9, type='c4.4xlarge',
-                                     keypair=keypair, role='vdcm', placement_group=group,
-                                     interfaces=[(private_subnet, '10.0.10.{}'.format(100 + i), mgmt_sg, None),
-                                                 (video_subnet, '10.0.100.{}'.format(100 + i), video_sg, None)])
+    ec2.instance_fleet(template=t, name='vdcm', count=pool_of_vdcm, start=0, ami=ec2.AMI.vdcm_9, type='c4.4xlarge',
+                       keypair=keypair, role='vdcm', placement_group=group, first_host=100,
+                       interfaces=[(private_subnet, mgmt_sg, None), (video_subnet, video_sg, None)])
 
     hostedzonename = 'kortrijkprodops.com.'
     elasticLB = elb.elastic_lb(template=t, name='elb' + testserver.title, instances=[testserver],
@@ -52,15 +52,10 @@ def stack():
                                load_balancer_port=8443, instance_port=8443, securitygroups=[vsm_sg])
     route53.elb(template=t, name='master', hostedzonename=hostedzonename, elasticLB=elasticLB, dns='master')
 
-    worker_instances = []
-    workers = 2
-    for i in range(0, workers):
-        worker = ec2.instance_with_interfaces(template=t, name='worker{}'.format(i+1), ami=worker_ami,
-                                              type='c4.2xlarge',
-                                              keypair=keypair, role='worker', placement_group=group, iam_role=iam_role,
-                                              interfaces=[(private_subnet, '10.0.10.2{}'.format(i), private_sg, None)],
-                                              volume_size=32)
-        worker_instances.append(worker)
+    worker_instances = ec2.instance_fleet(template=t, name='worker', count=2, ami=worker_ami, type='c4.2xlarge',
+                                          keypair=keypair, role='worker', placement_group=group, iam_role=iam_role,
+                                          volume_size=32, first_host=20,
+                                          interfaces=[(private_subnet, private_sg, None)])
     elasticLB = elb.elastic_lb(template=t, name='workerlb', instances=worker_instances, subnets=[public_subnet],
                                load_balancer_port=80, instance_port=30101, instance_proto="HTTP",
                                load_balancer_proto="HTTP", securitygroups=[vsm_sg])
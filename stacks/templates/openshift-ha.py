@@ -2,7 +2,10 @@
 from pyaws.stacks import ec2, security, template, route53, elb, iam
 
 
-def stack():
+def stack(nodes=2, pool=False, nlb=False):
+    """pool: workers in an auto scaling group of a parameterized size instead of instances with fixed addresses
+    nlb: masters behind network load balancers instead of classic elbs
+    """
     t = template.create(description='openshift-ha')
 
     keypair = template.add_keypair_parameter(t)
@@ -22,14 +25,14 @@ def stack():
 
     # zone a
     public1 = ec2.subnet(template=t, name='public1', availability_zone=zone1, cidr='10.0.1.0/24', vpc=network,
-                         gateway=ig)
+                         gateway=ig, share_route_table=True)
     nat1 = ec2.nat_gateway(template=t, public_subnet=public1, gateway_attachement=iga, name='nat1')
     private1 = ec2.subnet(template=t, name='private1', availability_zone=zone1, cidr='10.0.100.0/24', vpc=network,
                           nat=nat1)
 
     # zone b
     public2 = ec2.subnet(template=t, name='public2', availability_zone=zone2, cidr='10.0.2.0/24', vpc=network,
-                         gateway=ig)
+                         gateway=ig, share_route_table=True)
     nat2 = ec2.nat_gateway(template=t, public_subnet=public2, gateway_attachement=iga, name='nat2')
     private2 = ec2.subnet(template=t, name='private2', availability_zone=zone2, cidr='10.0.200.0/24', vpc=network,
                           nat=nat2)
@@ -65,40 +68,34 @@ def stack():
                                            keypair=keypair, role='master',
                                            interfaces=[(private2, '10.0.200.11', private_sg, None)], volume_size=64)
 
-    masterlb = elb.elastic_lb(template=t, name="masterLB", instances=[master1, master2], subnets=publicnets,
-                              instance_port=8443, load_balancer_port=8443, securitygroups=[master_elb_sg],
-                              load_balancer_proto='TCP', instance_proto='TCP',
-                              health_check=elb.health_check(name='masterlbhealthcheck'))
+    # without the client address: private_sg only allows the vpc and the masters reach themselves through masterLBint
+    balancer, options = (elb.network_lb, dict(preserve_client_ip=False)) if nlb else (elb.elastic_lb, {})
+    masterlb = balancer(template=t, name="masterLB", instances=[master1, master2], subnets=publicnets,
+                        instance_port=8443, load_balancer_port=8443, securitygroups=[master_elb_sg],
+                        load_balancer_proto='TCP', instance_proto='TCP',
+                        health_check=elb.health_check(name='masterlbhealthcheck'), **options)
     route53.elb(template=t, name="masterDns", hostedzonename=hostedzonename, elasticLB=masterlb, dns='master')
-    masterlbint = elb.elastic_lb(template=t, name="masterLBint", instances=[master1, master2], subnets=privatenets,
-                                 instance_port=8443, load_balancer_port=8443, securitygroups=[private_sg],
-                                 load_balancer_proto='TCP', instance_proto='TCP',
-                                 health_check=elb.health_check(name='masterlbhealthcheck'), scheme="internal")
+    masterlbint = balancer(template=t, name="masterLBint", instances=[master1, master2], subnets=privatenets,
+                           instance_port=8443, load_balancer_port=8443, securitygroups=[private_sg],
+                           load_balancer_proto='TCP', instance_proto='TCP',
+                           health_check=elb.health_check(name='masterlbhealthcheck'), scheme="internal", **options)
     route53.elb(template=t, name="masterDnsInt", hostedzonename=hostedzonename, elasticLB=masterlbint, dns='int-master')
 
-    # workers
-    instances = []
-    nodes = 2
-
-    for i in range(0, nodes):
-        if i % 2 == 0:
-            # zone a
-            node_network = private1
-            node_ip = '10.0.100.2{}'
-        else:
-            # zone b
-            node_network = private2
-            node_ip = '10.0.200.2{}'
-
-        worker = ec2.instance_with_interfaces(template=t, name='node{}'.format(i+1), ami=worker_ami,
-                                              type='c4.4xlarge', keypair=keypair, role='worker',
-                                              volume_size=32,
-                                              interfaces=[(node_network, node_ip.format(i), private_sg, None)])
-        instances.append(worker)
-
-    mpelb = elb.app_elb(template=t, name="mpeLB", subnets=publicnets, instances=instances, vpc=network,
-                        securitygroups=[elb_sg], instance_port=80, load_balancer_port=80, instance_proto="HTTP",
-                        load_balancer_proto="HTTP")
+    # workers, alternating between zone a and b
+    if pool:
+        mpelb = elb.app_elb(template=t, name="mpeLB", subnets=publicnets, instances=[], vpc=network,
+                            securitygroups=[elb_sg], instance_port=80, load_balancer_port=80, instance_proto="HTTP",
+                            load_balancer_proto="HTTP")
+        ec2.auto_scaling_group(template=t, name='node', size=nodes, ami=worker_ami, type='c4.4xlarge',
+                               keypair=keypair, role='worker', volume_size=32, subnets=privatenets,
+                               security_groups=private_sg, load_balancers=[mpelb])
+    else:
+        instances = ec2.instance_fleet(template=t, name='node', count=nodes, ami=worker_ami, type='c4.4xlarge',
+                                       keypair=keypair, role='worker', volume_size=32, first_host=20,
+                                       interfaces=[(privatenets, private_sg, None)])
+        mpelb = elb.app_elb(template=t, name="mpeLB", subnets=publicnets, instances=instances, vpc=network,
+                            securitygroups=[elb_sg], instance_port=80, load_balancer_port=80, instance_proto="HTTP",
+                            load_balancer_proto="HTTP")
     route53.elb(template=t, name="mpeRoute", hostedzonename=hostedzonename, elasticLB=mpelb, subdomain='*')
 
     return t
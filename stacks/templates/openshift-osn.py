@@ -35,15 +35,9 @@ def stack():
     ec2.instance_with_interfaces(template=t, name='deployer', ami=deployer_ami, type='c4.2xlarge',
                                  keypair=keypair, role='deployer', iam_role=iam_role_ecr,
                                  interfaces=[(private_net_1, '10.242.2.6', private_sg, None)], volume_size=64)
-    masters = []
-    num_masters = 3
-    for i in range(0, num_masters):
-        zone = i % 3
-        master = ec2.instance_with_interfaces(template=t, name='master{}'.format(i+1), ami=worker_ami,
-                                              type='c4.2xlarge', keypair=keypair, role='master',
-                                              interfaces=[(private_nets[zone], None, private_sg, None)],
-                                              volume_size=64)
-        masters.append(master)
+    masters = ec2.instance_fleet(template=t, name='master', count=3, ami=worker_ami, type='c4.2xlarge',
+                                 keypair=keypair, role='master', volume_size=64,
+                                 interfaces=[(private_nets, private_sg, None)])
 
     masterelb = elb.elastic_lb(template=t, name="masterELB", instances=masters,
                                subnets=public_nets,
@@ -60,15 +54,9 @@ def stack():
     route53.elb(template=t, name="masterdnsint", hostedzonename=hostedzonename, elasticLB=masterelbint,
                 dns='int-master')
 
-    nodes = []
-    num_nodes = 2
-    for i in range(0, num_nodes):
-        zone = i % 3
-        worker = ec2.instance_with_interfaces(template=t, name='node{}'.format(i+1), ami=worker_ami,
-                                              type='c4.4xlarge', keypair=keypair, role='worker',
-                                              volume_size=32,
-                                              interfaces=[(private_nets[zone], None, private_sg, None)])
-        nodes.append(worker)
+    nodes = ec2.instance_fleet(template=t, name='node', count=2, ami=worker_ami, type='c4.4xlarge',
+                               keypair=keypair, role='worker', volume_size=32,
+                               interfaces=[(private_nets, private_sg, None)])
 
     mpeelb = elb.elastic_lb(template=t, name="mpeELB", instances=nodes,
                             subnets=public_nets,
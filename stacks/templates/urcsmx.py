@@ -67,13 +67,9 @@ def stack():
                                      volume_size=64)
 
     # DCM pool
-    vdcm = 10
-    for i in range(0, vdcm):
-        ec2.instance_with_interfaces(template=t, name='vdcm{}'.format(i), ami=vdcm_ami, type='c4.2xlarge',
-                                     keypair=keypair, role='xcdr', placement_group=group, iam_role=iam_role,
-                                     interfaces=[(private, '10.0.100.{}'.format(i + 20), private_sg, None),
-                                                 (video, '10.0.200.{}'.format(i + 20), video_sg, None)],
-                                     volume_size=64)
+    ec2.instance_fleet(template=t, name='vdcm', count=10, start=0, ami=vdcm_ami, type='c4.2xlarge',
+                       keypair=keypair, role='xcdr', placement_group=group, iam_role=iam_role, volume_size=64,
+                       first_host=20, interfaces=[(private, private_sg, None), (video, video_sg, None)])
 
     return t
 
@@ -54,13 +54,9 @@ def stack():
                                  volume_size=32)
 
     # DCM pool
-    vdcm = 3
-    for i in range(0, vdcm):
-        ec2.instance_with_interfaces(template=t, name='vdcm{}'.format(i), ami=vdcm_ami, type='c4.8xlarge',
-                                     keypair=keypair, role='vdcm', placement_group=group, iam_role=iam_role,
-                                     interfaces=[(private, '10.0.100.{}'.format(i + 10), private_sg, None),
-                                                 (video, '10.0.200.{}'.format(i + 10), video_sg, None)],
-                                     volume_size=64)
+    ec2.instance_fleet(template=t, name='vdcm', count=3, start=0, ami=vdcm_ami, type='c4.8xlarge',
+                       keypair=keypair, role='vdcm', placement_group=group, iam_role=iam_role, volume_size=64,
+                       first_host=10, interfaces=[(private, private_sg, None), (video, video_sg, None)])
 
     return t
 
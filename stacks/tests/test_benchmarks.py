@@ -0,0 +1,49 @@
+from ...stacks.benchmarks import compare, generation, iam_simulator, reachability, read_results, security_groups, \
+    write_results
+
+
+def specs(rules):
+    return [r.to_dict() for r in rules]
+
+
+def test_generation_benchmark(tmpdir):
+    results = generation.benchmark(runs=1, quick=True, templates=['openshift-ha'])
+    assert sorted(results) == ['openshift-ha', 'openshift-ha@10', 'openshift-ha@100']
+    small, big = results['openshift-ha@10'], results['openshift-ha@100']
+    assert big['resources'] > small['resources']
+    assert big['peak_bytes'] > 0 and big['size'] > small['size']
+
+    f = str(tmpdir.join('generation.json'))
+    write_results(f, results)
+    assert read_results(f) == results
+
+
+def test_non_linear():
+    results = {'lisa01@10': dict(stack_seconds=1.0, resources=10),
+               'lisa01@1000': dict(stack_seconds=500.0, resources=1000),
+               'openshift-ha@10': dict(stack_seconds=1.0, resources=10),
+               'openshift-ha@1000': dict(stack_seconds=100.0, resources=1000)}
+    assert generation.non_linear(results) == [('lisa01', 0.1, 0.5)]
+
+
+def test_compare():
+    old = dict(a=dict(t=1.0), b=dict(t=1.0))
+    new = dict(a=dict(t=1.1), b=dict(t=2.0), c=dict(t=5.0))
+    assert compare(old, new, key='t') == [('b', 1.0, 2.0, 1.0)]
+
+
+def test_security_groups_benchmark():
+    assert specs(security_groups.legacy_rules(['10.0.0.0/16'])) == specs(security_groups.catalog_rules(['10.0.0.0/16']))
+    results = security_groups.benchmark(groups=2, runs=1)
+    assert sorted(results) == ['catalog', 'groups', 'legacy', 'rendered']
+
+
+def test_reachability_benchmark():
+    results = reachability.benchmark(sizes=(8,), runs=1)
+    assert sorted(results) == ['fleet@8']
+    assert results['fleet@8']['matrix_seconds'] > 0
+
+
+def test_iam_simulator_benchmark():
+    results = iam_simulator.benchmark(buckets=2, count=4, runs=1)
+    assert sorted(results) == ['checks', 'evaluator']
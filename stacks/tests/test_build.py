@@ -0,0 +1,42 @@
+import os
+
+from ...stacks import build
+
+
+def test_discover_templates():
+    names = [build.template_name(p) for p in build.discover_templates()]
+    assert 'demo' in names
+    assert '__init__' not in names
+
+
+def test_build_skips_unchanged_templates(tmpdir):
+    output = str(tmpdir)
+    rendered, skipped = build.build(output=output, templates=['demo', 'bastion'], jobs=2)
+    assert rendered == ['bastion', 'demo']
+    assert skipped == []
+    assert os.path.exists(os.path.join(output, 'demo.json'))
+
+    rendered, skipped = build.build(output=output, templates=['demo', 'bastion'], jobs=2)
+    assert rendered == []
+    assert skipped == ['bastion', 'demo']
+
+    # a missing output file is rendered again
+    os.remove(os.path.join(output, 'demo.json'))
+    rendered, skipped = build.build(output=output, templates=['demo', 'bastion'], jobs=2)
+    assert rendered == ['demo']
+    assert skipped == ['bastion']
+
+
+def test_library_hash(tmpdir):
+    for name in ('ec2.py', 'instance_types.csv', 'benchmarks/generation.py', 'templates/demo.py', 'tests/test_ec2.py'):
+        tmpdir.join(name).write('x', ensure=True)
+    library = str(tmpdir)
+    before = build.library_hash(library)
+    tmpdir.join('templates', 'demo.py').write('y')
+    tmpdir.join('tests', 'test_ec2.py').write('y')
+    assert build.library_hash(library) == before
+    hashes = {before}
+    for name in ('instance_types.csv', 'benchmarks/generation.py', 'ec2.py'):
+        tmpdir.join(name).write('y')
+        hashes.add(build.library_hash(library))
+    assert len(hashes) == 4
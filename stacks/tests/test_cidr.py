@@ -0,0 +1,69 @@
+import pytest
+
+from ...stacks import build, cidr, ec2, template
+
+
+def test_plan_tiers_per_zone():
+    subnets = cidr.plan('10.0.0.0/16', zones=2)
+    assert subnets == [('public', 0, '10.0.0.0/24'), ('public', 1, '10.0.1.0/24'),
+                       ('private', 0, '10.0.2.0/24'), ('private', 1, '10.0.3.0/24'),
+                       ('video', 0, '10.0.4.0/24'), ('video', 1, '10.0.5.0/24')]
+
+
+def test_plan_mixed_prefixes_are_aligned():
+    subnets = cidr.plan('10.0.0.0/16', zones=3, prefix=dict(public=26, private=20, video=28))
+    assert [c for _, _, c in subnets] == ['10.0.0.0/26', '10.0.0.64/26', '10.0.0.128/26',
+                                          '10.0.16.0/20', '10.0.32.0/20', '10.0.48.0/20',
+                                          '10.0.64.0/28', '10.0.64.16/28', '10.0.64.32/28']
+    assert cidr.overlaps([(str(i), c) for i, (_, _, c) in enumerate(subnets)]) == []
+
+
+def test_plan_full_vpc():
+    with pytest.raises(RuntimeError):
+        cidr.plan('10.0.0.0/24', zones=3, prefix=26)
+    with pytest.raises(ValueError):
+        cidr.plan('10.0.0.0/24', zones=1, prefix=16)
+
+
+def test_overlaps_nested():
+    found = cidr.overlaps([('a', '10.0.0.0/16'), ('b', '10.0.1.0/24'), ('c', '10.0.1.128/25'),
+                           ('d', '10.0.2.0/24'), ('e', '10.1.0.0/16')])
+    assert sorted(found) == [('a', 'b'), ('a', 'c'), ('a', 'd'), ('b', 'c')]
+
+
+def test_subnets_and_validate():
+    t = template.create(description='test')
+    zones = [template.add_parameter(t, name='zone{}'.format(i), description='zone') for i in (1, 2)]
+    vpc = ec2.vpc(template=t, name='vpc', cidr='10.0.0.0/16')
+    ig, iga = ec2.internet_gateway(template=t, vpc=vpc)
+    subnets = cidr.subnets(template=t, vpc=vpc, zones=zones, public=dict(gateway=ig))
+    assert [s.title for s in subnets['private']] == ['private1', 'private2']
+    assert subnets['video'][1].CidrBlock == '10.0.5.0/24'
+    assert 'public1RouteTable' in t.resources
+    assert cidr.validate(t) == []
+
+    ec2.subnet(template=t, name='clash', vpc=vpc, cidr='10.0.5.128/25', availability_zone=None)
+    ec2.subnet(template=t, name='outside', vpc=vpc, cidr='10.1.0.0/24', availability_zone=None)
+    assert cidr.validate(t) == [
+        'subnet outside (10.1.0.0/24) is outside vpc vpc (10.0.0.0/16)',
+        'subnet video2 (10.0.5.0/24) overlaps subnet clash (10.0.5.128/25)']
+    with pytest.raises(ValueError):
+        cidr.check(t)
+
+
+def test_validate_across_templates():
+    a, b = template.create(description='a'), template.create(description='b')
+    ec2.subnet(template=a, name='s', vpc=ec2.vpc(template=a, name='vpc'), cidr='10.0.1.0/24', availability_zone=None)
+    ec2.subnet(template=b, name='s', vpc=ec2.vpc(template=b, name='vpc'), cidr='10.0.1.0/24', availability_zone=None)
+    assert cidr.validate(a, b) == ['vpc 0:vpc (10.0.0.0/16) overlaps vpc 1:vpc (10.0.0.0/16)']
+
+
+@pytest.mark.parametrize('path', build.discover_templates(), ids=build.template_name)
+def test_templates_are_valid(path):
+    try:
+        module = build.load_module(path)
+    except ImportError as e:
+        if 'troposphere' not in str(e):
+            raise
+        pytest.skip('the installed troposphere is too old for this template: {}'.format(e))
+    assert cidr.validate(module['stack']()) == []
@@ -0,0 +1,64 @@
+import json
+import time
+
+from ...stacks import diff, ec2, template
+
+
+def stack(ip='10.0.0.10', instance_type='t2.micro', extra=False, nodes=1):
+    t = template.create(description='test')
+    keypair = template.add_keypair_parameter(t)
+    network = ec2.vpc(template=t, name='vpc', cidr='10.0.0.0/16')
+    public = ec2.subnet(template=t, name='public', cidr='10.0.0.0/24', vpc=network, availability_zone=None)
+    for i in range(nodes):
+        ec2.instance_with_interfaces(template=t, name='machine{}'.format(i), ami=keypair, type=instance_type,
+                                     keypair=keypair, role='demo', interfaces=[(public, ip, None, None)])
+    if extra:
+        ec2.subnet(template=t, name='private', cidr='10.0.1.0/24', vpc=network, availability_zone=None)
+    return t
+
+
+def test_no_changes():
+    d = diff.diff(stack(), stack().to_dict())
+    assert d == dict(added=[], removed=[], modified={})
+    assert diff.report(d) == 'no changes'
+
+
+def test_added_removed():
+    d = diff.diff(stack(), stack(extra=True))
+    assert d['added'] == ['private']
+    assert d['removed'] == []
+    assert diff.diff(stack(extra=True), stack())['removed'] == ['private']
+
+
+def test_replacement_flags(tmpdir):
+    old = str(tmpdir.join('old.json'))
+    template.save_template_to_file(stack(), file_name=old, debug=False)
+    d = diff.diff(old, stack(ip='10.0.0.11', instance_type='t2.small'))
+    assert sorted(d['modified']) == ['machine0', 'machine0eth0']
+    assert d['modified']['machine0eth0']['properties'] == {'PrivateIpAddress': ('10.0.0.10', '10.0.0.11')}
+    assert d['modified']['machine0eth0']['replacement'] == ['PrivateIpAddress']
+    # the new interface gets a new id, the Ref in NetworkInterfaces replaces the instance
+    assert d['modified']['machine0']['replacement'] == ['NetworkInterfaces']
+    assert d['modified']['machine0']['replaced_references'] == ['machine0eth0']
+    assert d['modified']['machine0']['interruption'] == ['InstanceType']
+    assert diff.replacements(d) == ['machine0', 'machine0eth0']
+    assert 'REPLACEMENT: PrivateIpAddress' in diff.report(d)
+    assert '~ machine0 (REPLACEMENT: NetworkInterfaces, replaced: machine0eth0)' in diff.report(d)
+
+
+def test_replacement_of_unmodified_resources():
+    """the instance itself doesn't change, it refers to an interface that is replaced"""
+    d = diff.diff(stack(), stack(ip='10.0.0.11'))
+    assert diff.replacements(d) == ['machine0', 'machine0eth0']
+    assert d['modified']['machine0']['properties'] == {}
+    assert d['modified']['machine0']['interruption'] == []
+
+
+def test_large_template_is_fast():
+    old = stack(nodes=150).to_dict()
+    new = json.loads(json.dumps(old))
+    new['Resources']['machine7']['Properties']['InstanceType'] = 'c4.large'
+    start = time.time()
+    d = diff.diff(old, new)
+    assert time.time() - start < 1
+    assert list(d['modified']) == ['machine7']
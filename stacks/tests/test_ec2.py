@@ -0,0 +1,211 @@
+import os
+
+import pytest
+
+from ...stacks import build, ec2, elb, template
+
+
+def network(t):
+    vpc = ec2.vpc(template=t, name='vpc', cidr='10.0.0.0/16')
+    a = ec2.subnet(template=t, name='a', cidr='10.0.1.0/24', vpc=vpc, availability_zone=None)
+    b = ec2.subnet(template=t, name='b', cidr='10.0.2.0/24', vpc=vpc, availability_zone=None)
+    video = ec2.subnet(template=t, name='video', cidr='10.0.3.0/28', vpc=vpc, availability_zone=None)
+    return a, b, video
+
+
+def test_instance_fleet_spreads_over_subnets():
+    t = template.create(description='test')
+    keypair = template.add_keypair_parameter(t)
+    a, b, video = network(t)
+    nodes = ec2.instance_fleet(template=t, name='node', count=3, ami=keypair, type='c4.large', keypair=keypair,
+                               role='worker', first_host=20, interfaces=[([a, b], None, None)])
+    assert [n.title for n in nodes] == ['node1', 'node2', 'node3']
+    assert t.resources['node1eth0'].PrivateIpAddress == '10.0.1.20'
+    assert t.resources['node2eth0'].PrivateIpAddress == '10.0.2.21'
+    assert t.resources['node3eth0'].PrivateIpAddress == '10.0.1.22'
+    assert t.resources['node2eth0'].SubnetId.data == {'Ref': 'b'}
+    ec2.instance_fleet(template=t, name='vdcm', count=3, ami=keypair, type='c4.large', keypair=keypair, role='vdcm',
+                       first_host=30, interfaces=[([a, b], None, None)], per_subnet=True)
+    assert [t.resources['vdcm{}eth0'.format(i)].PrivateIpAddress for i in (1, 2, 3)] == [
+        '10.0.1.30', '10.0.2.30', '10.0.1.31']
+    with pytest.raises(ValueError, match='first_host 3 is reserved'):
+        ec2.instance_fleet(template=t, name='low', count=1, ami=keypair, type='c4.large', keypair=keypair,
+                           role='low', first_host=3, interfaces=[(a, None, None)])
+
+
+def test_instance_fleet_multiple_interfaces_and_dhcp():
+    t = template.create(description='test')
+    keypair = template.add_keypair_parameter(t)
+    a, b, video = network(t)
+    ec2.instance_fleet(template=t, name='vdcm', count=2, start=0, ami=keypair, type='c4.large', keypair=keypair,
+                       role='vdcm', interfaces=[(a, None, None), (video, None, None)])
+    assert {'vdcm0', 'vdcm1', 'vdcm0eth1', 'vdcm1eth1'} <= set(t.resources)
+    assert 'PrivateIpAddress' not in t.resources['vdcm1eth1'].properties
+
+
+def test_instance_fleet_subnet_too_small():
+    t = template.create(description='test')
+    keypair = template.add_keypair_parameter(t)
+    a, b, video = network(t)
+    with pytest.raises(RuntimeError):
+        ec2.instance_fleet(template=t, name='vdcm', count=12, ami=keypair, type='c4.large', keypair=keypair,
+                           role='vdcm', first_host=4, interfaces=[(video, None, None)])
+
+
+def test_ip_allocator():
+    t = template.create(description='test')
+    a, b, video = network(t)
+    ips = ec2.IpAllocator()
+    assert ips.allocate(video) == '10.0.3.4'
+    assert ips.allocate(video, '10.0.3.6') == '10.0.3.6'
+    assert ips.allocate(video) == '10.0.3.5'
+    assert ips.allocate(video) == '10.0.3.7'
+    assert ips.free(video) == 16 - 5 - 4
+    for ip in ('10.0.3.6', '10.0.3.3', '10.0.3.15', '10.0.4.7'):
+        with pytest.raises(ValueError):
+            ips.allocate(video, ip)
+    for _ in range(7):
+        ips.allocate(video)
+    with pytest.raises(RuntimeError):
+        ips.allocate(video)
+    assert ips.allocate(a, '10.0.1.7') == '10.0.1.7'
+
+
+def test_ip_allocator_with_interfaces():
+    t = template.create(description='test')
+    keypair = template.add_keypair_parameter(t)
+    a, b, video = network(t)
+    ips = ec2.IpAllocator()
+    ec2.instance_with_interfaces(template=t, name='bastion', ami=keypair, type='t2.micro', keypair=keypair, role='x',
+                                 interfaces=[(a, '10.0.1.20', None, None), (video, None, None, None)], allocator=ips)
+    assert t.resources['bastioneth1'].PrivateIpAddress == '10.0.3.4'
+    with pytest.raises(ValueError):
+        ec2.instance_fleet(template=t, name='node', count=2, ami=keypair, type='c4.large', keypair=keypair,
+                           role='worker', first_host=19, interfaces=[(a, None, None)], allocator=ips)
+    ec2.instance_fleet(template=t, name='vdcm', count=2, ami=keypair, type='c4.large', keypair=keypair,
+                       role='vdcm', interfaces=[([a, b], None, None)], allocator=ips)
+    assert t.resources['vdcm1eth0'].PrivateIpAddress == '10.0.1.4'
+    assert t.resources['vdcm2eth0'].PrivateIpAddress == '10.0.2.4'
+
+
+def test_shared_route_tables():
+    t = template.create(description='test')
+    vpc = ec2.vpc(template=t, name='vpc', cidr='10.0.0.0/16')
+    ig, iga = ec2.internet_gateway(template=t, vpc=vpc)
+    for i in range(3):
+        ec2.subnet(template=t, name='public{}'.format(i), cidr='10.0.{}.0/24'.format(i), vpc=vpc, gateway=ig,
+                   availability_zone=None, share_route_table=True)
+    ec2.subnet(template=t, name='own', cidr='10.0.10.0/24', vpc=vpc, gateway=ig, availability_zone=None)
+
+    tables = sorted(title for title, r in t.resources.items() if r.resource_type == 'AWS::EC2::RouteTable')
+    assert tables == ['InternetGatewayRouteTable', 'ownRouteTable']
+    assert t.resources['InternetGatewayRoute'].GatewayId.data == {'Ref': 'InternetGateway'}
+    assert t.resources['public2SubnetRouteTableAssociation'].RouteTableId.data == {'Ref': 'InternetGatewayRouteTable'}
+
+
+def test_route_table_nat():
+    t = template.create(description='test')
+    vpc = ec2.vpc(template=t, name='vpc', cidr='10.0.0.0/16')
+    ig, iga = ec2.internet_gateway(template=t, vpc=vpc)
+    public = ec2.subnet(template=t, name='public', cidr='10.0.0.0/24', vpc=vpc, gateway=ig, availability_zone=None)
+    nat = ec2.nat_gateway(template=t, public_subnet=public, gateway_attachement=iga)
+    rt = ec2.route_table(template=t, name='private', vpc=vpc, nat=nat)
+    assert rt.title == 'privateRouteTable'
+    assert t.resources['privateRoute'].NatGatewayId.data == {'Ref': 'natgateway'}
+    with pytest.raises(RuntimeError):
+        ec2.route_table(template=t, name='both', vpc=vpc, gateway=ig, nat=nat)
+
+
+def test_auto_scaling_group():
+    t = template.create(description='test')
+    keypair = template.add_keypair_parameter(t)
+    ami = template.add_parameter(t, name='ami', description='ami')
+    a, b, video = network(t)
+    applb = elb.app_elb(template=t, name='app', subnets=[a, b], instances=[], vpc=t.resources['vpc'],
+                        securitygroups=[])
+    classic = elb.elastic_lb(template=t, name='classic', instances=[], subnets=[a, b], securitygroups=[])
+    group, size = ec2.auto_scaling_group(template=t, name='node', size=4, ami=ami, type='c4.large', keypair=keypair,
+                                         role='worker', subnets=[a, b], load_balancers=[applb, classic],
+                                         user_data=ec2.ETH1_USER_DATA, volume_size=32, iam_role='S3FACC')
+
+    d = t.to_dict()
+    assert d['Parameters']['nodeSize']['Default'] == 4
+    props = d['Resources']['node']['Properties']
+    assert props['DesiredCapacity'] == props['MaxSize'] == {'Ref': 'nodeSize'}
+    assert props['VPCZoneIdentifier'] == [{'Ref': 'a'}, {'Ref': 'b'}]
+    assert props['TargetGroupARNs'] == [{'Ref': 'apptargetgroup'}]
+    assert props['LoadBalancerNames'] == [{'Ref': 'classic'}]
+    data = d['Resources']['nodeLaunchTemplate']['Properties']['LaunchTemplateData']
+    assert data['ImageId'] == {'Ref': 'ami'}
+    assert data['IamInstanceProfile'] == {'Name': 'S3FACC'}
+    assert 'Fn::Base64' in data['UserData']
+
+
+def test_openshift_ha_pool():
+    stack = build.load_module(os.path.join(build.TEMPLATES_DIR, 'openshift-ha.py'))['stack']
+    fixed, pool = stack(nodes=100), stack(nodes=100, pool=True)
+    assert len(pool.resources) < len(fixed.resources) - 190
+    assert pool.to_dict()['Parameters']['nodeSize']['Default'] == 100
+
+
+def test_placement_group_strategies():
+    t = template.create(description='test')
+    assert ec2.placement_group(template=t, name='c').Strategy == 'cluster'
+    p = ec2.placement_group(template=t, name='p', strategy='partition', partition_count=3)
+    assert p.to_dict()['Properties'] == {'Strategy': 'partition', 'PartitionCount': 3}
+    with pytest.raises(ValueError):
+        ec2.placement_group(template=t, name='x', strategy='spread', partition_count=2)
+    with pytest.raises(ValueError):
+        ec2.placement_group(template=t, name='y', strategy='pack')
+
+
+def test_instance_network_options():
+    t = template.create(description='test')
+    keypair = template.add_keypair_parameter(t)
+    cluster = ec2.placement_group(template=t, name='cluster')
+    i = ec2.instance(template=t, name='vdcm', ami='ami', type='c5n.4xlarge', keypair=keypair, interfaces=None,
+                     placement_group=cluster, ebs_optimized=True, monitoring=True, tenancy='dedicated',
+                     threads_per_core=1, enhanced_networking='ena')
+    props = i.to_dict()['Properties']
+    assert props['CpuOptions'] == {'CoreCount': 8, 'ThreadsPerCore': 1}
+    assert (props['EbsOptimized'], props['Monitoring'], props['Tenancy']) == (True, True, 'dedicated')
+
+    invalid = [dict(type='t2.micro', placement_group=cluster), dict(type='c3.large', ebs_optimized=True),
+               dict(type='c4.large', enhanced_networking='ena'), dict(type='c5.large', cpu_cores=2),
+               dict(type='t2.small', threads_per_core=2), dict(type='c5.large', tenancy='shared')]
+    for n, options in enumerate(invalid):
+        with pytest.raises(ValueError):
+            ec2.instance(template=t, name='invalid{}'.format(n), ami='ami', keypair=keypair, interfaces=None,
+                         **options)
+    assert not [title for title in t.resources if title.startswith('invalid')]
+
+
+def test_volumes():
+    t = template.create(description='test')
+    keypair = template.add_keypair_parameter(t)
+    i = ec2.instance(template=t, name='build', ami='ami', type='c5.2xlarge', keypair=keypair, interfaces=None,
+                     volumes=[ec2.volume('/dev/sda1', size=64, iops=6000, throughput=500),
+                              ec2.volume('/dev/sdf', size=100, type='io2', iops=20000, delete_on_termination=False),
+                              ec2.ephemeral('/dev/sdb')])
+    devices = i.to_dict()['Properties']['BlockDeviceMappings']
+    assert devices[0] == {'DeviceName': '/dev/sda1', 'Ebs': {'VolumeSize': 64, 'VolumeType': 'gp3', 'Iops': 6000,
+                                                             'Throughput': 500, 'DeleteOnTermination': True}}
+    assert devices[1]['Ebs']['DeleteOnTermination'] is False
+    assert devices[2] == {'DeviceName': '/dev/sdb', 'VirtualName': 'ephemeral0'}
+
+    for args in [dict(size=10, iops=6000), dict(size=64, throughput=800), dict(size=64, type='gp2', iops=3000),
+                 dict(size=64, type='io1'), dict(size=64, type='gp4')]:
+        with pytest.raises(ValueError):
+            ec2.volume('/dev/sdf', **args)
+    with pytest.raises(ValueError):
+        ec2.instance(template=t, name='twice', ami='ami', type='c5.large', keypair=keypair, interfaces=None,
+                     volume_size=32, volumes=[ec2.volume('/dev/sda1', size=32)])
+
+
+def test_launch_template_volumes():
+    t = template.create(description='test')
+    keypair = template.add_keypair_parameter(t)
+    lt = ec2.launch_template(template=t, name='pool', ami='ami', type='c5.large', keypair=keypair, volume_size=32,
+                             volumes=[ec2.volume('/dev/sdf', size=100)])
+    devices = lt.to_dict()['Properties']['LaunchTemplateData']['BlockDeviceMappings']
+    assert [d['DeviceName'] for d in devices] == ['/dev/sda1', '/dev/sdf']
@@ -0,0 +1,68 @@
+import os
+
+import pytest
+
+from ...stacks import build, ec2, elb, template
+
+
+def masters(t):
+    keypair = template.add_keypair_parameter(t)
+    vpc = ec2.vpc(template=t, name='vpc', cidr='10.0.0.0/16')
+    subnets = [ec2.subnet(template=t, name=name, cidr=cidr, vpc=vpc, availability_zone=None)
+               for name, cidr in (('a', '10.0.1.0/24'), ('b', '10.0.2.0/24'))]
+    instances = [ec2.instance_with_interfaces(template=t, name='master{}'.format(n), ami=keypair, type='c5.large',
+                                              keypair=keypair, role='master', interfaces=[(sn, None, None, None)])
+                 for n, sn in enumerate(subnets)]
+    return instances, subnets
+
+
+def test_network_lb():
+    t = template.create(description='test')
+    instances, subnets = masters(t)
+    ig, iga = ec2.internet_gateway(template=t, vpc=t.resources['vpc'])
+    with pytest.raises(ValueError, match='need the internet gateway attachment'):
+        elb.network_lb(template=t, name='masterlb', instances=instances, subnets=subnets, elastic_ips=True)
+    nlb = elb.network_lb(template=t, name='masterlb', instances=instances, subnets=subnets, instance_port=8443,
+                         load_balancer_port=8443, health_check=elb.health_check(name='master', target='HTTPS:8443/'),
+                         deregistration_delay=30, preserve_client_ip=False, elastic_ips=True, gateway_attachment=iga)
+
+    d = t.to_dict()['Resources']
+    props = d['masterlb']['Properties']
+    assert props['Type'] == 'network' and 'Scheme' not in props and 'Subnets' not in props
+    assert props['SubnetMappings'][1] == {'SubnetId': {'Ref': 'b'}, 'AllocationId': {
+        'Fn::GetAtt': ['masterlbbEIP', 'AllocationId']}}
+    assert d['masterlbbEIP']['DependsOn'] == iga.title
+    assert props['LoadBalancerAttributes'] == [{'Key': 'load_balancing.cross_zone.enabled', 'Value': 'true'}]
+    group = d['masterlbtargetgroup']['Properties']
+    assert group['VpcId'] == {'Ref': 'vpc'} and group['Protocol'] == 'TCP' and group['Port'] == 8443
+    assert group['Targets'] == [{'Id': {'Ref': 'master0'}}, {'Id': {'Ref': 'master1'}}]
+    assert group['TargetGroupAttributes'] == [{'Key': 'deregistration_delay.timeout_seconds', 'Value': '30'},
+                                              {'Key': 'preserve_client_ip.enabled', 'Value': 'false'}]
+    assert (group['HealthCheckProtocol'], group['HealthCheckPort'], group['HealthCheckPath']) == ('HTTPS', '8443', '/')
+    assert d['masterlblistener']['Properties']['LoadBalancerArn'] == {'Ref': 'masterlb'}
+    assert nlb.title == 'masterlb'
+
+
+def test_internal_network_lb():
+    t = template.create(description='test')
+    instances, subnets = masters(t)
+    with pytest.raises(ValueError):
+        elb.network_lb(template=t, name='int', instances=instances, subnets=subnets, scheme='internal',
+                       elastic_ips=True)
+    elb.network_lb(template=t, name='int', instances=instances, subnets=subnets, scheme='internal', cross_zone=False,
+                   load_balancer_proto='TLS', health_check=elb.health_check(name='int'))
+    d = t.to_dict()['Resources']
+    assert d['int']['Properties']['Scheme'] == 'internal'
+    assert d['int']['Properties']['Subnets'] == [{'Ref': 'a'}, {'Ref': 'b'}]
+    assert d['int']['Properties']['LoadBalancerAttributes'][0]['Value'] == 'false'
+    assert d['intlistener']['Properties']['Certificates'] == [{'CertificateArn': elb.PROD_OPS_CERTIFICATE}]
+    assert d['inttargetgroup']['Properties']['HealthCheckProtocol'] == 'TCP'
+    assert 'HealthCheckPath' not in d['inttargetgroup']['Properties']
+
+
+def test_openshift_ha_nlb():
+    stack = build.load_module(os.path.join(build.TEMPLATES_DIR, 'openshift-ha.py'))['stack']
+    d = stack(nlb=True).to_dict()['Resources']
+    assert d['masterLB']['Type'] == d['masterLBint']['Type'] == 'AWS::ElasticLoadBalancingV2::LoadBalancer'
+    assert d['masterDns']['Properties']['ResourceRecords'] == [{'Fn::GetAtt': ['masterLB', 'DNSName']}]
+    assert stack().resources['masterLB'].resource_type == 'AWS::ElasticLoadBalancing::LoadBalancer'
@@ -0,0 +1,29 @@
+from ...stacks import ec2, estimate, template
+
+
+def nat_stack():
+    t = template.create(description='test')
+    network = ec2.vpc(template=t, name='vpc', cidr='10.0.0.0/16')
+    ig, iga = ec2.internet_gateway(template=t, vpc=network)
+    public = ec2.subnet(template=t, name='public', cidr='10.0.0.0/24', vpc=network, gateway=ig,
+                        availability_zone=None)
+    nat = ec2.nat_gateway(template=t, public_subnet=public, gateway_attachement=iga)
+    ec2.subnet(template=t, name='private', cidr='10.0.1.0/24', vpc=network, nat=nat, availability_zone=None)
+    return t
+
+
+def test_estimate_follows_critical_path():
+    total, path = estimate.estimate(nat_stack())
+    titles = [title for title, _, _ in path]
+    assert 'natgateway' in titles
+    assert titles[-1] == 'privateRoute'
+    assert total == sum(seconds for _, _, seconds in path)
+    assert estimate.dominant(path, top=1)[0][0] == 'natgateway'
+
+
+def test_estimate_custom_times():
+    total, path = estimate.estimate(nat_stack())
+    faster, _ = estimate.estimate(nat_stack(), times={'AWS::EC2::NatGateway': 0})
+    assert faster == total - estimate.CREATION_TIMES['AWS::EC2::NatGateway']
+    slow, _ = estimate.estimate(nat_stack(), default=1000)
+    assert slow == total
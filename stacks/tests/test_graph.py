@@ -0,0 +1,71 @@
+import pytest
+from troposphere import Sub, Tags
+
+from ...stacks import ec2, graph, iam, template
+
+
+def simple_stack():
+    t = template.create(description='test')
+    keypair = template.add_keypair_parameter(t)
+    network = ec2.vpc(template=t, name='vpc', cidr='10.0.0.0/16')
+    ig, iga = ec2.internet_gateway(template=t, vpc=network)
+    public = ec2.subnet(template=t, name='public', cidr='10.0.0.0/24', vpc=network, gateway=ig,
+                        availability_zone=None)
+    profile = iam.InstanceProfiles.s3_full(template=t)
+    ec2.instance_with_interfaces(template=t, name='machine', ami=keypair, type='t2.micro', keypair=keypair,
+                                 role='demo', iam_role=profile, interfaces=[(public, None, None, iga)])
+    return t
+
+
+def test_graph_edges():
+    g = graph.graph(simple_stack())
+    assert g['machineeth0EIP'] == {'InternetGatewayAttachment': {'DependsOn'}}
+    assert g['machineeth0EIPAssociation'] == {'machineeth0EIP': {'GetAtt'}, 'machineeth0': {'Ref'}}
+    assert 's3fullinstanceprofile' in g['machine']
+    assert 'KeyPair' not in g['machine']
+
+
+def test_layers_and_critical_path():
+    t = simple_stack()
+    g = graph.graph(t)
+    layers = graph.layers(g)
+    assert sorted(sum(layers, [])) == sorted(t.resources)
+    assert 'vpc' in layers[0]
+    assert 'machine' in layers[-1] or 'machineeth0EIPAssociation' in layers[-1]
+    for depth, layer in enumerate(layers):
+        for title in layer:
+            assert all(dep in sum(layers[:depth], []) for dep in g[title])
+
+    length, path = graph.critical_path(g)
+    assert length == len(path) == len(layers)
+    assert path[0] in layers[0]
+
+    length, path = graph.critical_path(g, weight=lambda title: 100 if title == 'machine' else 1)
+    assert path[-1] == 'machine'
+    assert length == 100 + len(path) - 1
+
+
+def test_redundant_depends_on():
+    t = simple_stack()
+    assert graph.redundant_depends_on(graph.graph(t)) == [('machine', 's3fullinstanceprofile')]
+    t.resources['machine'].DependsOn = ['vpc']
+    assert graph.redundant_depends_on(graph.graph(t)) == []
+
+
+def test_sub_references():
+    value = {'UserData': {'Fn::Sub': ['${vpc} ${machine.PrivateIp} ${!literal} ${AWS::Region} ${name}',
+                                      {'name': {'Ref': 'public'}}]},
+             'Name': {'Fn::Sub': 'ip-${eip}'}}
+    assert sorted(graph.references(value)) == [('GetAtt', 'machine'), ('Ref', 'AWS::Region'), ('Ref', 'eip'),
+                                               ('Ref', 'public'), ('Ref', 'vpc')]
+    assert sorted(graph.sub_references(value)) == [('GetAtt', 'machine'), ('Ref', 'AWS::Region'), ('Ref', 'eip'),
+                                                   ('Ref', 'vpc')]
+    t = simple_stack()
+    t.resources['machine'].Tags += Tags(Subnet=Sub('${public}-${vpc.CidrBlock}'))
+    assert graph.graph(t)['machine']['vpc'] == {'GetAtt'}
+    assert 'public' in graph.graph(t)['machine']
+
+
+def test_cycle():
+    with pytest.raises(RuntimeError):
+        graph.topological_order({'a': {'b': {'Ref'}}, 'b': {'a': {'DependsOn'}}})
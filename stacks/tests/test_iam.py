@@ -1,3 +1,7 @@
+import gc
+
+import pytest
+
 from ...stacks import template, iam
 
 
@@ -11,3 +15,98 @@ def test_jenkins_user_and_policy_stack():
     t = template.create(description='test')
     iam.user(template=t, user_name='test', policies=iam.Policies.jenkins(name='policy'), generate_key_serial=0)
     template.save_template_to_file(template=t, file_name='/tmp/stack.json')
+
+
+def test_compact_policy():
+    statements = [iam.statement(iam.Action('ec2', 'DescribeInstances')),
+                  iam.statement([iam.Action('ec2', 'DescribeImages'), iam.Action('ec2', 'describeinstances')]),
+                  iam.statement(iam.Action('s3', 'GetObject'), resource='arn:aws:s3:::bucket/*'),
+                  iam.statement(iam.Action('ec2', 'StartInstances'), effect=iam.Deny)]
+    document = iam.compact_policy(iam.awacs.aws.Policy(Statement=statements))
+    assert [(s['Effect'], s['Action']) for s in document['Statement']] == [
+        ('Allow', ['ec2:DescribeInstances', 'ec2:DescribeImages']), ('Allow', ['s3:GetObject']),
+        ('Deny', ['ec2:StartInstances'])]
+
+    statements.append(iam.statement([iam.Action('ec2', 'StopInstances'), iam.Action('ec2', 'ListThings')]))
+    document = iam.compact_policy(iam.awacs.aws.Policy(Statement=statements), read_wildcards=True)
+    assert document['Statement'][0]['Action'] == ['ec2:Describe*', 'ec2:StopInstances', 'ec2:ListThings']
+    document = iam.compact_policy(iam.awacs.aws.Policy(Statement=statements), service_wildcards=['ec2'])
+    assert document['Statement'][0]['Action'] == ['ec2:*']
+    document = iam.compact_policy({'Statement': [{'Effect': 'Allow', 'Action': ['*', 'ec2:X'], 'Resource': '*'}]})
+    assert document['Statement'][0]['Action'] == ['*']
+
+
+def test_compact_condition():
+    jenkins = iam.Policies.jenkins(name='jenkins')
+    assert isinstance(jenkins.PolicyDocument, iam.awacs.aws.Policy), 'policies are only compacted on request'
+    statement = iam.compact_policy(jenkins.PolicyDocument)['Statement'][0]
+    cidrs = statement['Condition']['IpAddress']['aws:SourceIp']
+    # 171.70.0.0/16 is in 171.68.0.0/14, the other cidrs keep their order
+    assert cidrs == [c for c in iam.ALL_CISCO_CIDRS if c != '171.70.0.0/16']
+    assert iam._collapse_cidrs(['10.0.1.0/24', '10.1.0.0/16', '10.0.0.0/24', '10.0.0.1/32']) == [
+        '10.0.0.0/23', '10.1.0.0/16']
+    # the same condition on another statement is merged
+    twice = iam.policy('jenkins', [iam.statement(iam.Action('ec2', 'DescribeTags'), condition=condition)
+                                   for condition in [iam.Condition(iam.IpAddress({iam.awacs.aws.SourceIp: c}))
+                                                     for c in (iam.ALL_CISCO_CIDRS, iam.ALL_CISCO_CIDRS[::-1])]],
+                       compact=True)
+    assert len(twice.PolicyDocument['Statement']) == 1
+
+
+def test_policy_quotas():
+    t = template.create(description='test')
+    statements = [iam.statement(iam.Action('s3', 'GetObject'), resource='arn:aws:s3:::bucket{}/*'.format(i))
+                  for i in range(60)]
+    small = iam.policy('small', statements[:10])
+    iam.user(template=t, user_name='small', policies=small)
+    with pytest.raises(ValueError, match='policies of user big have .* the quota is 2048'):
+        iam.user(template=t, user_name='big', policies=iam.policy('big', statements))
+    iam.role_with_statements(template=t, name='bigrole', statemenets=statements)
+    iam.InstanceProfiles.packer(template=t)
+    assert iam.policy_sizes(t) == [('bigrole', 'role', iam.policy_size(t.resources['bigrole'].Policies[0]), 10240),
+                                   ('packerinstanceprofilerole', 'role', 70, 10240),
+                                   ('small', 'user', iam.policy_size(small), 2048)]
+    assert iam.policy_size(small) < 2048 < iam.policy_size(iam.policy('big', statements)) < 10240
+
+
+def test_roles_and_profiles_are_shared():
+    t = template.create(description='test')
+    packer = iam.InstanceProfiles.packer(template=t)
+    assert iam.InstanceProfiles.packer(template=t) is packer
+    assert iam.InstanceProfiles.ec2_full(template=t) is not packer
+    with pytest.raises(ValueError, match='role packerinstanceprofilerole is already in the template with other'):
+        iam.Roles.s3_full(template=t, name='packerinstanceprofilerole')
+    # sharing across names is opt in
+    assert iam.InstanceProfiles.ec2_full(template=t, name='shared', share=True) is packer
+    assert iam.InstanceProfiles.s3_full(template=t, share=True) is not packer
+    # the same permissions in another order and another policy name
+    statements = [iam.statement([iam.Action('s3', 'GetObject'), iam.Action('s3', 'ListBucket')]),
+                  iam.statement(iam.Action('ec2', 'DescribeTags'))]
+    reader = iam.role_with_statements(template=t, name='reader', statemenets=statements)
+    assert iam.role(template=t, name='other', policies=iam.policy('other', statements[::-1]), share=True) is reader
+    assert iam.role(template=t, name='reader', policies=iam.policy('other', statements[::-1])) is reader
+    assert sorted(t.resources) == ['ec2fullinstanceprofile', 'ec2fullinstanceprofilerole', 'packerinstanceprofile',
+                                   'packerinstanceprofilerole', 'reader', 's3fullinstanceprofile',
+                                   's3fullinstanceprofilerole']
+
+    other = template.create(description='test')
+    assert iam.InstanceProfiles.packer(template=other) is not packer
+    assert 'packerinstanceprofile' in other.resources
+
+
+def test_registry_follows_templates():
+    t = template.create(description='test')
+    role = iam.Roles.s3_full(template=t, name='s3role')
+    t.resources.pop('s3role')
+    assert iam.Roles.s3_full(template=t, name='s3role') is not role
+    key = id(t)
+    assert key in iam._registry
+    del role, t
+    gc.collect()  # resources and their template refer to each other
+    assert key not in iam._registry
+
+
+def test_roles_get_statements_of_their_own():
+    a = iam.Roles.ec2_full(template=template.create(description='a'), name='ec2role')
+    b = iam.Roles.ec2_full(template=template.create(description='b'), name='ec2role')
+    assert a.Policies[0].PolicyDocument.Statement[0] is not b.Policies[0].PolicyDocument.Statement[0]
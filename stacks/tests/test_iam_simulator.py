@@ -0,0 +1,71 @@
+import pytest
+
+from ...stacks import iam, iam_simulator, template
+from ...stacks.benchmarks.iam_simulator import bucket_evaluator, checks
+
+
+def test_jenkins_user():
+    t = template.create(description='test')
+    iam.user(template=t, user_name='srvc_jenkins', policies=iam.Policies.jenkins(name='jenkins'))
+    jenkins = iam_simulator.evaluators(t)['srvcjenkins']
+    cisco = {'aws:SourceIp': '173.38.1.1'}
+    assert jenkins.evaluate('ec2:DescribeImages', context=cisco) == 'allowed'
+    assert jenkins.allowed('EC2:describeimages', context={'aws:sourceip': '171.70.3.4'})
+    assert jenkins.evaluate('ec2:DescribeImages', context={'aws:SourceIp': '8.8.8.8'}) == 'implicitDeny'
+    assert jenkins.evaluate('ec2:DescribeImages') == 'implicitDeny'
+    assert jenkins.evaluate('ec2:TerminateInstances', context=cisco) == 'implicitDeny'
+    assert jenkins.evaluate('s3:GetObject', context=cisco) == 'implicitDeny'
+
+
+def test_instance_profiles():
+    t = template.create(description='test')
+    iam.InstanceProfiles.s3_full(template=t)
+    iam.InstanceProfiles.ecr_full(template=t)
+    evaluators = iam_simulator.evaluators(t)
+    s3 = evaluators['s3fullinstanceprofile']
+    assert s3.allowed('s3:PutObject', 'arn:aws:s3:::bucket/key')
+    assert not s3.allowed('ec2:RunInstances')
+    assert evaluators['ecrfullinstanceprofilerole'].allowed('ecr:GetAuthorizationToken')
+    assert not evaluators['ecrfullinstanceprofile'].allowed('s3:GetObject')
+
+
+def test_deny_resources_and_conditions():
+    deny_delete = iam.statement(iam.Action('s3', 'Delete*'), resource='arn:aws:s3:::prod-?/*', effect=iam.Deny)
+    evaluator = iam_simulator.Evaluator(
+        iam.policy('s3', [iam.statement(iam.Action('s3', '*')), deny_delete], compact=False),
+        {'Effect': 'Allow', 'NotAction': 'iam:*', 'Resource': '*',
+         'Condition': {'StringEquals': {'aws:RequestedRegion': ['eu-west-1']}, 'Bool': {'aws:SecureTransport': True}}},
+        {'Effect': 'Deny', 'Action': 'ec2:TerminateInstances', 'Resource': '*',
+         'Condition': {'NotIpAddressIfExists': {'aws:SourceIp': '10.0.0.0/8'}}})
+    assert evaluator.evaluate('s3:DeleteObject', 'arn:aws:s3:::prod-a/key') == 'explicitDeny'
+    assert evaluator.evaluate('s3:DeleteObject', 'arn:aws:s3:::prod-ab/key') == 'allowed'
+    region = {'aws:RequestedRegion': 'eu-west-1', 'aws:SecureTransport': 'true'}
+    assert evaluator.evaluate('ec2:RunInstances', context=region) == 'allowed'
+    assert evaluator.evaluate('ec2:RunInstances', context=dict(region, **{'aws:RequestedRegion': 'us-east-1'})) == \
+        'implicitDeny'
+    assert evaluator.evaluate('iam:CreateUser', context=region) == 'implicitDeny'
+    assert evaluator.evaluate('ec2:TerminateInstances', context=region) == 'explicitDeny'
+    assert evaluator.evaluate('ec2:TerminateInstances', context=dict(region, **{'aws:SourceIp': '10.1.2.3'})) == \
+        'allowed'
+    with pytest.raises(ValueError, match='unsupported condition operator DateGreaterThan'):
+        iam_simulator.Evaluator({'Effect': 'Allow', 'Action': '*', 'Resource': '*',
+                                 'Condition': {'DateGreaterThan': {'aws:CurrentTime': '2020-01-01'}}})
+
+
+def test_negated_condition_without_key():
+    """a missing key doesn't match the addresses, so NotIpAddress is true"""
+    evaluator = iam_simulator.Evaluator(
+        {'Effect': 'Allow', 'Action': '*', 'Resource': '*'},
+        {'Effect': 'Deny', 'Action': 'ec2:*', 'Resource': '*',
+         'Condition': {'NotIpAddress': {'aws:SourceIp': '10.0.0.0/8'}}},
+        {'Effect': 'Deny', 'Action': 's3:*', 'Resource': '*',
+         'Condition': {'StringEquals': {'aws:RequestedRegion': 'us-east-1'}}})
+    assert evaluator.evaluate('ec2:RunInstances') == 'explicitDeny'
+    assert evaluator.evaluate('ec2:RunInstances', context={'aws:SourceIp': '10.1.2.3'}) == 'allowed'
+    assert evaluator.evaluate('s3:GetObject') == 'allowed'
+
+
+def test_thousands_of_checks():
+    decisions = checks(bucket_evaluator(100), 1000)
+    assert len(decisions) == 2000
+    assert decisions.count(True) == 100
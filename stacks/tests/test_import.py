@@ -0,0 +1,30 @@
+import os
+import subprocess
+import sys
+
+from ... import stacks
+from ...stacks import iam
+
+
+def run(code):
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(p for p in sys.path if p))
+    return subprocess.check_output([sys.executable, '-c', code], env=env).decode().split()
+
+
+def test_package_import_is_lazy():
+    loaded = run('import sys, {0}; print(" ".join(m for m in sys.modules if m.startswith("{0}")))'.format(
+        stacks.__name__))
+    assert loaded == [stacks.__name__]
+
+
+def test_submodule_import_only_loads_what_it_needs():
+    loaded = run('import sys; from {0} import template; print(" ".join(sys.modules))'.format(stacks.__name__))
+    assert stacks.__name__ + '.template' in loaded
+    assert stacks.__name__ + '.ec2' not in loaded
+    assert 'awacs.ec2' not in loaded
+
+
+def test_lazy_attributes():
+    assert stacks.ec2.vpc
+    assert 'security' in dir(stacks)
+    assert iam.ec2.DescribeInstances
@@ -0,0 +1,49 @@
+import warnings
+
+import pytest
+
+from ...stacks import ec2, instance_types, template
+
+
+def test_catalog():
+    c4 = instance_types.get('c4.2xlarge')
+    assert (c4.vcpu, c4.cores, c4.enis, c4.sriov, c4.ena, c4.current) == (8, 4, 4, True, False, False)
+    assert instance_types.get('t2.micro').cores == 1
+    assert instance_types.get('x9.huge') is None
+    assert all(t.vcpu % t.cores == 0 for t in instance_types.catalog().values())
+    for name in dir(ec2.Type):
+        if name.isupper():
+            assert instance_types.get(getattr(ec2.Type, name)), name
+
+
+def test_suggest_faster_network():
+    suggested = instance_types.suggest('c4.2xlarge')
+    assert suggested[0] == 'c6in.2xlarge'
+    for name in suggested:
+        t = instance_types.get(name)
+        assert t.current and t.vcpu >= 8 and t.memory >= 15 and t.network > 1
+
+
+def test_check_interfaces():
+    t = template.create(description='test')
+    keypair = template.add_keypair_parameter(t)
+    vpc = ec2.vpc(template=t, name='vpc', cidr='10.0.0.0/16')
+    sn = ec2.subnet(template=t, name='a', cidr='10.0.1.0/24', vpc=vpc, availability_zone=None)
+    with pytest.raises(ValueError):
+        ec2.instance_with_interfaces(template=t, name='micro', ami=keypair, type='t2.micro', keypair=keypair,
+                                     role='x', interfaces=[(sn, None, None, None)] * 3)
+    assert 'microeth0' not in t.resources
+    ec2.instance_with_interfaces(template=t, name='small', ami=keypair, type='t2.small', keypair=keypair, role='x',
+                                 interfaces=[(sn, None, None, None)] * 3)
+
+
+def test_previous_generation_warning():
+    instance_types._warned.discard('c3.2xlarge')
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter('always')
+        instance_types.check('c3.2xlarge')
+        instance_types.check('c3.2xlarge')
+        instance_types.check('c5.2xlarge')
+    assert len(caught) == 1
+    assert issubclass(caught[0].category, instance_types.PreviousGenerationWarning)
+    assert 'c6in.2xlarge' in str(caught[0].message)
@@ -0,0 +1,95 @@
+import json
+
+from troposphere import Equals, GetAtt, If, Output, Ref
+
+from ...stacks import ec2, limits, template
+
+
+def fleet_stack(nodes):
+    t = template.create(description='fleet')
+    keypair = template.add_keypair_parameter(t)
+    network = ec2.vpc(template=t, name='vpc', cidr='10.0.0.0/16')
+    ig, iga = ec2.internet_gateway(template=t, vpc=network)
+    public = ec2.subnet(template=t, name='public', cidr='10.0.0.0/24', vpc=network, gateway=ig,
+                        availability_zone=None)
+    for i in range(nodes):
+        ec2.instance_with_interfaces(template=t, name='node{}'.format(i), ami=keypair, type='c4.large',
+                                     keypair=keypair, role='worker', interfaces=[(public, None, None, iga)])
+    return t
+
+
+def test_analyze():
+    t = fleet_stack(nodes=2)
+    report = limits.analyze(t)
+    assert report['Resources'] == (len(t.resources), 500)
+    assert report['Parameters'] == (1, 200)
+    assert report['TemplateBody'][0] == len(t.to_json(indent=None, separators=(',', ':')))
+    assert limits.exceeded(report) == []
+    assert limits.exceeded(limits.analyze(fleet_stack(nodes=100))) == ['TemplateBody']
+
+
+def test_partition_keeps_getatt_together():
+    t = fleet_stack(nodes=10)
+    groups = limits.partition(t, max_resources=15)
+    owner = {title: i for i, group in enumerate(groups) for title in group}
+    assert sorted(owner) == sorted(t.resources)
+    assert all(len(group) <= 15 for group in groups)
+    # eip association uses GetAtt on the eip, the eip DependsOn the gateway attachment
+    assert owner['node9eth0EIPAssociation'] == owner['node9eth0EIP']
+    assert owner['node9eth0EIP'] >= owner['InternetGatewayAttachment']
+    assert owner['node9'] >= owner['node9eth0']
+
+
+def test_split_wires_refs_through_exports():
+    t = fleet_stack(nodes=10)
+    before = t.to_json()
+    parent, children = limits.split(t, name='fleet', max_resources=15)
+    assert t.to_json() == before, 'the original template should not be modified'
+    assert sorted(parent.resources) == sorted(children)
+    assert sum(len(c.resources) for c in children.values()) == len(t.resources)
+
+    exports, imports = set(), set()
+    for child in children.values():
+        d = child.to_dict()
+        exports.update(json.dumps(o['Export']['Name']) for o in d.get('Outputs', {}).values())
+        for resource in d['Resources'].values():
+            for kind, name in limits.references(resource):
+                assert name in d['Resources'] or name in d.get('Parameters', {}) or name.startswith('AWS::')
+        imports.update(json.dumps(i['Fn::ImportValue']) for i in find(d, 'Fn::ImportValue'))
+    assert exports and imports <= exports
+    # export names are unique per parent stack
+    assert all(e.startswith('{"Fn::Sub": "${ParentStackName}-') for e in exports)
+    assert parent.resources['fleet2'].DependsOn
+    assert parent.resources['fleet2'].Parameters['ParentStackName'].data == {'Ref': 'AWS::StackName'}
+
+
+def find(value, key):
+    """all dicts with key in json"""
+    if isinstance(value, dict):
+        return ([value] if key in value else []) + [d for v in value.values() for d in find(v, key)]
+    if isinstance(value, list):
+        return [d for v in value for d in find(v, key)]
+    return []
+
+
+def test_split_conditions_and_outputs():
+    t = fleet_stack(nodes=10)
+    env = template.add_parameter(t, name='Environment', description='prod or test')
+    t.add_condition('IsProd', Equals(Ref(env), 'prod'))
+    t.resources['node0'].InstanceType = If('IsProd', 'c5.large', 't3.micro')
+    t.add_output(Output('node0ip', Value=GetAtt('node0', 'PrivateIp')))
+    t.add_output(Output('lastip', Value=GetAtt('node9', 'PrivateIp'), Condition='IsProd'))
+    t.add_output(Output('both', Value=GetAtt('node0', 'PrivateIp'), Description=Ref('node9')))
+    parent, children = limits.split(t, name='fleet', max_resources=15)
+
+    owner = {title: c.to_dict() for c in children.values() for title in c.resources}
+    first, last = owner['node0'], owner['node9']
+    assert first is not last
+    assert first['Conditions'] == {'IsProd': {'Fn::Equals': [{'Ref': 'Environment'}, 'prod']}}
+    assert 'Environment' in first['Parameters'] and 'Environment' in last['Parameters']
+    assert 'IsProd' in last['Conditions']
+    assert not all('Conditions' in c.to_dict() for c in children.values())
+    assert first['Outputs']['node0ip']['Value'] == {'Fn::GetAtt': ['node0', 'PrivateIp']}
+    # the GetAtt of node0 is exported by the first child
+    assert last['Outputs']['both']['Value'] == {'Fn::ImportValue': {'Fn::Sub': '${ParentStackName}-node0-PrivateIp'}}
+    assert first['Outputs']['Exportnode0PrivateIp']['Value'] == {'Fn::GetAtt': ['node0', 'PrivateIp']}
@@ -0,0 +1,85 @@
+from ...stacks import ec2, reachability, security, template
+from ...stacks.benchmarks.reachability import fleet_stack
+
+
+def acl_stack():
+    """web in public, db and video in private. The private acl only lets 5432 from public in, and tcp replies out"""
+    t = template.create(description='test')
+    keypair = template.add_keypair_parameter(t)
+    vpc = ec2.vpc(template=t, name='vpc', cidr='10.0.0.0/16')
+    public = ec2.subnet(template=t, name='public', vpc=vpc, cidr='10.0.1.0/24', availability_zone=None)
+    acl = security.acl_table(template=t, name='privateacl', vpc=vpc)
+    private = ec2.subnet(template=t, name='private', vpc=vpc, cidr='10.0.2.0/24', availability_zone=None,
+                         acl_table=acl)
+    security.acl_entry(template=t, acl_table=acl, name='denyweb2', number=90, protocol=6, from_port=5432,
+                       to_port=5432, cidr='10.0.1.20/32', action='DENY')
+    security.acl_entry(template=t, acl_table=acl, name='postgres', number=100, protocol=6, from_port=5432,
+                       to_port=5432, cidr='10.0.1.0/24')
+    security.acl_entry(template=t, acl_table=acl, name='replies', number=100, protocol=6, from_port=1024,
+                       to_port=65535, cidr='10.0.1.0/24', egress=True)
+
+    sg = security.get_private_security_group(template=t, vpc=vpc, cidr='10.0.0.0/16', desc='private')
+    for name, sn, ip in (('web1', public, '10.0.1.10'), ('web2', public, '10.0.1.20'), ('db', private, '10.0.2.10'),
+                         ('video', private, '10.0.2.11')):
+        ec2.instance_with_interfaces(template=t, name=name, ami=keypair, type='t2.micro', keypair=keypair,
+                                     role=name, interfaces=[(sn, ip, sg, None)])
+    return t
+
+
+def test_security_groups():
+    t = template.create(description='test')
+    keypair = template.add_keypair_parameter(t)
+    vpc = ec2.vpc(template=t, name='vpc', cidr='10.0.0.0/16')
+    sn = ec2.subnet(template=t, name='public', vpc=vpc, cidr='10.0.1.0/24', availability_zone=None)
+    bastion = security.get_bastion_security_group(template=t, vpc=vpc, cidr='10.0.1.10/32')
+    ec2.instance_with_interfaces(template=t, name='bastion', ami=keypair, type='t2.micro', keypair=keypair,
+                                 role='bastion', interfaces=[(sn, '10.0.1.10', None, None)])
+    ec2.instance_with_interfaces(template=t, name='other', ami=keypair, type='t2.micro', keypair=keypair,
+                                 role='other', interfaces=[(sn, '10.0.1.11', None, None)])
+    ec2.instance_with_interfaces(template=t, name='target', ami=keypair, type='t2.micro', keypair=keypair,
+                                 role='target', interfaces=[(sn, None, bastion, None)])
+
+    n = reachability.Network(t)
+    assert n.sources('target', 22) == ['bastion']
+    assert n.sources('target', 443) == ['bastion']
+    assert n.sources('target', 80) == []
+    assert n.sources('bastion', 22) == []
+    assert 'security groups of targeteth0' in n.check('other', 'target', 22)
+
+
+def test_network_acls():
+    n = reachability.Network(acl_stack())
+    assert n.sources('db', 5432) == ['video', 'web1']
+    assert 'blocks inbound tcp 5432' in n.check('web2', 'db', 5432)
+    assert 'blocks inbound tcp 22' in n.check('web1', 'db', 22)
+    # the private acl only lets tcp in, video is in the same subnet
+    assert n.sources('db', 5000, 'udp') == ['video']
+    # the private acl has no outbound rule to the private subnet
+    assert 'blocks outbound' in n.check('db', 'web1', 80)
+    assert n.matrix(5432) == {'db': ['video', 'web1'], 'video': ['db', 'web1'], 'web1': ['web2'], 'web2': ['web1']}
+
+
+def test_return_traffic():
+    t = acl_stack()
+    t.resources.pop('replies')
+    n = reachability.Network(t)
+    assert 'blocks return outbound tcp 32768-60999' in n.check('web1', 'db', 5432)
+    assert n.sources('db', 5432) == ['video']
+
+
+def test_dhcp_addresses():
+    """an interface without an address can have any address of its subnet"""
+    t = acl_stack()
+    t.resources['web1eth0'].properties.pop('PrivateIpAddress')
+    n = reachability.Network(t)
+    # the deny of 10.0.1.20 may apply to web1
+    assert n.sources('db', 5432) == ['video']
+
+
+def test_matrix_fleet():
+    t = fleet_stack(500)
+    matrix = reachability.Network(t).matrix(22)
+    assert len(matrix) == 500
+    assert all(len(sources) == 499 for sources in matrix.values())
+    # the acl denies port 5 between the subnets, 125 instances per subnet
+    assert all(len(sources) == 124 for sources in reachability.Network(t).matrix(5).values())
@@ -0,0 +1,140 @@
+import pytest
+
+from ...stacks import ec2, reachability, security, template
+
+
+def specs(rules):
+    return [(r.IpProtocol, r.FromPort, r.ToPort, r.CidrIp) for r in rules]
+
+
+def test_compact_cidrs_and_ports():
+    rules = [security.rule('tcp', '22', '22', '10.0.0.0/25'), security.rule('tcp', '22', '22', '10.0.0.128/25'),
+             security.rule('tcp', '8050', '8051', '10.1.0.0/16'), security.rule('6', '8052', '8060', '10.1.0.0/16'),
+             security.rule('tcp', '8443', '8443', '10.1.0.0/16'), security.rule('udp', '22', '22', '10.0.0.0/24')]
+    assert specs(security.compact(rules)) == [('tcp', '22', '22', '10.0.0.0/24'),
+                                              ('tcp', '8050', '8060', '10.1.0.0/16'),
+                                              ('tcp', '8443', '8443', '10.1.0.0/16'),
+                                              ('udp', '22', '22', '10.0.0.0/24')]
+
+
+def test_compact_drops_covered_rules():
+    rules = security.Rules()
+    rs = [rules.ssh, rules.override_cidr(rules.https, '10.0.0.0/16'), rules.override_cidr(rules.all_sn, '10.0.0.0/8'),
+          rules.override_cidr(rules.all_icmp, '10.0.0.0/16'), rules.override_cidr(rules.all, '10.0.0.0/16')]
+    assert specs(security.compact(rs)) == [('tcp', '22', '22', '0.0.0.0/0'),
+                                           ('tcp', '0', '65535', '10.0.0.0/8'),
+                                           ('-1', '-1', '-1', '10.0.0.0/16')]
+
+
+def test_compact_icmp_wildcards():
+    rules = [security.rule('icmp', '8', '0', '10.0.0.0/16'), security.rule('icmp', '8', '-1', '10.0.0.0/16'),
+             security.rule('icmp', '3', '4', '10.0.0.0/16'), security.rule('icmp', '-1', '-1', '10.0.0.0/8')]
+    assert specs(security.compact(rules[:3])) == [('icmp', '8', '-1', '10.0.0.0/16'), ('icmp', '3', '4', '10.0.0.0/16')]
+    assert specs(security.compact(rules)) == [('icmp', '-1', '-1', '10.0.0.0/8')]
+
+
+def test_compact_keeps_other_rules():
+    sg_rule = security.SecurityGroupRule(IpProtocol='tcp', FromPort='22', ToPort='22', SourceSecurityGroupId='sg-1')
+    rules = [security.rule('tcp', '22', '22', '0.0.0.0/0'), sg_rule]
+    assert security.compact(rules)[1] is sg_rule
+
+
+def test_bastion_group_is_compacted():
+    t = template.create(description='test')
+    vpc = ec2.vpc(template=t, name='vpc')
+    sg = security.get_bastion_security_group(template=t, vpc=vpc)
+    assert len(sg.SecurityGroupIngress) == 3 * (len(security.ALL_CISCO_CIDRS) - 1)  # 171.70/16 is in 171.68/14
+
+
+def test_split_over_quota():
+    t = template.create(description='test')
+    vpc = ec2.vpc(template=t, name='vpc')
+    cidrs = ['10.{}.0.0/16'.format(i) for i in range(0, 80, 2)]
+    with pytest.raises(ValueError, match='bastionsecuritygroup has 120 ingress rules, the quota is 60'):
+        security.get_bastion_security_group(template=t, vpc=vpc, cidr=cidrs)
+    t = template.create(description='test')
+    vpc = ec2.vpc(template=t, name='vpc')
+    groups = security.get_bastion_security_groups(template=t, vpc=vpc, cidr=cidrs)
+    assert [g.title for g in groups] == ['bastionsecuritygroup', 'bastionsecuritygroup2']
+    assert [len(g.SecurityGroupIngress) for g in groups] == [security.RULES_PER_GROUP, 120 - security.RULES_PER_GROUP]
+    assert groups[1].VpcId.data == {'Ref': 'vpc'}
+    assert [g.title for g in security.get_http_security_groups(template=t, vpc=vpc)] == ['httpsecuritygroup']
+
+
+def test_rule_catalog_is_shared():
+    assert security.Rules().ssh is security.Rules().ssh
+    spec = security.Rules.override_cidr(security.Rules.ssh, '10.0.0.0/8')
+    assert spec == security.RuleSpec('tcp', '22', '22', '10.0.0.0/8')
+    assert security.Rules.ssh.cidr == '0.0.0.0/0'
+    assert security.materialize(spec) is not security.materialize(spec)
+    assert security.lazy_rule(spec) is security.lazy_rule(spec)
+
+
+def test_groups_do_not_share_rule_lists():
+    t = template.create(description='test')
+    vpc = ec2.vpc(template=t, name='vpc')
+    a = security.get_elb_security_group(template=t, vpc=vpc, sg_name='a')
+    b = security.get_elb_security_group(template=t, vpc=vpc, sg_name='b')
+    a.SecurityGroupIngress.append(security.rule('tcp', '80', '80', '0.0.0.0/0'))
+    assert len(b.SecurityGroupIngress) == len(a.SecurityGroupIngress) - 1
+
+
+def test_shared_rules_are_immutable():
+    a = template.create(description='a')
+    sg = security.get_bastion_security_group(template=a, vpc=ec2.vpc(template=a, name='vpc'))
+    with pytest.raises(AttributeError):
+        sg.SecurityGroupIngress[0].Description = 'only for a'
+    b = template.create(description='b')
+    other = security.get_bastion_security_group(template=b, vpc=ec2.vpc(template=b, name='vpc'))
+    assert other.SecurityGroupIngress[0] is sg.SecurityGroupIngress[0]
+    # every serialization gets dicts of its own
+    rule = a.to_dict()['Resources']['bastionsecuritygroup']['Properties']['SecurityGroupIngress'][0]
+    assert rule == {'IpProtocol': 'tcp', 'FromPort': '22', 'ToPort': '22', 'CidrIp': '173.36.0.0/14'}
+    rule['Description'] = 'only for a'
+    assert 'Description' not in b.to_dict()['Resources']['bastionsecuritygroup']['Properties'][
+        'SecurityGroupIngress'][0]
+
+
+def test_acl_rule_numbers_and_replies():
+    AclRule = security.AclRule
+    rules = [AclRule('tcp', 22, 22, '10.0.0.0/16'), AclRule('udp', 5000, 5100, '10.0.0.0/16'),
+             AclRule('tcp', 443, 443, egress=True)]
+    numbered = security.acl_rules(rules)
+    assert numbered == [(100, rules[0]), (110, rules[1]), (120, AclRule('tcp', 1024, 65535, '0.0.0.0/0')),
+                        (100, rules[2]), (110, AclRule('tcp', 1024, 65535, '10.0.0.0/16', egress=True)),
+                        (120, AclRule('udp', 1024, 65535, '10.0.0.0/16', egress=True))]
+    assert security.acl_drops(numbered, 'tcp', 22, '10.0.1.0/24') is None
+    assert security.acl_drops(numbered, 'tcp', 22, '0.0.0.0/0') == '*'
+    assert security.acl_drops(numbered, 'tcp', (32768, 60999), '10.0.1.10/32', egress=True) is None
+    assert security.acl_drops(numbered, 'udp', 5200, '10.0.1.0/24') == '*'
+
+
+def test_acl_shadowed_rules():
+    AclRule = security.AclRule
+    with pytest.raises(ValueError, match='inbound rule 110 .* never matches, rules 100'):
+        security.acl_rules([AclRule('udp', 1, 65535, '10.0.0.0/16', 'DENY'), AclRule('udp', 5000, 5100, '10.0.1.0/24')])
+    # together the 2 halves match all of 10.0.0.0/24
+    with pytest.raises(ValueError, match='rules 100, 110'):
+        security.acl_rules([AclRule(-1, cidr='10.0.0.0/25'), AclRule(-1, cidr='10.0.0.128/25'),
+                            AclRule('tcp', 22, 22, '10.0.0.0/24')])
+    assert len(security.acl_rules([AclRule('tcp', 22, 22), AclRule('tcp', 20, 23)], return_traffic=False)) == 2
+
+
+def test_acl_drops_video():
+    t = template.create(description='test')
+    vpc = ec2.vpc(template=t, name='vpc')
+    AclRule = security.AclRule
+    rules = [AclRule('tcp', 22, 22), AclRule('udp', 5000, 5049, '10.0.0.0/16'), AclRule('icmp')]
+    with pytest.raises(ValueError, match=r"videoacl drops udp \(5000, 5100\) from 10.0.1.0/24 \(rule 110\)"):
+        security.acl(t, 'videoacl', vpc, rules, expect=[('udp', (5000, 5100), '10.0.1.0/24')])
+    assert 'videoacl' not in t.resources
+
+    table, entries = security.acl(t, 'videoacl', vpc, rules, expect=[('udp', (5000, 5049), '10.0.1.0/24'),
+                                                                     ('tcp', 22, '1.2.3.4/32')])
+    assert [e.title for e in entries] == ['videoaclin100', 'videoaclin110', 'videoaclin120', 'videoaclout100',
+                                          'videoaclout110']
+    assert entries[1].Protocol == 17 and entries[1].PortRange.to_dict() == {'From': 5000, 'To': 5049}
+    assert entries[2].Icmp.to_dict() == {'Code': -1, 'Type': -1}
+    assert entries[3].Egress and entries[3].PortRange.to_dict() == {'From': 1024, 'To': 65535}
+    network = reachability.Network(t)
+    assert [e[5] for e in network.acls['videoacl'][0]] == [100, 110, 120]
@@ -0,0 +1,47 @@
+import io
+import json
+
+from ...stacks import template
+from .test_stack import test_simple_stack as simple_stack
+
+
+def test_write_template_matches_to_json():
+    t = simple_stack()
+    f = io.StringIO()
+    size = template.write_template(template=t, f=f)
+    assert f.getvalue() == t.to_json(indent=4)
+    assert size == len(f.getvalue())
+
+
+def test_write_template_minified():
+    t = simple_stack()
+    f = io.StringIO()
+    template.write_template(template=t, f=f, minify=True)
+    assert '\n' not in f.getvalue()
+    assert json.loads(f.getvalue()) == json.loads(t.to_json())
+    counter = template.SizeCounter()
+    assert template.write_template(template=t, f=counter, minify=True) == counter.size == len(f.getvalue())
+
+
+def test_write_empty_template():
+    t = template.create(description='empty')
+    f = io.StringIO()
+    template.write_template(template=t, f=f)
+    assert json.loads(f.getvalue()) == {'Description': 'empty', 'Resources': {}}
+
+
+def test_write_template_size_is_bytes():
+    t = template.create(description='caf\u00e9 \u2603')
+    f = io.StringIO()
+    size = template.write_template(template=t, f=f)
+    assert size == len(f.getvalue().encode('utf-8'))
+
+
+def test_save_template_prints_summary(capsys):
+    t = simple_stack()
+    capsys.readouterr()
+    size = template.save_template_to_file(template=t, file_name='/tmp/stack.json')
+    out = capsys.readouterr().out
+    assert '{} bytes'.format(size) in out
+    assert 'AWS::EC2::Instance' in out
+    assert '"Resources"' not in out
@@ -0,0 +1,52 @@
+import pytest
+
+from ...stacks import ec2, template, userdata
+
+
+SCRIPT = '#!/bin/bash\necho hello\n'
+
+
+def test_multipart():
+    archive = userdata.multipart(ec2.ETH1_USER_DATA, SCRIPT, ('text/x-shellscript', 'echo plain\n'))
+    assert archive.count('Content-Type: text/cloud-config') == 1
+    assert archive.count('Content-Type: text/x-shellscript') == 2
+    assert archive == userdata.multipart(ec2.ETH1_USER_DATA, SCRIPT, ('text/x-shellscript', 'echo plain\n'))
+    with pytest.raises(ValueError):
+        userdata.multipart('echo no shebang\n')
+
+
+def test_encode_compresses():
+    data = userdata.encode(ec2.ETH1_USER_DATA)
+    assert userdata.decode(data) == userdata.multipart(ec2.ETH1_USER_DATA)
+    assert len(data) < len(userdata.encode(ec2.ETH1_USER_DATA, compress=False))
+
+
+def test_encode_limit():
+    big = '#!/bin/bash\n' + 'echo hello world\n' * 2000
+    userdata.encode(big)
+    with pytest.raises(ValueError):
+        userdata.encode(big, compress=False)
+
+
+def test_shared_is_stored_once():
+    t = template.create(description='test')
+    keypair = template.add_keypair_parameter(t)
+    for i in range(5):
+        ec2.instance(template=t, name='machine{}'.format(i), ami='ami', type='t2.micro', keypair=keypair,
+                     interfaces=None, user_data=userdata.shared(t, ec2.ETH1_USER_DATA))
+    ec2.instance(template=t, name='other', ami='ami', type='t2.micro', keypair=keypair, interfaces=None,
+                 user_data=userdata.shared(t, SCRIPT))
+
+    mapping = t.to_dict()['Mappings'][userdata.MAPPING]
+    assert len(mapping) == 2
+    find = t.to_dict()['Resources']['machine3']['Properties']['UserData']['Fn::FindInMap']
+    assert userdata.decode(mapping[find[1]][find[2]]) == userdata.multipart(ec2.ETH1_USER_DATA)
+
+
+def test_raid0():
+    script = userdata.raid0(['/dev/xvdf', '/dev/xvdg'], mount_point='/var/lib/docker')
+    assert 'mdadm --create /dev/md0 --run --level=0 --raid-devices=2 /dev/xvdf /dev/xvdg' in script
+    assert "'/dev/md0 /var/lib/docker xfs defaults,nofail 0 2'" in script
+    assert "'/dev/xvdf /data xfs" in userdata.raid0(['/dev/xvdf'])
+    archive = userdata.multipart(ec2.ETH1_USER_DATA, script)
+    assert archive.count('Content-Type: text/x-shellscript') == 1
@@ -0,0 +1,128 @@
+"""cloud-init user data: multipart MIME, gzip compression and deduplication within a template.
+
+cloud-init recognizes gzip compressed user data and multipart MIME archives by their content, so a compressed archive
+can hold several #cloud-config and script parts. Identical user data of several instances is stored once in a
+template mapping, the instances refer to it with FindInMap.
+
+ex:
+    eth1 = userdata.shared(t, ec2.ETH1_USER_DATA)
+    ec2.instance(..., user_data=eth1)
+"""
+import base64
+import gzip
+import hashlib
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+from troposphere import FindInMap
+
+
+# aws limit of the (decoded) user data of an instance
+MAX_USER_DATA = 16 * 1024
+
+MAPPING = 'UserData'
+
+# first line of a part -> mime type, see the cloud-init user data formats
+CONTENT_TYPES = (
+    ('#cloud-config', 'text/cloud-config'),
+    ('#cloud-boothook', 'text/cloud-boothook'),
+    ('#include', 'text/x-include-url'),
+    ('#part-handler', 'text/part-handler'),
+    ('#!', 'text/x-shellscript'),
+)
+
+
+def content_type(content):
+    """mime type of a user data part, based on its first line"""
+    for prefix, mime_type in CONTENT_TYPES:
+        if content.startswith(prefix):
+            return mime_type
+    raise(ValueError('unknown user data format: {!r}'.format(content.splitlines()[0] if content else content)))
+
+
+def multipart(*parts):
+    """Combine user data parts in a multipart MIME archive.
+
+    :param parts: user data strings, or (mime type, content) tuples for parts without a recognizable first line
+    :return: (str) the archive. The boundary is derived from the content, the same parts give the same archive.
+    """
+    parts = [p if isinstance(p, tuple) else (content_type(p), p) for p in parts]
+    archive = MIMEMultipart()
+    for mime_type, content in parts:
+        archive.attach(MIMEText(content, mime_type.split('/')[1], 'utf-8'))
+    digest = hashlib.sha1(repr(parts).encode()).hexdigest()
+    archive.set_boundary('==============={}=='.format(digest))
+    return archive.as_string()
+
+
+def encode(*parts, compress=True):
+    """User data for an instance as a base64 string.
+
+    :param parts: see multipart()
+    :param compress: gzip the archive
+    :return: (str) base64 encoded user data
+    """
+    data = multipart(*parts).encode()
+    if compress:
+        data = gzip.compress(data, mtime=0)
+    if len(data) > MAX_USER_DATA:
+        raise(ValueError('user data of {} bytes exceeds the {} bytes limit'.format(len(data), MAX_USER_DATA)))
+    return base64.b64encode(data).decode()
+
+
+def shared(template, *parts, compress=True):
+    """User data that is stored once per template, no matter how many instances use it.
+
+    :param template: the template to add the user data mapping too
+    :param parts: see multipart()
+    :param compress: gzip the archive
+    :return: FindInMap to pass as user_data to ec2.instance()
+    """
+    data = encode(*parts, compress=compress)
+    key = 'userdata{}'.format(hashlib.sha1(data.encode()).hexdigest()[:16])
+    if key not in template.mappings.get(MAPPING, {}):
+        template.add_mapping(MAPPING, {key: {'Data': data}})
+    return FindInMap(MAPPING, key, 'Data')
+
+
+def decode(data):
+    """The multipart archive of base64 encoded user data (encode()), for inspection and tests"""
+    data = base64.b64decode(data)
+    if data[:2] == b'\x1f\x8b':
+        data = gzip.decompress(data)
+    return data.decode()
+
+
+RAID0_SCRIPT = """#!/bin/bash
+# stripe {devices} and mount the result on {mount_point}
+set -e
+for d in {devices}; do
+    while [ ! -b $d ]; do sleep 1; done
+done
+if [ {count} -gt 1 ] && [ ! -b {array} ]; then
+    mdadm --create {array} --run --level=0 --raid-devices={count} {devices}
+    mdadm --detail --scan >> /etc/mdadm.conf
+fi
+blkid {target} || mkfs -t {filesystem} {target}
+mkdir -p {mount_point}
+grep -q ' {mount_point} ' /etc/fstab || echo '{target} {mount_point} {filesystem} defaults,nofail 0 2' >> /etc/fstab
+mount {mount_point}
+"""
+
+
+def raid0(devices, mount_point='/data', filesystem='xfs', array='/dev/md0'):
+    """Script part that stripes data volumes in a raid 0 array, formats it and mounts it.
+
+    A single device is formatted and mounted as is. The devices are the names the os sees, on nitro instance types
+    ebs volumes show up as /dev/nvme<n>n1 whatever the device name of their mapping.
+
+    :param devices: list of block devices (ex: ['/dev/xvdf', '/dev/xvdg'])
+    :param mount_point: where to mount the array
+    :param filesystem: file system to create
+    :param array: md device of the array
+    :return: (str) user data part for multipart()
+    """
+    if not devices:
+        raise(ValueError('raid0 needs at least one device'))
+    return RAID0_SCRIPT.format(devices=' '.join(devices), count=len(devices), array=array, mount_point=mount_point,
+                               filesystem=filesystem, target=array if len(devices) > 1 else devices[0])